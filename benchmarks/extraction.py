@@ -0,0 +1,126 @@
+# benchmarks/extraction.py
+"""
+Check that bulk and per-element product extraction return the same products, and time both.
+
+ProductExtractor reads a listing page in one of two ways. With
+BULK_EXTRACTION=true it makes one script call that takes each field's
+innerText. Otherwise it makes one WebDriver lookup per field and reads
+.text. Each listing page of the fixture catalogue, or of a directory of
+saved pages, is loaded once in a real Chrome and read both ways:
+  - the two outputs are compared field by field;
+  - on generated pages both are also compared with the fixture's products.
+Every difference is listed, and the script exits with status 1 if there
+are any.
+
+Chrome is required: set CHROME_BINARY and CHROMEDRIVER_PATH. Without it the
+script prints a note and exits.
+
+Usage:
+    python benchmarks/extraction.py [--categories 4] [--pages 2] [--pages-dir DIR]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pipeline
+from fixtures import CatalogueFixture, CatalogueServer
+
+sys.path.insert(0, os.path.join(pipeline.SRC, 'scraper_function'))
+
+# Differences printed in full; the rest are only counted
+MAX_REPORTED = 20
+
+
+def listing_pages(fixture, pages_dir=None):
+    """
+    List the listing page paths to read, each with its expected products when they are known.
+
+    Returns:
+        list: (path, products or None) pairs.
+    """
+    if pages_dir:
+        directory = os.path.join(pages_dir, 'catalogue', 'view')
+        return [('/catalogue/view?' + name[:-len('.html')], None)
+                for name in sorted(os.listdir(directory)) if name.endswith('.html')]
+    return [(fixture.view_url(index, page), fixture.page_products(index, page))
+            for index in range(len(fixture.categories)) for page in range(1, fixture.pages_per_category + 1)]
+
+
+def compare(path, expected_name, expected, actual_name, actual):
+    """
+    List the differences between two extractions of the same page.
+
+    Returns:
+        list: One line per product count or field that differs.
+    """
+    differences = []
+    if len(expected) != len(actual):
+        differences.append(f"{path}: {expected_name} has {len(expected)} products, {actual_name} {len(actual)}")
+    for position, (left, right) in enumerate(zip(expected, actual)):
+        for field in left:
+            if left[field] != right.get(field):
+                differences.append(f"{path} #{position} {field}: {expected_name} {left[field]!r}, "
+                                   f"{actual_name} {right.get(field)!r}")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--categories', type=int, default=4, help='fixture categories')
+    parser.add_argument('--pages', type=int, default=2, help='listing pages per category')
+    parser.add_argument('--pages-dir', help='serve saved catalogue pages instead of generated ones')
+    args = parser.parse_args()
+
+    if not pipeline.chrome_available():
+        print('extraction: skipped, chromedriver not found (set CHROME_BINARY and CHROMEDRIVER_PATH)', file=sys.stderr)
+        return 0
+
+    from market import Market
+
+    fixture = CatalogueFixture(categories=args.categories, pages_per_category=args.pages)
+    pages = listing_pages(fixture, args.pages_dir)
+    seconds = {'bulk': 0.0, 'per-element': 0.0}
+    products = 0
+    differences = []
+
+    with CatalogueServer(fixture, args.pages_dir) as server:
+        origin = server.url[:-len('/shop/catalogue')]
+        market = Market()
+        try:
+            extractor = market.product_extractor
+            for path, expected in pages:
+                market.get(origin + path)
+                outputs = {}
+                for mode in seconds:
+                    extractor.bulk = mode == 'bulk'
+                    start = time.perf_counter()
+                    outputs[mode] = extractor.get_products_from_current_page()
+                    seconds[mode] += time.perf_counter() - start
+                products += len(outputs['bulk'])
+                differences.extend(compare(path, 'bulk', outputs['bulk'], 'per-element', outputs['per-element']))
+                if expected is not None:
+                    for mode, output in outputs.items():
+                        differences.extend(compare(path, 'fixture', expected, mode, output))
+        finally:
+            market.shutdown()
+
+    print(f"{len(pages)} pages, {products} products")
+    print(f"{'mode':<14}{'seconds':>10}{'products/s':>14}")
+    for mode, elapsed in seconds.items():
+        print(f"{mode:<14}{elapsed:>10.3f}{products / elapsed if elapsed else 0.0:>14.1f}")
+
+    if not differences:
+        print('bulk and per-element extraction returned identical products')
+        return 0
+    print(f"{len(differences)} differences:")
+    for line in differences[:MAX_REPORTED]:
+        print(f"  {line}")
+    if len(differences) > MAX_REPORTED:
+        print(f"  ... and {len(differences) - MAX_REPORTED} more")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
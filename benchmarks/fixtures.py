@@ -0,0 +1,279 @@
+# benchmarks/fixtures.py
+"""
+Offline copy of the Woolworths digital catalogue for the benchmarks.
+
+CatalogueFixture generates a deterministic catalogue: categories, paginated
+product listings, prices and savings in the formats the real site uses. A
+local HTTP server serves it with the element IDs and classes that Market
+relies on, so the scraper runs its normal flow against localhost: enter the
+postcode, pick the suggestion, read the catalogue, hover the category menu,
+page through each category.
+
+With assets=True every product also gets its own image and listing pages
+load a web font, so the images and fonts that BLOCK_RESOURCES skips are
+actually requested. These are generated placeholders; trackers live on
+other hosts and are not served.
+
+Pages saved from the real site can be served instead by passing a directory.
+Each request path maps to a file: '/shop/catalogue' to 'shop/catalogue.html',
+and '/catalogue/view?saleId=1&category=2&page=3' to
+'catalogue/view/saleId=1&category=2&page=3.html'.
+"""
+
+import os
+import html
+import zlib
+import random
+import struct
+import threading
+from urllib.parse import urlparse, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CATEGORY_NAMES = [
+    'Fruit & Veg', 'Meat & Seafood', 'Bakery', 'Deli', 'Dairy, Eggs & Fridge', 'Pantry',
+    'Snacks & Confectionery', 'Freezer', 'Drinks', 'Liquor', 'Health & Beauty', 'Baby',
+    'Household', 'Pet', 'Lunch Box', 'International Foods', 'Cleaning', 'Home & Lifestyle'
+]
+BRANDS = ['Woolworths', 'Arnott\'s', 'Cadbury', 'Coca-Cola', 'Devondale', 'Finish', 'Kellogg\'s', 'Sanitarium',
+          'Dettol', 'Whiskas', 'Huggies', 'Uncle Tobys', 'Smith\'s', 'Bega', 'Ingham\'s', 'Tip Top']
+PRODUCTS = ['Cat Litter', 'Butter', 'Tim Tam Original', 'Soft Drink', 'Dishwasher Tablets', 'Corn Flakes',
+            'Weet-Bix', 'Antibacterial Wipes', 'Nappies', 'Oats', 'Potato Chips', 'Cheese Block',
+            'Chicken Breast Fillets', 'Wholemeal Bread', 'Laundry Liquid', 'Toilet Paper', 'Ice Cream',
+            'Greek Yoghurt', 'Coffee Beans', 'Orange Juice']
+SIZES = ['150g', '200g', '375mL', '500g', '1L', '2L', '15L', '24 x 375mL', '60 Pack', '1kg', '12 Pack']
+# Sizes of the generated product images and web font, close to the real site's thumbnails and fonts
+ASSET_BYTES = {'.png': 24 * 1024, '.woff2': 48 * 1024}
+ASSET_TYPES = {'.png': 'image/png', '.woff2': 'font/woff2'}
+
+
+def asset_body(path):
+    """
+    Generate the bytes of a placeholder asset: a 1x1 PNG padded to size, or random font bytes.
+
+    Returns:
+        tuple: (content type, bytes), or None if the path is not an asset.
+    """
+    extension = os.path.splitext(path)[1]
+    if not path.startswith('/assets/') or extension not in ASSET_BYTES:
+        return None
+    padding = random.Random(path).randbytes(ASSET_BYTES[extension])
+    if extension != '.png':
+        return ASSET_TYPES[extension], padding
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    image = (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0))
+             + chunk(b'IDAT', zlib.compress(b'\x00\xff\xff\xff')) + chunk(b'IEND', b''))
+    # Decoders stop at IEND, so the padding only adds transfer size
+    return ASSET_TYPES[extension], image + padding
+
+
+class CatalogueFixture:
+    """
+    A deterministic catalogue for one regional sale.
+
+    Args:
+        categories (int): Number of categories.
+        pages_per_category (int): Listing pages per category.
+        products_per_page (int): Products on a listing page.
+        sale_id (int): The saleId in the catalogue URLs.
+        seed (int): Seed for the generated names and prices.
+        assets (bool): Give every product an image and load a web font on listing pages.
+    """
+    def __init__(self, categories=12, pages_per_category=4, products_per_page=36, sale_id=51234, seed=7,
+                 assets=False):
+        self.categories = CATEGORY_NAMES[:categories]
+        self.pages_per_category = pages_per_category
+        self.products_per_page = products_per_page
+        self.sale_id = sale_id
+        self.seed = seed
+        self.assets = assets
+        self._pages = {}
+
+    @property
+    def product_count(self):
+        return len(self.categories) * self.pages_per_category * self.products_per_page
+
+    def page_products(self, category_index, page):
+        """
+        Generate the products on one listing page, in the extractor's field names.
+
+        Args:
+            category_index (int): The category's position.
+            page (int): The 1-based page.
+
+        Returns:
+            list: Product dicts keyed like ProductExtractor output.
+        """
+        key = (category_index, page)
+        if key in self._pages:
+            return self._pages[key]
+
+        rng = random.Random(f"{self.seed}-{category_index}-{page}")
+        products = []
+        for position in range(self.products_per_page):
+            regular = rng.randint(150, 4500)
+            style = rng.random()
+            product = {
+                'ProductName': f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {rng.choice(SIZES)} "
+                               f"#{category_index}-{page}-{position}",
+                'option_suffix': 'ea',
+                'regoptiondesc': 'NA',
+                'offer_valid': 'Offer valid Wed 16/10 - Tue 22/10',
+                'comparative_text': f"${rng.randint(20, 2000) / 100:.2f} per 100g",
+            }
+            if style < 0.45:
+                price = int(regular * rng.choice([0.5, 0.6, 0.7, 0.75, 0.8, 0.9]))
+                # The site shows the saving and the regular price in the same element
+                was = f"Was ${regular / 100:.2f}"
+                product.update({'price': f"${price / 100:.2f}", 'regular_price': was, 'saving': was,
+                                'sale_price': 'NA', 'sale_option': 'NA'})
+            elif style < 0.55:
+                product.update({'price': f"${regular / 200:.2f}", 'regular_price': 'NA', 'saving': 'NA',
+                                'sale_price': 'Half Price', 'sale_option': 'Half Price'})
+            elif style < 0.65:
+                product.update({'price': f"2 for ${regular * 1.6 / 100:.0f}", 'regular_price': 'NA',
+                                'saving': 'NA', 'sale_price': 'NA', 'sale_option': 'Multi-buy'})
+            else:
+                product.update({'price': f"${regular / 100:.2f}", 'regular_price': 'NA', 'saving': 'NA',
+                                'sale_price': 'NA', 'sale_option': 'NA'})
+            products.append(product)
+
+        self._pages[key] = products
+        return products
+
+    def all_products(self):
+        """
+        Yield (category name, product) for the whole catalogue.
+        """
+        for index, category in enumerate(self.categories):
+            for page in range(1, self.pages_per_category + 1):
+                for product in self.page_products(index, page):
+                    yield category, product
+
+    # HTML rendering
+
+    def view_url(self, category_index, page):
+        return '/catalogue/view?' + urlencode({'saleId': self.sale_id, 'category': category_index, 'page': page})
+
+    def landing_page(self):
+        return f"""<!DOCTYPE html><html><head><title>Catalogue</title></head><body>
+<input id="wx-digital-catalogue-autocomplete" type="text" autocomplete="off">
+<ul id="suggestions"></ul>
+<button class="core-button-secondary" style="display:none"
+        onclick="location.href='{self.view_url(0, 1)}'">Read catalogue</button>
+<script>
+const input = document.getElementById('wx-digital-catalogue-autocomplete');
+input.addEventListener('input', () => {{
+  const list = document.getElementById('suggestions');
+  list.innerHTML = '<li id="wx-digital-catalogue-autocomplete-item-0">' + input.value + ' (fixture)</li>';
+  document.getElementById('wx-digital-catalogue-autocomplete-item-0').onclick = () => {{
+    document.querySelector('.core-button-secondary').style.display = 'inline-block';
+  }};
+}});
+</script></body></html>"""
+
+    def listing_page(self, category_index, page):
+        links = ''.join(
+            f'<li><a class="sf-navcategory-link" href="{self.view_url(index, 1)}">{html.escape(name)}</a></li>'
+            for index, name in enumerate(self.categories)
+        )
+        items = []
+        for position, product in enumerate(self.page_products(category_index, page)):
+            fields = [
+                ('sf-item-heading', product['ProductName']), ('sf-pricedisplay', product['price']),
+                ('sf-optionsuffix', product['option_suffix']), ('sf-regoptiondesc', product['regoptiondesc']),
+                ('sale-dates', product['offer_valid']), ('sf-comparativeText', product['comparative_text']),
+            ]
+            if product['sale_price'] != 'NA':
+                fields.append(('sf-saleoptiontext', product['sale_price']))
+            if product['regular_price'] != 'NA':
+                fields.append(('sf-regprice', product['regular_price']))
+            if product['sale_option'] != 'NA':
+                fields.append(('sf-saleoptiondesc', product['sale_option']))
+            image = (f'<img src="/assets/products/{category_index}-{page}-{position}.png" alt="">'
+                     if self.assets else '')
+            items.append('<div class="sf-item-content">' + image + ''.join(
+                f'<span class="{name}">{html.escape(value)}</span>' for name, value in fields) + '</div>')
+
+        pagination = f'<a aria-current="page" href="{self.view_url(category_index, page)}">{page}</a>'
+        if page < self.pages_per_category:
+            pagination += f'<a aria-label="Next page" href="{self.view_url(category_index, page + 1)}">Next</a>'
+
+        style = ('<style>@font-face{font-family:Catalogue;src:url(/assets/fonts/catalogue.woff2)}'
+                 'body{font-family:Catalogue,sans-serif}</style>' if self.assets else '')
+        return f"""<!DOCTYPE html><html><head><title>{html.escape(self.categories[category_index])}</title>{style}</head>
+<body><nav><button id="sf-navcategory-button">Categories</button><ul>{links}</ul></nav>
+<main>{''.join(items)}</main><footer>{pagination}</footer></body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fixture = None
+    pages_dir = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        asset = asset_body(url.path) if self.fixture is not None and self.fixture.assets else None
+        if asset:
+            content_type, data = asset
+        else:
+            body = self._saved_page(url) if self.pages_dir else self._generated_page(url)
+            if body is None:
+                self.send_error(404)
+                return
+            content_type, data = 'text/html; charset=utf-8', body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _generated_page(self, url):
+        if url.path == '/shop/catalogue':
+            return self.fixture.landing_page()
+        if url.path == '/catalogue/view':
+            query = parse_qs(url.query)
+            category = int(query.get('category', ['0'])[0])
+            page = int(query.get('page', ['1'])[0])
+            if 0 <= category < len(self.fixture.categories) and 1 <= page <= self.fixture.pages_per_category:
+                return self.fixture.listing_page(category, page)
+        return None
+
+    def _saved_page(self, url):
+        name = url.path.strip('/') or 'index'
+        if url.query:
+            name = os.path.join(name, url.query.replace('/', '_'))
+        path = os.path.normpath(os.path.join(self.pages_dir, name + '.html'))
+        if not path.startswith(os.path.abspath(self.pages_dir)) or not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+
+class CatalogueServer:
+    """
+    Serves a CatalogueFixture, or a directory of saved pages, on localhost.
+
+    Use as a context manager; url is the catalogue landing page.
+    """
+    def __init__(self, fixture, pages_dir=None):
+        handler = type('CatalogueHandler', (_Handler,), {
+            'fixture': fixture, 'pages_dir': os.path.abspath(pages_dir) if pages_dir else None
+        })
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/shop/catalogue"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
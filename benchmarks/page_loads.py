@@ -0,0 +1,105 @@
+# benchmarks/page_loads.py
+"""
+Measure catalogue page loads with and without BLOCK_RESOURCES.
+
+A Market is started once with resource blocking off and once with it on.
+Each one loads every listing page of the fixture catalogue, or of a
+directory of saved pages. The fixture is generated with a product image
+per item and a web font, so there is something to block. For each setting
+the report gives:
+  - browser startup time;
+  - mean wall time of a page load;
+  - mean load event time, from the Navigation Timing API;
+  - resources requested and bytes transferred per page;
+  - the largest JS heap.
+
+Both settings must extract the same number of products from each page,
+so blocking is shown not to hide anything the scraper reads. Otherwise
+the script exits with status 1.
+
+Chrome is required: set CHROME_BINARY and CHROMEDRIVER_PATH. Without it the
+script prints a note and exits.
+
+Usage:
+    python benchmarks/page_loads.py [--categories 4] [--pages 2] [--pages-dir DIR]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pipeline
+from extraction import listing_pages
+from fixtures import CatalogueFixture, CatalogueServer
+
+sys.path.insert(0, os.path.join(pipeline.SRC, 'scraper_function'))
+
+
+def measure(origin, pages, block_resources):
+    """
+    Load every page in a new Market and collect its page metrics.
+
+    Returns:
+        dict: Startup seconds, per-page wall seconds, metrics and product counts.
+    """
+    from market import Market
+
+    start = time.perf_counter()
+    market = Market(block_resources=block_resources)
+    run = {'startup': time.perf_counter() - start, 'wall': [], 'metrics': [], 'products': []}
+    try:
+        for path, _ in pages:
+            start = time.perf_counter()
+            market.get(origin + path)
+            run['wall'].append(time.perf_counter() - start)
+            run['metrics'].append(market.page_metrics())
+            run['products'].append(len(market.product_extractor.get_products_from_current_page()))
+    finally:
+        market.shutdown()
+    return run
+
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--categories', type=int, default=4, help='fixture categories')
+    parser.add_argument('--pages', type=int, default=2, help='listing pages per category')
+    parser.add_argument('--pages-dir', help='serve saved catalogue pages instead of generated ones')
+    args = parser.parse_args()
+
+    if not pipeline.chrome_available():
+        print('resource blocking: skipped, chromedriver not found (set CHROME_BINARY and CHROMEDRIVER_PATH)',
+              file=sys.stderr)
+        return 0
+
+    fixture = CatalogueFixture(categories=args.categories, pages_per_category=args.pages, assets=True)
+    pages = listing_pages(fixture, args.pages_dir)
+    with CatalogueServer(fixture, args.pages_dir) as server:
+        origin = server.url[:-len('/shop/catalogue')]
+        runs = {'unblocked': measure(origin, pages, False), 'blocked': measure(origin, pages, True)}
+
+    print(f"{len(pages)} pages, {sum(runs['unblocked']['products'])} products")
+    print(f"{'setting':<11}{'startup':>10}{'wall':>10}{'load':>10}{'requests':>10}{'KiB/page':>10}{'heap MiB':>10}")
+    for name, run in runs.items():
+        page_metrics = run['metrics']
+        heap = max((metrics.get('js_heap_bytes') or 0 for metrics in page_metrics), default=0)
+        print(f"{name:<11}{run['startup']:>8.2f} s{mean(run['wall']) * 1000:>7.0f} ms"
+              f"{mean(metrics.get('load_ms') for metrics in page_metrics):>7.0f} ms"
+              f"{mean(metrics.get('resource_count') for metrics in page_metrics):>10.1f}"
+              f"{mean(metrics.get('bytes_transferred') for metrics in page_metrics) / 1024:>10.0f}"
+              f"{heap / 1024 / 1024:>10.1f}")
+
+    if runs['blocked']['products'] != runs['unblocked']['products']:
+        print(f"product counts differ: unblocked {runs['unblocked']['products']}, "
+              f"blocked {runs['blocked']['products']}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+# benchmarks/pipeline.py
+"""
+Benchmark the scrape, store, index and match pipeline offline.
+
+Every stage runs the functions' own code against local stand-ins, with no
+AWS account and no internet access:
+  - scrape: Market scrapes a generated catalogue served on localhost
+    (benchmarks/fixtures.py). Needs Chrome and chromedriver, found through
+    CHROME_BINARY and CHROMEDRIVER_PATH; the stage is skipped without them.
+  - store: the scraper's write path (normalise_prices, build_product_item,
+    ChangeDetector, BatchWriter) puts the catalogue into an in-memory
+    ProductCatalogTable for every postcode.
+  - index: the indexer handler sends the table's stream records to a local
+    OpenSearch stand-in in stream-sized batches.
+  - match: the matcher handles the same stream batches (incremental match),
+    then runs the scheduled full match of every user request.
+  - replay: the recorded API Gateway and stream events in test_events/ are
+    sent to the user request handler and the UniquePostcodes updater.
+
+Rates are reported per stage and can be saved as a baseline and compared
+against later runs.
+
+Usage:
+    python benchmarks/pipeline.py [--postcodes 20] [--requests-per-postcode 50]
+        [--latency-ms 0] [--snapshots] [--save-baseline [PATH]] [--compare [PATH]] [--json]
+"""
+
+import io
+import os
+import sys
+import json
+import glob
+import time
+import random
+import shutil
+import logging
+import tempfile
+import argparse
+import platform
+import importlib.util
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS, 'baseline.json')
+
+sys.path.insert(0, os.path.join(SRC, 'layers', 'common_layer', 'python'))
+sys.path.insert(0, BENCHMARKS)
+
+# The stand-ins replace every AWS call; these keep boto3 from looking for a region or instance credentials
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-southeast-2')
+os.environ.setdefault('AWS_EC2_METADATA_DISABLED', 'true')
+os.environ.setdefault('USER_REQUESTS_TABLE', 'UserRequestsTable')
+os.environ.setdefault('UNIQUE_POSTCODES_TABLE', 'UniquePostcodesTable')
+# The SNS stand-in has no sending limit, so the dispatcher's rate limit would only measure sleeps
+os.environ.setdefault('SMS_RATE_PER_SECOND', '1000000')
+
+from fixtures import CatalogueFixture, CatalogueServer  # noqa: E402
+from standins import InMemoryDynamoDB, OpenSearchStandIn, SNSStandIn  # noqa: E402
+from common.snapshots import SnapshotStore  # noqa: E402
+
+KEY_SCHEMAS = {
+    'UserRequestsTable': ('POSTCODE', 'ProductName'),
+    'UniquePostcodesTable': ('POSTCODE',),
+    'PostcodeRequestCountsTable': ('POSTCODE',),
+    'ProductCatalogTable': ('POSTCODE', 'ProductName'),
+    'CatalogueTable': ('CatalogueID',),
+    'PostcodeCatalogueTable': ('POSTCODE',),
+    'ScrapeCheckpointTable': ('POSTCODE',),
+    'NotificationLedgerTable': ('LedgerKey',),
+}
+# Stream batch size of the indexer and matcher event sources
+STREAM_BATCH_SIZE = 500
+
+
+def load_function(name):
+    """
+    Import a function's app module under a unique name, with its directory importable.
+    """
+    directory = os.path.join(SRC, name)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(f"{name}_app", os.path.join(directory, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def chrome_available():
+    return os.path.exists(os.environ.get('CHROMEDRIVER_PATH', '/opt/chromedriver'))
+
+
+def request_items(fixture, postcodes, per_postcode, seed=11):
+    """
+    Generate UserRequestsTable items that search for fixture products.
+    """
+    rng = random.Random(seed)
+    names = sorted({' '.join(product['ProductName'].split()[:-2]) for _, product in fixture.all_products()})
+    items = []
+    for postcode in postcodes:
+        for name in rng.sample(names, min(per_postcode, len(names))):
+            items.append({
+                'POSTCODE': str(postcode),
+                'ProductName': name,
+                'RequestID': f"{rng.getrandbits(128):032x}",
+                'PhoneNumber': f"04{rng.randint(0, 99999999):08d}",
+                'Discount': rng.choice([0, 10, 20, 30, 40]),
+                'Timestamp': rng.randint(1, 300000)
+            })
+    return items
+
+
+class LambdaContext:
+    def get_remaining_time_in_millis(self):
+        return 300000
+
+
+def result(count, seconds, unit):
+    return {'count': count, 'seconds': round(seconds, 4), 'rate': round(count / seconds, 1) if seconds else 0.0,
+            'unit': unit}
+
+
+def stage_scrape(fixture, dynamodb, postcode):
+    """
+    Scrape the fixture catalogue for one postcode with the real Market.
+    """
+    with CatalogueServer(fixture) as server:
+        os.environ['CATALOGUE_URL'] = server.url
+        scraper = load_function('scraper_function')
+        scraper.dynamodb = dynamodb
+        scraper.product_table = dynamodb.Table('ProductCatalogTable')
+        scraper.catalogue_registry = scraper.CatalogueRegistry(dynamodb, scraper.product_table)
+        scraper.checkpoint_store = scraper.CheckpointStore(dynamodb)
+        try:
+            start = time.perf_counter()
+            scraper.scrape_postcode(postcode)
+            seconds = time.perf_counter() - start
+        finally:
+            scraper.driver_manager.shutdown_all()
+    return result(fixture.product_count, seconds, 'products/s')
+
+
+def catalogue_items(fixture, postcode):
+    """
+    Build a postcode's ProductCatalogTable items from the fixture, as the scraper does.
+    """
+    sys.path.insert(0, os.path.join(SRC, 'scraper_function'))
+    from prices import normalise_prices
+    from market import Market
+
+    return normalise_prices([
+        Market.build_product_item(None, product, postcode, category) for category, product in fixture.all_products()
+    ])
+
+
+def stage_store(fixture, dynamodb, postcodes, snapshots=None):
+    """
+    Run the scraper's write path for the whole catalogue in every postcode,
+    writing each postcode's snapshot too when a SnapshotStore is given.
+    """
+    sys.path.insert(0, os.path.join(SRC, 'scraper_function'))
+    from batch_writer import BatchWriter
+    from change_detection import ChangeDetector
+
+    product_table = dynamodb.Table('ProductCatalogTable')
+    written = 0
+    start = time.perf_counter()
+    for postcode in postcodes:
+        writer = BatchWriter(dynamodb, product_table.name)
+        detector = ChangeDetector(product_table, postcode)
+        items = catalogue_items(fixture, postcode)
+        writer.put_items(detector.filter_changed(items))
+        written += writer.counts['written']
+        if snapshots is not None:
+            snapshots.save(postcode, items)
+    return result(written, time.perf_counter() - start, 'items/s')
+
+
+def stage_index(indexer, batches, opensearch):
+    start = time.perf_counter()
+    for batch in batches:
+        indexer.lambda_handler({'Records': batch}, None)
+    seconds = time.perf_counter() - start
+    return result(opensearch.document_count('products'), seconds, 'docs/s')
+
+
+def stage_match(matcher, batches, sns):
+    start = time.perf_counter()
+    products = 0
+    for batch in batches:
+        products += json.loads(matcher.lambda_handler({'Records': batch}, None)['body'])['products']
+    incremental = result(products, time.perf_counter() - start, 'products/s')
+
+    start = time.perf_counter()
+    counts = json.loads(matcher.lambda_handler({}, None)['body'])
+    full = result(counts['requests'], time.perf_counter() - start, 'requests/s')
+    full['notifications'] = len(sns.messages)
+    return incremental, full
+
+
+def stage_replay(handler, updater):
+    """
+    Send the recorded test events to the user request handler and the UniquePostcodes updater.
+
+    Bulk endpoints answer 200 even when entries fail, so their failed entry
+    counts are reported next to the statuses.
+    """
+    events = sorted(glob.glob(os.path.join(ROOT, 'test_events', 'api-*.json')))
+    statuses = {}
+    bulk_failures = {}
+    start = time.perf_counter()
+    for path in events:
+        with open(path) as f:
+            response = handler.lambda_handler(json.load(f), LambdaContext())
+        statuses[os.path.basename(path)] = response['statusCode']
+        if path.endswith('-bulk.json') and response['statusCode'] == 200:
+            bulk_failures[os.path.basename(path)] = json.loads(response['body'])['Failed']
+    with open(os.path.join(ROOT, 'test_events', 'dynamodb_stream_event.json')) as f:
+        updater.lambda_handler(json.load(f), LambdaContext())
+    replay = result(len(events) + 1, time.perf_counter() - start, 'events/s')
+    replay['statuses'] = statuses
+    replay['bulk_failures'] = bulk_failures
+    return replay
+
+
+def run(args):
+    fixture = CatalogueFixture(categories=args.categories, pages_per_category=args.pages,
+                               products_per_page=args.products_per_page)
+    postcodes = [str(3000 + number) for number in range(args.postcodes)]
+    latency = args.latency_ms / 1000
+    dynamodb = InMemoryDynamoDB(KEY_SCHEMAS, latency=latency, streams={'ProductCatalogTable'})
+    sns = SNSStandIn(latency=latency)
+    dynamodb.Table('UserRequestsTable').load(request_items(fixture, postcodes, args.requests_per_postcode))
+
+    stages = {}
+    quiet = io.StringIO()
+    logging.disable(logging.INFO)
+
+    if args.skip_scrape:
+        print('scrape: skipped (--skip-scrape)', file=sys.stderr)
+    elif not chrome_available():
+        print('scrape: skipped, chromedriver not found (set CHROME_BINARY and CHROMEDRIVER_PATH)', file=sys.stderr)
+    else:
+        scrape_db = InMemoryDynamoDB(KEY_SCHEMAS, latency=latency)
+        with redirect_stdout(quiet):
+            stages['scrape'] = stage_scrape(fixture, scrape_db, postcodes[0])
+
+    with redirect_stdout(quiet):
+        stages['store'] = stage_store(fixture, dynamodb, postcodes, SnapshotStore.from_environment())
+
+    records = dynamodb.Table('ProductCatalogTable').take_stream()
+    batches = [records[start:start + STREAM_BATCH_SIZE] for start in range(0, len(records), STREAM_BATCH_SIZE)]
+
+    with OpenSearchStandIn() as opensearch:
+        os.environ['OPENSEARCH_ENDPOINT'] = opensearch.endpoint
+        # The functions resolve their AWS resources through common.aws, which is primed with the stand-ins
+        from common import aws
+        aws._resources['dynamodb'] = dynamodb
+        aws._clients['sns'] = sns
+
+        with redirect_stdout(quiet):
+            indexer = load_function('indexer_function')
+            matcher = load_function('matcher_function')
+            stages['index'] = stage_index(indexer, batches, opensearch)
+            stages['match_incremental'], stages['match_full'] = stage_match(matcher, batches, sns)
+
+            handler = load_function('user_request_handler')
+            updater = load_function('unique_postcode_updater')
+            stages['replay'] = stage_replay(handler, updater)
+
+    logging.disable(logging.NOTSET)
+    return {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'config': {'postcodes': args.postcodes, 'products_per_postcode': fixture.product_count,
+                   'requests_per_postcode': args.requests_per_postcode, 'latency_ms': args.latency_ms,
+                   'local_index_max_products': int(os.environ.get('LOCAL_INDEX_MAX_PRODUCTS', '5000')),
+                   'snapshots': bool(os.environ.get('SNAPSHOT_LOCATION'))},
+        'stages': stages
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each stage's rate next to the baseline's.
+
+    Returns:
+        list: The stages whose rate fell by more than the tolerance.
+    """
+    regressions = []
+    if baseline.get('config') != results['config']:
+        print(f"note: baseline config {baseline.get('config')} differs from {results['config']}")
+    print(f"{'stage':<20}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, stage in results['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if not before or not before['rate']:
+            print(f"{name:<20}{'-':>14}{stage['rate']:>14.1f}{'':>10}  {stage['unit']}")
+            continue
+        change = (stage['rate'] - before['rate']) / before['rate']
+        flag = '  REGRESSION' if change < -tolerance else ''
+        print(f"{name:<20}{before['rate']:>14.1f}{stage['rate']:>14.1f}{change:>+10.1%}  {stage['unit']}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--postcodes', type=int, default=20, help='postcodes stored, indexed and matched')
+    parser.add_argument('--requests-per-postcode', type=int, default=50, help='user requests per postcode')
+    parser.add_argument('--categories', type=int, default=12, help='catalogue categories')
+    parser.add_argument('--pages', type=int, default=4, help='listing pages per category')
+    parser.add_argument('--products-per-page', type=int, default=36, help='products per listing page')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latency added to every DynamoDB and SNS call')
+    parser.add_argument('--skip-scrape', action='store_true', help='do not start Chrome')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help=f"save the results as the baseline (default {os.path.relpath(DEFAULT_BASELINE, ROOT)})")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, metavar='PATH',
+                        help='compare with a saved baseline; exits with 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed rate drop before a regression')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--snapshots', action='store_true',
+                        help='write catalogue snapshots in the store stage and let the matcher read them')
+    parser.add_argument('--local-index-max-products', type=int, default=None,
+                        help='the matcher\'s LOCAL_INDEX_MAX_PRODUCTS; 0 sends every search to OpenSearch')
+    args = parser.parse_args()
+    if args.local_index_max_products is not None:
+        os.environ['LOCAL_INDEX_MAX_PRODUCTS'] = str(args.local_index_max_products)
+    snapshot_dir = tempfile.mkdtemp() if args.snapshots else None
+    if snapshot_dir:
+        os.environ['SNAPSHOT_LOCATION'] = snapshot_dir
+
+    try:
+        results = run(args)
+    finally:
+        if snapshot_dir:
+            shutil.rmtree(snapshot_dir)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    elif not args.compare:
+        for name, stage in results['stages'].items():
+            print(f"{name:<20}{stage['count']:>8} in {stage['seconds']:>8.3f}s  {stage['rate']:>12.1f} {stage['unit']}")
+        if 'replay' in results['stages']:
+            print(f"replay statuses: {results['stages']['replay']['statuses']}")
+            print(f"replay bulk failures: {results['stages']['replay']['bulk_failures']}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/product_index.py
+"""
+Compare the matcher's in-memory ProductNameIndex with its OpenSearch path.
+
+One postcode's fixture catalogue is indexed both ways, and the same user
+requests are then searched against each:
+  - local: ProductNameIndex is built from the catalogue items, and each
+    request is one search() call.
+  - opensearch: the catalogue is bulk indexed into the local OpenSearch
+    stand-in, and the requests are sent as _msearch batches of
+    MSEARCH_BATCH_SIZE, the way search_group sends them.
+
+The stand-in answers on localhost, so the OpenSearch numbers are a lower
+bound. --rtt-ms adds a network round trip to each _msearch request. The
+report gives the index build time, its array sizes, the time per request
+for each path, and how many requests found a match on each path. The
+stand-in only approximates OpenSearch's fuzziness, so the matched counts
+are a rough check rather than an exact comparison.
+
+Usage:
+    python benchmarks/product_index.py [--requests 500] [--repeat 5] [--rtt-ms 0]
+"""
+
+import os
+import sys
+import time
+import argparse
+from array import array
+
+import pipeline
+from fixtures import CatalogueFixture
+from standins import OpenSearchStandIn
+
+sys.path.insert(0, os.path.join(pipeline.SRC, 'matcher_function'))
+from product_index import ProductNameIndex  # noqa: E402
+
+from common.opensearch import OPENSEARCH_INDEX, OpenSearchClient, dumps, product_document_id  # noqa: E402
+
+POSTCODE = '3000'
+MSEARCH_BATCH_SIZE = 100
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def index_bytes(index):
+    return sum(value.itemsize * len(value) for value in vars(index).values() if isinstance(value, array))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500, help='user requests searched')
+    parser.add_argument('--repeat', type=int, default=5, help='repeats; the fastest is reported')
+    parser.add_argument('--rtt-ms', type=float, default=0.0, help='network round trip added to each _msearch')
+    parser.add_argument('--pages', type=int, default=4, help='listing pages per category')
+    args = parser.parse_args()
+
+    fixture = CatalogueFixture(pages_per_category=args.pages)
+    items = pipeline.catalogue_items(fixture, POSTCODE)
+    requests = pipeline.request_items(fixture, [POSTCODE], args.requests)
+    # A few misspellings, which both paths should tolerate
+    for request in requests[::7]:
+        request['ProductName'] = request['ProductName'].replace('e', 'a', 1)
+
+    matcher = pipeline.load_function('matcher_function')
+
+    build_seconds = best_of(args.repeat, lambda: ProductNameIndex.from_items(items, matcher.discount_percent))
+    index = ProductNameIndex.from_items(items, matcher.discount_percent)
+
+    def search_local():
+        return [index.search(request['ProductName'], float(request.get('Discount') or 0),
+                             matcher.MAX_MATCHES_PER_REQUEST) for request in requests]
+
+    # The first pass fills the query term cache, which warm invocations also keep
+    local_results = search_local()
+    local_seconds = best_of(args.repeat, search_local)
+
+    with OpenSearchStandIn() as standin:
+        client = OpenSearchClient(standin.endpoint)
+        lines = []
+        for item in items:
+            lines.append(dumps({'index': {'_index': OPENSEARCH_INDEX,
+                                          '_id': product_document_id(item['POSTCODE'], item['ProductName'])}}))
+            lines.append(dumps(item))
+        client.bulk(lines)
+
+        searches = [matcher.build_search(request) for request in requests]
+
+        def search_opensearch():
+            responses = []
+            for start in range(0, len(searches), MSEARCH_BATCH_SIZE):
+                if args.rtt_ms:
+                    time.sleep(args.rtt_ms / 1000)
+                responses.extend(client.msearch(OPENSEARCH_INDEX, searches[start:start + MSEARCH_BATCH_SIZE]))
+            return responses
+
+        opensearch_results = search_opensearch()
+        opensearch_seconds = best_of(args.repeat, search_opensearch)
+
+    local_matched = sum(1 for products in local_results if products)
+    opensearch_matched = sum(1 for response in opensearch_results if response['hits']['hits'])
+
+    print(f"catalogue: {len(items)} products, {len(index.terms)} terms, {len(index.trigram_ids)} trigrams")
+    print(f"index build: {build_seconds * 1000:.1f} ms, postings and discounts {index_bytes(index) / 1024:.1f} KiB")
+    print(f"{'path':<12}{'per request':>14}{'requests/s':>14}{'matched':>10}")
+    for name, seconds, matched in (('local', local_seconds, local_matched),
+                                   ('opensearch', opensearch_seconds, opensearch_matched)):
+        print(f"{name:<12}{seconds / len(requests) * 1e6:>11.1f} us{len(requests) / seconds:>14.0f}"
+              f"{matched:>10}")
+    print(f"the local index pays for its build after "
+          f"{build_seconds / max(opensearch_seconds / len(requests) - local_seconds / len(requests), 1e-9):.0f} "
+          f"requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/responses.py
+"""
+Measure how long common.utils.respond takes to encode large /listrequests pages.
+
+A listing of generated UserRequests items is encoded four ways, and the
+fastest of several repeats is reported for each:
+  - baseline: json.dumps(..., cls=DecimalEncoder)
+  - respond without compression
+  - baseline followed by gzip and base64
+  - respond with Accept-Encoding: gzip
+
+Usage:
+    python benchmarks/responses.py [--items 10000] [--repeat 7]
+"""
+
+import os
+import sys
+import gzip
+import json
+import base64
+import random
+import timeit
+import argparse
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'layers', 'common_layer', 'python'))
+
+from common import utils  # noqa: E402
+
+
+def listing(count, seed=1):
+    rng = random.Random(seed)
+    items = [{
+        'RequestID': f"{rng.getrandbits(128):032x}",
+        'Postcode': str(rng.randint(2000, 7999)),
+        'ProductName': rng.choice(['Cat Litter 15L', 'Tim Tam Original 200g', 'Coca-Cola 24 x 375mL',
+                                   'Finish Quantum Dishwasher Tablets 60 Pack', 'Devondale Butter 500g']),
+        'Discount': Decimal(rng.randint(5, 60)),
+        'PhoneNumber': f"04{rng.randint(0, 99999999):08d}",
+        'Timestamp': Decimal(rng.randint(1, 300000))
+    } for _ in range(count)]
+    return {'Items': items, 'Count': count, 'NextToken': None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10000, help='items in the listing')
+    parser.add_argument('--repeat', type=int, default=7, help='repeats; the fastest is reported')
+    args = parser.parse_args()
+
+    body = listing(args.items)
+    gzip_event = {'headers': {'Accept-Encoding': 'gzip'}}
+
+    baseline = json.dumps(body, cls=utils.DecimalEncoder)
+    assert utils.respond(200, body)['body'] == baseline
+    compressed = utils.respond(200, body, gzip_event)
+    assert gzip.decompress(base64.b64decode(compressed['body'])).decode('utf-8') == baseline
+
+    cases = {
+        'json.dumps(cls=DecimalEncoder)': lambda: json.dumps(body, cls=utils.DecimalEncoder),
+        'respond': lambda: utils.respond(200, body),
+        'json.dumps + gzip + base64': lambda: base64.b64encode(
+            gzip.compress(json.dumps(body, cls=utils.DecimalEncoder).encode('utf-8'), 6)),
+        'respond (Accept-Encoding: gzip)': lambda: utils.respond(200, body, gzip_event),
+    }
+
+    print(f"{args.items} items: {len(baseline)} bytes of JSON, {len(compressed['body'])} bytes gzipped and base64-encoded")
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        print(f"{name:<36}{best * 1000:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/snapshots.py
+"""
+Compare loading a postcode's catalogue from ProductCatalogTable and from its snapshot.
+
+The fixture catalogue of one postcode is stored in the in-memory
+ProductCatalogTable stand-in and written as a snapshot to a temporary
+directory. Each path then does the same work:
+  - load: read the whole catalogue. For the table this is a paginated
+    Query; each page pays --latency-ms, and items come back as dicts.
+    For the snapshot it is one file, memory-mapped.
+  - scan: total PriceCents and count the products with DiscountPercent of
+    at least 30. For the table this reads the item dicts; for the snapshot
+    it reads the columns.
+  - index: build the matcher's ProductNameIndex.
+
+The report also gives the DynamoDB JSON size of the catalogue, the read
+units a Query would consume (4 KB per unit, eventually consistent), and
+the snapshot size.
+
+Usage:
+    python benchmarks/snapshots.py [--pages 4] [--latency-ms 5] [--repeat 5]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+
+import pipeline
+from fixtures import CatalogueFixture
+from standins import InMemoryDynamoDB, _serialize
+
+sys.path.insert(0, os.path.join(pipeline.SRC, 'matcher_function'))
+from product_index import ProductIndexCache, ProductNameIndex  # noqa: E402
+
+from common.snapshots import NULL_INT, SnapshotStore  # noqa: E402
+
+POSTCODE = '3000'
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=4, help='listing pages per category')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='latency of each Query page')
+    parser.add_argument('--repeat', type=int, default=5, help='repeats; the fastest is reported')
+    args = parser.parse_args()
+
+    items = pipeline.catalogue_items(CatalogueFixture(pages_per_category=args.pages), POSTCODE)
+    dynamodb = InMemoryDynamoDB(pipeline.KEY_SCHEMAS, latency=args.latency_ms / 1000)
+    table = dynamodb.Table('ProductCatalogTable')
+    table.load(items)
+    table_bytes = sum(len(json.dumps(_serialize(item))) for item in items)
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = SnapshotStore(directory)
+        snapshot_bytes = store.save(POSTCODE, items)
+        # Query pagination is all the cache needs from the table; no product limit
+        loader = ProductIndexCache(table, max_products=math.inf)
+
+        def scan_items(products):
+            total = sum(int(product.get('PriceCents', 0)) for product in products)
+            return total, sum(1 for product in products if float(product.get('DiscountPercent', 0)) >= 30)
+
+        def scan_snapshot(snapshot):
+            prices = snapshot.column('PriceCents')
+            discounts = snapshot.column('DiscountPercent')
+            total = sum(price for price in prices if price != NULL_INT)
+            return total, sum(1 for discount in discounts if discount >= 30)
+
+        def table_load():
+            return loader._load_products(POSTCODE)
+
+        def snapshot_load():
+            snapshot = store.load(POSTCODE)
+            snapshot.column('ProductName')
+            return snapshot
+
+        products = table_load()
+        snapshot = snapshot_load()
+        assert scan_items(products) == scan_snapshot(snapshot)
+
+        timings = {
+            'table': (best_of(args.repeat, table_load),
+                      best_of(args.repeat, lambda: scan_items(products)),
+                      best_of(args.repeat, lambda: ProductNameIndex.from_items(products))),
+            'snapshot': (best_of(args.repeat, snapshot_load),
+                         best_of(args.repeat, lambda: scan_snapshot(store.load(POSTCODE))),
+                         best_of(args.repeat, lambda: ProductNameIndex.from_snapshot(store.load(POSTCODE)))),
+        }
+        pages = table.calls['Query'] // (1 + args.repeat)
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"catalogue: {len(items)} products, {table_bytes / 1024:.0f} KiB as DynamoDB JSON, "
+          f"about {math.ceil(table_bytes / 4096) / 2:.0f} read units per Query load in {pages} pages")
+    print(f"snapshot: {snapshot_bytes / 1024:.0f} KiB, one object read")
+    print(f"{'source':<10}{'load':>12}{'scan':>12}{'index':>12}")
+    for name, (load, scan, index) in timings.items():
+        print(f"{name:<10}{load * 1000:>9.2f} ms{scan * 1000:>9.2f} ms{index * 1000:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,495 @@
+# benchmarks/standins.py
+"""
+In-process stand-ins for DynamoDB, OpenSearch and SNS, so the benchmarks run offline.
+
+InMemoryDynamoDB exposes the subset of the boto3 DynamoDB resource the
+functions use. That covers Table get/put/delete/update/query/scan,
+batch_write_item and batch_get_item. Items are stored in DynamoDB JSON,
+so floats are rejected and numbers come back as Decimals, as they do from
+boto3. Every write is also recorded as a stream record in the format
+Lambda receives.
+
+OpenSearchStandIn is a local HTTP server that implements index creation,
+_bulk, and _msearch for the queries the matcher builds. The real OpenSearchClient (urllib3
+pool, NDJSON bodies) is exercised unchanged.
+
+An optional per-call latency is added to DynamoDB and SNS calls. This
+approximates the network round trips that batching saves.
+"""
+
+import re
+import json
+import time
+import uuid
+import bisect
+import threading
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.exceptions import ClientError
+
+# Query and Scan pages stop after about this many bytes of items
+PAGE_BYTES = 1024 * 1024
+# An update expression's SET, ADD and REMOVE clauses, and the assignments of a SET or ADD clause
+_UPDATE_CLAUSE = re.compile(r'\b(SET|ADD|REMOVE)\s+(.*?)(?=\s+\b(?:SET|ADD|REMOVE)\b|$)', re.IGNORECASE)
+_UPDATE_ASSIGNMENT = re.compile(r'([#\w]+)\s*=?\s*(?:if_not_exists\(\s*([#\w]+)\s*,\s*(:\w+)\s*\)|(:\w+))')
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+def _client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+def _serialize(item):
+    return {name: serializer.serialize(value) for name, value in item.items()}
+
+
+def _deserialize(image):
+    return {name: deserializer.deserialize(value) for name, value in image.items()}
+
+
+class InMemoryTable:
+    """
+    One DynamoDB table held in memory.
+
+    Args:
+        name (str): The table name.
+        key_names (tuple): The hash key, and the range key if there is one.
+        latency (float): Seconds added to every call.
+        stream (bool): Record INSERT, MODIFY and REMOVE stream records.
+    """
+    def __init__(self, name, key_names, latency=0.0, stream=False):
+        self.name = name
+        self.key_names = tuple(key_names)
+        self.latency = latency
+        self.stream_enabled = stream
+        self.stream = []
+        self.items = {}
+        self.sizes = {}
+        self.sorted_keys = []
+        self.calls = defaultdict(int)
+        self.lock = threading.RLock()
+
+    def _wait(self, operation):
+        self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _key(self, item, operation):
+        try:
+            return tuple(str(item[name]) for name in self.key_names)
+        except KeyError as e:
+            raise _client_error('ValidationException',
+                                f"One of the required keys was not given a value: {e.args[0]}", operation)
+
+    def _record(self, event_name, key, image):
+        if not self.stream_enabled:
+            return
+        keys = {name: serializer.serialize(value) for name, value in zip(self.key_names, key)}
+        record = {'eventName': event_name, 'eventSource': 'aws:dynamodb',
+                  'dynamodb': {'Keys': keys, 'StreamViewType': 'NEW_IMAGE'}}
+        if image is not None:
+            record['dynamodb']['NewImage'] = image
+        self.stream.append(record)
+
+    def _check_condition(self, key, condition, operation):
+        if not condition:
+            return
+        condition = condition.strip()
+        if condition.startswith('attribute_not_exists(') and key in self.items:
+            raise _client_error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+        if condition.startswith('attribute_exists(') and key not in self.items:
+            raise _client_error('ConditionalCheckFailedException', 'The conditional request failed', operation)
+
+    def _put(self, item, condition=None):
+        key = self._key(item, 'PutItem')
+        image = _serialize(item)
+        with self.lock:
+            self._check_condition(key, condition, 'PutItem')
+            existed = key in self.items
+            self.items[key] = image
+            self.sizes.pop(key, None)
+            if not existed:
+                bisect.insort(self.sorted_keys, key)
+            self._record('MODIFY' if existed else 'INSERT', key, image)
+
+    def _delete(self, key_values):
+        key = self._key(key_values, 'DeleteItem')
+        with self.lock:
+            if self.items.pop(key, None) is not None:
+                self.sorted_keys.pop(bisect.bisect_left(self.sorted_keys, key))
+                self._record('REMOVE', key, None)
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        self._wait('PutItem')
+        self._put(Item, ConditionExpression)
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        self._wait('GetItem')
+        image = self.items.get(self._key(Key, 'GetItem'))
+        return {'Item': _deserialize(image)} if image is not None else {}
+
+    def delete_item(self, Key, **kwargs):
+        self._wait('DeleteItem')
+        self._delete(Key)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, ReturnValues=None, **kwargs):
+        """
+        Apply SET (with if_not_exists), ADD and REMOVE clauses, the forms the functions use.
+        """
+        self._wait('UpdateItem')
+        key = self._key(Key, 'UpdateItem')
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+        with self.lock:
+            self._check_condition(key, ConditionExpression, 'UpdateItem')
+            old = _deserialize(self.items[key]) if key in self.items else {}
+            item = dict(old) or dict(Key)
+            changed = set()
+            for action, body in _UPDATE_CLAUSE.findall(UpdateExpression):
+                action = action.upper()
+                if action == 'REMOVE':
+                    for name in body.split(','):
+                        item.pop(names.get(name.strip(), name.strip()), None)
+                        changed.add(names.get(name.strip(), name.strip()))
+                    continue
+                for name, function, default, value in _UPDATE_ASSIGNMENT.findall(body):
+                    name = names.get(name, name)
+                    changed.add(name)
+                    if action == 'ADD':
+                        item[name] = item.get(name, 0) + values[value]
+                    elif function:
+                        item.setdefault(names.get(function, function), values[default])
+                    else:
+                        item[name] = values[value]
+            self._put(item)
+        if ReturnValues == 'UPDATED_OLD':
+            return {'Attributes': {name: old[name] for name in changed if name in old}}
+        return {'Attributes': item}
+
+    def _matches(self, key, condition):
+        expression = condition.get_expression()
+        operator = expression['operator']
+        if operator == 'AND':
+            return all(self._matches(key, part) for part in expression['values'])
+        attribute, *operands = expression['values']
+        value = key[self.key_names.index(attribute.name)]
+        operands = [str(operand) for operand in operands]
+        if operator == '=':
+            return value == operands[0]
+        if operator == 'begins_with':
+            return value.startswith(operands[0])
+        if operator == 'BETWEEN':
+            return operands[0] <= value <= operands[1]
+        return {'<': value < operands[0], '<=': value <= operands[0],
+                '>': value > operands[0], '>=': value >= operands[0]}[operator]
+
+    def _size(self, key):
+        size = self.sizes.get(key)
+        if size is None:
+            size = self.sizes[key] = len(json.dumps(self.items[key]))
+        return size
+
+    def _page(self, keys, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None, **kwargs):
+        """
+        Return one page of keys, stopping at Limit items or about 1 MB as DynamoDB does.
+        """
+        start = 0
+        if ExclusiveStartKey:
+            start = bisect.bisect_right(keys, self._key(ExclusiveStartKey, 'Query'))
+        projection = [name.strip() for name in ProjectionExpression.split(',')] if ProjectionExpression else None
+
+        items = []
+        end = start
+        size = 0
+        while end < len(keys) and (Limit is None or len(items) < Limit) and size < PAGE_BYTES:
+            image = self.items[keys[end]]
+            size += self._size(keys[end])
+            if projection:
+                image = {name: image[name] for name in projection if name in image}
+            items.append(_deserialize(image))
+            end += 1
+
+        response = {'Items': items, 'Count': len(items)}
+        if end < len(keys):
+            last = self.items[keys[end - 1]]
+            response['LastEvaluatedKey'] = {name: deserializer.deserialize(last[name]) for name in self.key_names}
+        return response
+
+    def query(self, KeyConditionExpression, **kwargs):
+        self._wait('Query')
+        with self.lock:
+            keys = [key for key in self.sorted_keys if self._matches(key, KeyConditionExpression)]
+            return self._page(keys, **kwargs)
+
+    def scan(self, Segment=None, TotalSegments=None, **kwargs):
+        self._wait('Scan')
+        with self.lock:
+            keys = self.sorted_keys
+            if TotalSegments:
+                keys = [key for key in keys if hash(key[0]) % TotalSegments == Segment]
+            return self._page(list(keys), **kwargs)
+
+    def load(self, items):
+        """
+        Seed the table without latency or stream records.
+        """
+        stream_enabled, self.stream_enabled = self.stream_enabled, False
+        for item in items:
+            self._put(item)
+        self.stream_enabled = stream_enabled
+
+    def take_stream(self):
+        """
+        Return and clear the recorded stream records.
+        """
+        with self.lock:
+            records, self.stream = self.stream, []
+        return records
+
+
+class InMemoryDynamoDB:
+    """
+    Stand-in for boto3.resource('dynamodb') holding InMemoryTables.
+
+    Args:
+        key_schemas (dict): Table name to its key attribute names. Unknown
+            tables are keyed on POSTCODE.
+        latency (float): Seconds added to every table call and batch.
+        streams (set): Names of the tables that record stream records.
+    """
+    def __init__(self, key_schemas=None, latency=0.0, streams=()):
+        self.key_schemas = key_schemas or {}
+        self.latency = latency
+        self.streams = set(streams)
+        self.tables = {}
+        self.calls = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def Table(self, name):
+        with self.lock:
+            if name not in self.tables:
+                self.tables[name] = InMemoryTable(name, self.key_schemas.get(name, ('POSTCODE',)),
+                                                  self.latency, stream=name in self.streams)
+            return self.tables[name]
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self.calls['BatchWriteItem'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise _client_error('ValidationException', 'Too many items requested for the BatchWriteItem call',
+                                    'BatchWriteItem')
+            table = self.Table(table_name)
+            # DynamoDB validates the whole batch before writing any of it
+            keys = [table._key(request['PutRequest']['Item'] if 'PutRequest' in request
+                               else request['DeleteRequest']['Key'], 'BatchWriteItem') for request in requests]
+            if len(set(keys)) < len(keys):
+                raise _client_error('ValidationException', 'Provided list of item keys contains duplicates',
+                                    'BatchWriteItem')
+            for request in requests:
+                if 'PutRequest' in request:
+                    table._put(request['PutRequest']['Item'])
+                else:
+                    table._delete(request['DeleteRequest']['Key'])
+        return {'UnprocessedItems': {}}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self.calls['BatchGetItem'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        responses = {}
+        for table_name, request in RequestItems.items():
+            if len(request['Keys']) > 100:
+                raise _client_error('ValidationException', 'Too many items requested for the BatchGetItem call',
+                                    'BatchGetItem')
+            table = self.Table(table_name)
+            projection = [name.strip() for name in request.get('ProjectionExpression', '').split(',') if name.strip()]
+            items = []
+            for key in request['Keys']:
+                image = table.items.get(table._key(key, 'BatchGetItem'))
+                if image is not None:
+                    item = _deserialize(image)
+                    items.append({name: item[name] for name in projection if name in item} if projection else item)
+            responses[table_name] = items
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class SNSStandIn:
+    """
+    Stand-in for the SNS client that records published SMS messages.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = []
+        self.lock = threading.Lock()
+
+    def publish(self, PhoneNumber=None, Message=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.messages.append((PhoneNumber, Message))
+        return {'MessageId': str(uuid.uuid4())}
+
+
+def _tokens(text):
+    return [token for token in ''.join(c if c.isalnum() else ' ' for c in str(text).lower()).split() if token]
+
+
+class _OpenSearchIndex:
+    def __init__(self):
+        self.documents = {}
+        # Postcode to term to document IDs
+        self.postings = defaultdict(lambda: defaultdict(set))
+
+    def put(self, doc_id, source):
+        self.delete(doc_id)
+        self.documents[doc_id] = source
+        postcode = str(source.get('POSTCODE'))
+        for term in set(_tokens(source.get('ProductName', ''))):
+            self.postings[postcode][term].add(doc_id)
+
+    def delete(self, doc_id):
+        source = self.documents.pop(doc_id, None)
+        if source is not None:
+            postcode = str(source.get('POSTCODE'))
+            for term in set(_tokens(source.get('ProductName', ''))):
+                self.postings[postcode][term].discard(doc_id)
+        return source is not None
+
+    def search(self, body):
+        query = body['query']['bool']
+        text = query['must'][0]['match']['ProductName']['query']
+        postcode, minimum = None, None
+        for condition in query.get('filter', []):
+            if 'term' in condition:
+                postcode = str(next(iter(condition['term'].values())))
+            elif 'range' in condition:
+                minimum = condition['range']['DiscountPercent']['gte']
+
+        postings = self.postings.get(postcode, {})
+        candidates = None
+        for term in _tokens(text):
+            # Exact terms, plus terms sharing all but the last two characters, approximate AUTO fuzziness
+            prefix = term[:max(3, len(term) - 2)]
+            ids = set()
+            for candidate_term, doc_ids in postings.items():
+                if candidate_term == term or candidate_term.startswith(prefix):
+                    ids |= doc_ids
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+
+        hits = []
+        for doc_id in sorted(candidates or ()):
+            source = self.documents[doc_id]
+            if minimum is not None and float(source.get('DiscountPercent', 0)) < minimum:
+                continue
+            hits.append({'_id': doc_id, '_source': source})
+            if len(hits) >= body.get('size', 10):
+                break
+        return {'hits': {'total': {'value': len(hits)}, 'hits': hits}}
+
+
+class OpenSearchStandIn:
+    """
+    Local HTTP server implementing the index creation, _bulk and _msearch calls of OpenSearchClient.
+
+    Use as a context manager; endpoint is the URL to set as OPENSEARCH_ENDPOINT.
+    """
+    def __init__(self):
+        self.indices = defaultdict(_OpenSearchIndex)
+        self.mappings = {}
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                status, response = standin.create_index(self.path.strip('/'), json.loads(body or '{}'))
+                self._respond(status, response)
+
+            def _respond(self, status, response):
+                data = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                lines = [line for line in body.split('\n') if line]
+                if self.path == '/_bulk':
+                    response = standin.bulk(lines)
+                elif self.path.endswith('/_msearch'):
+                    response = standin.msearch(self.path.strip('/').split('/')[0], lines)
+                else:
+                    self.send_error(404)
+                    return
+                self._respond(200, response)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def create_index(self, name, body):
+        self.requests['create_index'] += 1
+        with self.lock:
+            if name in self.indices:
+                return 400, {'error': {'type': 'resource_already_exists_exception', 'index': name}, 'status': 400}
+            self.indices[name] = _OpenSearchIndex()
+            self.mappings[name] = body.get('mappings', {})
+        return 200, {'acknowledged': True, 'index': name}
+
+    def bulk(self, lines):
+        self.requests['bulk'] += 1
+        items = []
+        position = 0
+        with self.lock:
+            while position < len(lines):
+                action = json.loads(lines[position])
+                operation, meta = next(iter(action.items()))
+                index = self.indices[meta.get('_index')]
+                if operation == 'delete':
+                    found = index.delete(meta['_id'])
+                    items.append({'delete': {'_id': meta['_id'], 'status': 200 if found else 404}})
+                    position += 1
+                else:
+                    index.put(meta['_id'], json.loads(lines[position + 1]))
+                    items.append({operation: {'_id': meta['_id'], 'status': 201}})
+                    position += 2
+        return {'took': 0, 'errors': False, 'items': items}
+
+    def msearch(self, index_name, lines):
+        self.requests['msearch'] += 1
+        index = self.indices[index_name]
+        with self.lock:
+            return {'responses': [index.search(json.loads(body)) for body in lines[1::2]]}
+
+    def document_count(self, index_name):
+        return len(self.indices[index_name].documents)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
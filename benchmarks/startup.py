@@ -0,0 +1,102 @@
+# benchmarks/startup.py
+"""
+Measure the cold-start cost of every Lambda function.
+
+Each function is imported in a fresh interpreter, the way a new Lambda
+container loads it. Two things are timed: importing its app module, and
+handling a first event that does not need AWS. The median of several runs
+is reported.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--json]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_LAYER = os.path.join(ROOT, 'src', 'layers', 'common_layer', 'python')
+
+# Function directory and a first event each function can handle without AWS
+FUNCTIONS = {
+    'user_request_handler': {'httpMethod': 'GET', 'path': '/notfound'},
+    'unique_postcode_updater': {'Records': []},
+    'indexer_function': {'Records': []},
+    'matcher_function': {'Records': []},
+    'scraper_function': {'Records': []},
+}
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+class Context:
+    def get_remaining_time_in_millis(self):
+        return 300000
+
+app.lambda_handler(json.loads(sys.argv[1]), Context())
+handled = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'first_request_ms': (handled - imported) * 1000,
+                  'modules': len(sys.modules)}))
+"""
+
+
+def probe(function, event):
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'ap-southeast-2')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    env['PYTHONPATH'] = os.pathsep.join([os.path.join(ROOT, 'src', function), COMMON_LAYER])
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, json.dumps(event)],
+        cwd=os.path.join(ROOT, 'src', function), env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{function} failed to start:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(runs):
+    results = {}
+    for function, event in FUNCTIONS.items():
+        try:
+            samples = [probe(function, event) for _ in range(runs)]
+        except RuntimeError as e:
+            results[function] = {'error': str(e).splitlines()[-1]}
+            continue
+        results[function] = {
+            'import_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+            'first_request_ms': round(statistics.median(s['first_request_ms'] for s in samples), 1),
+            'modules': samples[-1]['modules']
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='cold starts per function')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'function':<26}{'import ms':>12}{'first request ms':>20}{'modules':>10}")
+    for function, result in results.items():
+        if 'error' in result:
+            print(f"{function:<26}  {result['error']}")
+        else:
+            print(f"{function:<26}{result['import_ms']:>12}{result['first_request_ms']:>20}{result['modules']:>10}")
+
+
+if __name__ == '__main__':
+    main()
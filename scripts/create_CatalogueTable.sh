@@ -0,0 +1,24 @@
+#!/bin/bash
+
+# Variables
+TABLE_NAME="CatalogueTable"
+REGION="ap-southeast-2"
+
+# Create the DynamoDB table
+aws dynamodb create-table \
+    --table-name "$TABLE_NAME" \
+    --attribute-definitions AttributeName=CatalogueID,AttributeType=S \
+    --key-schema AttributeName=CatalogueID,KeyType=HASH \
+    --billing-mode PAY_PER_REQUEST \
+    --region "$REGION"
+
+# Wait for the table to be created
+aws dynamodb wait table-exists --table-name "$TABLE_NAME" --region "$REGION"
+
+# Expire catalogues once they are no longer valid
+aws dynamodb update-time-to-live \
+    --table-name "$TABLE_NAME" \
+    --time-to-live-specification Enabled=true,AttributeName=ValidUntil \
+    --region "$REGION"
+
+echo "Table $TABLE_NAME has been created successfully."
@@ -8,7 +8,7 @@ IMAGE_NAME="scraper-function"
 
 # Build the Docker image
 echo "Building Docker image..."
-docker build -t $IMAGE_NAME ./src/scraper_function
+docker build -t $IMAGE_NAME -f ./src/scraper_function/Dockerfile ./src
 
 # Log in to Amazon ECR
 echo "Logging in to Amazon ECR..."
@@ -0,0 +1,79 @@
+# src/indexer_function/app.py
+
+import os
+import json
+from boto3.dynamodb.types import TypeDeserializer
+from common.metrics import metrics
+from common.opensearch import (
+    OPENSEARCH_INDEX, PRODUCT_INDEX_BODY, OpenSearchClient, bulk_with_retries, dumps, product_document_id
+)
+
+BULK_MAX_BYTES = int(os.environ.get('BULK_MAX_BYTES', str(5 * 1024 * 1024)))
+
+deserializer = TypeDeserializer()
+
+# Created once per container so signed connections are reused across invocations
+opensearch = OpenSearchClient.from_environment()
+# Set once the index exists with its explicit mapping; checked once per container
+index_ready = False
+
+def lambda_handler(event, context):
+    """
+    Indexes ProductCatalogTable stream records into OpenSearch with _bulk requests.
+    INSERT and MODIFY records are indexed, REMOVE records are deleted.
+    """
+    actions = build_bulk_actions(event.get('Records', []))
+    if actions:
+        ensure_index()
+    with metrics.timer('BulkIndex'):
+        counts = bulk_with_retries(opensearch, actions, max_bytes=BULK_MAX_BYTES)
+    metrics.record('BulkIndex', 'Documents', len(actions), unit='Count')
+    metrics.flush()
+    print(f"Indexed stream batch of {len(actions)} documents: {counts}")
+
+    if counts['failed']:
+        # Fail the batch so the stream retries it; document IDs make replays idempotent
+        raise RuntimeError(f"{counts['failed']} documents could not be indexed")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(counts)
+    }
+
+def ensure_index():
+    """
+    Create the products index with its explicit mapping before the first bulk
+    request, so a bulk write never creates it with dynamic mapping.
+    """
+    global index_ready
+    if not index_ready:
+        if opensearch.create_index(OPENSEARCH_INDEX, PRODUCT_INDEX_BODY):
+            print(f"Created index {OPENSEARCH_INDEX} with its product mapping")
+        index_ready = True
+
+def build_bulk_actions(records):
+    """
+    Turn stream records into bulk actions, keeping only the latest record per document.
+
+    Args:
+        records (list): DynamoDB stream records from ProductCatalogTable.
+
+    Returns:
+        list: (action_line, source_line or None) pairs.
+    """
+    latest = {}
+    for record in records:
+        keys = _deserialize(record['dynamodb'].get('Keys', {}))
+        doc_id = product_document_id(keys.get('POSTCODE'), keys.get('ProductName'))
+        action = {'_index': OPENSEARCH_INDEX, '_id': doc_id}
+
+        if record['eventName'] == 'REMOVE':
+            latest[doc_id] = (dumps({'delete': action}), None)
+        else:
+            document = _deserialize(record['dynamodb'].get('NewImage', {}))
+            latest[doc_id] = (dumps({'index': action}), dumps(document))
+
+    return list(latest.values())
+
+def _deserialize(image):
+    return {name: deserializer.deserialize(value) for name, value in image.items()}
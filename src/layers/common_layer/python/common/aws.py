@@ -0,0 +1,103 @@
+# src/layers/common_layer/python/common/aws.py
+
+import os
+import threading
+
+# Connections kept open per client; match it to the concurrency of the calling function
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '25'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
+
+_lock = threading.Lock()
+_session = None
+_resources = {}
+_clients = {}
+_tables = {}
+
+
+def client_config():
+    """
+    Build the botocore Config shared by every client and resource.
+
+    Connections are pooled and kept alive, timeouts are short enough to fail
+    fast inside an API Gateway request, and throttled calls are retried with
+    the adaptive retry mode.
+
+    Returns:
+        botocore.config.Config: The config.
+    """
+    from botocore.config import Config
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        tcp_keepalive=True,
+        retries={'max_attempts': AWS_MAX_ATTEMPTS, 'mode': 'adaptive'}
+    )
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        # boto3 is imported on first use, so requests that never reach AWS don't pay for it
+        import boto3
+        _session = boto3.session.Session()
+    return _session
+
+
+def resource(service_name):
+    """
+    Get the cached boto3 resource for a service, creating it on first use.
+
+    Args:
+        service_name (str): The service, e.g. 'dynamodb'.
+
+    Returns:
+        boto3.resources.base.ServiceResource: The resource.
+    """
+    cached = _resources.get(service_name)
+    if cached is None:
+        with _lock:
+            cached = _resources.get(service_name)
+            if cached is None:
+                cached = _get_session().resource(service_name, config=client_config())
+                _resources[service_name] = cached
+    return cached
+
+
+def client(service_name):
+    """
+    Get the cached boto3 client for a service, creating it on first use.
+
+    Args:
+        service_name (str): The service, e.g. 'sns'.
+
+    Returns:
+        botocore.client.BaseClient: The client.
+    """
+    cached = _clients.get(service_name)
+    if cached is None:
+        with _lock:
+            cached = _clients.get(service_name)
+            if cached is None:
+                cached = _get_session().client(service_name, config=client_config())
+                _clients[service_name] = cached
+    return cached
+
+
+def table(table_name):
+    """
+    Get the cached DynamoDB Table for a table name.
+
+    Args:
+        table_name (str): The table name.
+
+    Returns:
+        boto3.resources.factory.dynamodb.Table: The table.
+    """
+    cached = _tables.get(table_name)
+    if cached is None:
+        cached = resource('dynamodb').Table(table_name)
+        _tables[table_name] = cached
+    return cached
@@ -0,0 +1,178 @@
+# src/layers/common_layer/python/common/metrics.py
+
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ProductNotifications')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# Also publish per-postcode and per-category metrics. Each combination is a separate
+# CloudWatch custom metric, so this is off by default; the values are always logged
+# as properties and can be queried with Logs Insights.
+METRICS_DETAILED_DIMENSIONS = os.environ.get('METRICS_DETAILED_DIMENSIONS', 'false').lower() == 'true'
+# Embedded Metric Format accepts at most 100 distinct values per metric per document
+MAX_VALUES_PER_DOCUMENT = 100
+
+
+def _bucket(value):
+    # Two significant digits keep a stage's histogram small without hiding outliers
+    return float(f"{value:.2g}") if value else 0.0
+
+
+class MetricsLogger:
+    """
+    Collects stage timings and counts in memory and writes them as CloudWatch
+    Embedded Metric Format (EMF) log lines.
+
+    Each sample costs a perf_counter call and a dictionary update under a lock;
+    nothing is written until flush(), which prints one EMF document per stage
+    and context with the values as a histogram (Values and Counts). Context
+    set with context() (e.g. Postcode and Category) is per thread, so worker
+    threads can each tag their own samples.
+    """
+    def __init__(self, namespace=METRICS_NAMESPACE, service=None, enabled=METRICS_ENABLED,
+                 detailed_dimensions=METRICS_DETAILED_DIMENSIONS):
+        self.namespace = namespace
+        self.service = service or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+        self.enabled = enabled
+        self.detailed_dimensions = detailed_dimensions
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.samples = {}
+
+    def _properties(self):
+        return getattr(self.local, 'properties', {})
+
+    @contextmanager
+    def context(self, **properties):
+        """
+        Tag every sample recorded by this thread inside the block with properties.
+
+        Args:
+            **properties: e.g. Postcode='2000', Category='Pantry'.
+        """
+        saved = self._properties()
+        self.local.properties = {**saved, **{name: str(value) for name, value in properties.items()}}
+        try:
+            yield
+        finally:
+            self.local.properties = saved
+
+    def record(self, stage, name, value, unit='Milliseconds'):
+        """
+        Record one sample.
+
+        Args:
+            stage (str): The pipeline stage, e.g. 'ExtractPage'.
+            name (str): The metric name, e.g. 'Duration' or 'Products'.
+            value (float): The sample.
+            unit (str): The CloudWatch unit.
+        """
+        if not self.enabled:
+            return
+        key = (stage, tuple(sorted(self._properties().items())))
+        with self.lock:
+            metrics = self.samples.setdefault(key, {})
+            _, histogram = metrics.setdefault(name, (unit, {}))
+            bucket = _bucket(value)
+            stats = histogram.setdefault(bucket, [0, 0.0, value, value])
+            stats[0] += 1
+            stats[1] += value
+            stats[2] = min(stats[2], value)
+            stats[3] = max(stats[3], value)
+
+    @contextmanager
+    def timer(self, stage, name='Duration'):
+        """
+        Time the block and record it in milliseconds, even if it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, stage):
+        """
+        Decorator that times every call of a function as the given stage.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(stage, 'Duration', (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+
+    def _dimensions(self, properties):
+        dimensions = [['Service', 'Stage']]
+        if self.detailed_dimensions:
+            for name in ('Postcode', 'Category'):
+                if name in properties:
+                    dimensions.append(dimensions[-1] + [name])
+        return dimensions
+
+    def documents(self):
+        """
+        Take the recorded samples and build their EMF documents.
+
+        Returns:
+            list: The EMF documents (dicts).
+        """
+        with self.lock:
+            samples, self.samples = self.samples, {}
+
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for (stage, properties), metrics in samples.items():
+            properties = dict(properties)
+            # A histogram with more distinct values than EMF allows is split across documents
+            for offset in range(0, max(len(histogram) for _, histogram in metrics.values()),
+                                MAX_VALUES_PER_DOCUMENT):
+                document = {
+                    '_aws': {
+                        'Timestamp': timestamp,
+                        'CloudWatchMetrics': [{
+                            'Namespace': self.namespace,
+                            'Dimensions': self._dimensions(properties),
+                            'Metrics': []
+                        }]
+                    },
+                    'Service': self.service,
+                    'Stage': stage,
+                    **properties
+                }
+                for name, (unit, histogram) in metrics.items():
+                    buckets = sorted(histogram.items())[offset:offset + MAX_VALUES_PER_DOCUMENT]
+                    if not buckets:
+                        continue
+                    document['_aws']['CloudWatchMetrics'][0]['Metrics'].append({'Name': name, 'Unit': unit})
+                    document[name] = {
+                        'Values': [value for value, _ in buckets],
+                        'Counts': [stats[0] for _, stats in buckets],
+                        'Count': sum(stats[0] for _, stats in buckets),
+                        'Sum': round(sum(stats[1] for _, stats in buckets), 3),
+                        'Min': round(min(stats[2] for _, stats in buckets), 3),
+                        'Max': round(max(stats[3] for _, stats in buckets), 3)
+                    }
+                documents.append(document)
+        return documents
+
+    def flush(self):
+        """
+        Print the recorded samples as EMF log lines and start over.
+
+        Lambda sends stdout to CloudWatch Logs, which turns each line into metrics.
+        """
+        for document in self.documents():
+            print(json.dumps(document, separators=(',', ':')))
+
+
+# Shared by everything in the container so one flush per invocation covers every stage
+metrics = MetricsLogger()
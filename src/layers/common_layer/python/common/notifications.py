@@ -0,0 +1,203 @@
+# src/layers/common_layer/python/common/notifications.py
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+NOTIFICATION_LEDGER_TABLE = os.environ.get('NOTIFICATION_LEDGER_TABLE', 'NotificationLedgerTable')
+# Account-level SMS throughput; SNS throttles anything above it
+SMS_RATE_PER_SECOND = float(os.environ.get('SMS_RATE_PER_SECOND', '10'))
+DISPATCH_CONCURRENCY = int(os.environ.get('DISPATCH_CONCURRENCY', '4'))
+# Ledger keys remembered in memory across warm invocations
+LEDGER_CACHE_SIZE = int(os.environ.get('LEDGER_CACHE_SIZE', '50000'))
+# Ledger entries outlive any catalogue offer period
+LEDGER_TTL_SECONDS = int(os.environ.get('LEDGER_TTL_SECONDS', str(30 * 24 * 3600)))
+
+THROTTLING_ERRORS = {'Throttling', 'ThrottlingException', 'Throttled', 'ThrottledException'}
+
+
+def ledger_key(request, product):
+    """
+    Build the ledger key for a (recipient, product, offer period) notification.
+
+    Args:
+        request (dict): The user request.
+        product (dict): The matched product.
+
+    Returns:
+        str: The ledger key.
+    """
+    recipient = request.get('RequestID') or request.get('PhoneNumber')
+    postcode = product.get('POSTCODE', '')
+    return f"{recipient}#{postcode}#{product.get('ProductName')}#{product.get('OfferValid', 'NA')}"
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket that spaces out calls to a fixed rate.
+    """
+    def __init__(self, rate_per_second, burst=1):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available and take it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class NotificationDispatcher:
+    """
+    Sends match notifications at most once per recipient, product and offer period.
+
+    Every notification is claimed in the ledger table with a conditional write
+    before it is published, so concurrent or repeated runs cannot send it twice.
+    Keys already known to be sent are kept in memory and skipped without a
+    DynamoDB read. Publishing runs on a bounded thread pool behind a shared
+    rate limiter, and throttled sends are retried with backoff.
+    """
+    def __init__(self, ledger_table, sns, format_message, rate_per_second=SMS_RATE_PER_SECOND,
+                 concurrency=DISPATCH_CONCURRENCY, max_retries=5, cache_size=LEDGER_CACHE_SIZE):
+        self.ledger_table = ledger_table
+        self.sns = sns
+        self.format_message = format_message
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.max_retries = max_retries
+        self.cache_size = cache_size
+        self.sent_keys = OrderedDict()
+        self.lock = threading.Lock()
+        self.futures = []
+        self.counts = self._empty_counts()
+
+    @staticmethod
+    def _empty_counts():
+        return {'sent': 0, 'cached_duplicates': 0, 'ledger_duplicates': 0, 'failed': 0}
+
+    def _remember(self, key):
+        with self.lock:
+            self.sent_keys[key] = True
+            self.sent_keys.move_to_end(key)
+            while len(self.sent_keys) > self.cache_size:
+                self.sent_keys.popitem(last=False)
+
+    def _count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+    def dispatch(self, request, products):
+        """
+        Queue a notification for the products a request has not been told about yet.
+
+        Args:
+            request (dict): The user request.
+            products (list): The matched products.
+        """
+        pending = []
+        for product in products:
+            key = ledger_key(request, product)
+            if key in self.sent_keys:
+                self._count('cached_duplicates')
+            else:
+                pending.append((key, product))
+        if pending:
+            self.futures.append(self.executor.submit(self._deliver, request, pending))
+
+    def flush(self):
+        """
+        Wait for every queued notification and return the counts since the last flush.
+
+        Returns:
+            dict: Counts of sent, duplicate and failed notifications.
+        """
+        futures, self.futures = self.futures, []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Notification dispatch failed: {e}")
+                self._count('failed')
+        with self.lock:
+            counts, self.counts = self.counts, self._empty_counts()
+        return counts
+
+    def _claim(self, key, request):
+        try:
+            self.ledger_table.put_item(
+                Item={
+                    'LedgerKey': key,
+                    'RequestID': request.get('RequestID', 'NA'),
+                    'SentAt': int(time.time()),
+                    'ExpiresAt': int(time.time()) + LEDGER_TTL_SECONDS
+                },
+                ConditionExpression='attribute_not_exists(LedgerKey)'
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                self._remember(key)
+                self._count('ledger_duplicates')
+                return False
+            raise
+
+    def _release(self, keys):
+        for key in keys:
+            try:
+                self.ledger_table.delete_item(Key={'LedgerKey': key})
+            except Exception as e:
+                logging.error(f"Failed to release ledger entry {key}: {e}")
+
+    def _deliver(self, request, pending):
+        claimed = []
+        try:
+            for key, product in pending:
+                if self._claim(key, request):
+                    claimed.append((key, product))
+        except Exception:
+            # Nothing was sent for the claims made so far, so they must not block a later run
+            self._release([key for key, _ in claimed])
+            raise
+        if not claimed:
+            return
+
+        message = self.format_message(request, [product for _, product in claimed])
+        keys = [key for key, _ in claimed]
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                self.sns.publish(PhoneNumber=request['PhoneNumber'], Message=message)
+                for key in keys:
+                    self._remember(key)
+                self._count('sent')
+                return
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS or attempt == self.max_retries:
+                    logging.error(f"Failed to notify request {request.get('RequestID')}: {e}")
+                    break
+                time.sleep(random.uniform(0, min(5.0, 0.2 * (2 ** attempt))))
+            except Exception as e:
+                logging.error(f"Failed to notify request {request.get('RequestID')}: {e}")
+                break
+
+        # Let a later run try again
+        self._release(keys)
+        self._count('failed')
@@ -0,0 +1,277 @@
+# src/layers/common_layer/python/common/opensearch.py
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+from decimal import Decimal
+
+import boto3
+import urllib3
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+
+OPENSEARCH_INDEX = os.environ.get('OPENSEARCH_INDEX', 'products')
+
+# Bulk statuses worth retrying; everything else will fail the same way again
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_TEXT_WITH_KEYWORD = {'type': 'text', 'fields': {'keyword': {'type': 'keyword', 'ignore_above': 256}}}
+
+# Explicit mapping for the products index. Whole Decimals are sent as JSON
+# integers, so without it dynamic mapping could type DiscountPercent or a
+# price as long and reject or truncate later fractional values. Other
+# numbers go through the same float template for the same reason.
+PRODUCT_INDEX_BODY = {
+    'mappings': {
+        'dynamic_templates': [
+            {'numbers_as_float': {'match_mapping_type': 'long', 'mapping': {'type': 'float'}}},
+            {'strings_with_keyword': {'match_mapping_type': 'string', 'mapping': _TEXT_WITH_KEYWORD}}
+        ],
+        'properties': {
+            'POSTCODE': _TEXT_WITH_KEYWORD,
+            'ProductName': _TEXT_WITH_KEYWORD,
+            'DiscountPercent': {'type': 'float'},
+            'PriceCents': {'type': 'float'},
+            'SalePriceCents': {'type': 'float'},
+            'RegularPriceCents': {'type': 'float'},
+            'SavingCents': {'type': 'float'},
+            'ComparativeCents': {'type': 'float'}
+        }
+    }
+}
+
+
+def product_document_id(postcode, product_name):
+    """
+    Build the OpenSearch document ID for a product.
+
+    The ID only depends on the ProductCatalogTable key, so replaying a
+    stream record overwrites the same document instead of adding a copy.
+
+    Args:
+        postcode (str): The product's POSTCODE.
+        product_name (str): The product's ProductName.
+
+    Returns:
+        str: The document ID.
+    """
+    return hashlib.sha1(f"{postcode}\x1f{product_name}".encode('utf-8')).hexdigest()
+
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, set):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """
+    Serialise a document for OpenSearch, converting DynamoDB Decimals.
+    """
+    return json.dumps(obj, default=_json_default, separators=(',', ':'))
+
+
+class OpenSearchClient:
+    """
+    Minimal OpenSearch client with SigV4 signing and pooled connections.
+
+    A single urllib3 pool is kept per client, so a client created at module
+    level reuses its TLS connections across warm invocations.
+    """
+    def __init__(self, endpoint, region=None, service='es', maxsize=10, timeout=30):
+        if not endpoint.startswith(('http://', 'https://')):
+            endpoint = f"https://{endpoint}"
+        self.endpoint = endpoint.rstrip('/')
+        self.region = region or os.environ.get('AWS_REGION', 'ap-southeast-2')
+        self.service = service
+        self.credentials = boto3.Session().get_credentials()
+        self.http = urllib3.PoolManager(
+            maxsize=maxsize,
+            retries=False,
+            timeout=urllib3.Timeout(connect=5, read=timeout)
+        )
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Create a client for the OPENSEARCH_ENDPOINT environment variable.
+
+        Returns:
+            OpenSearchClient: The client, or None if no endpoint is configured.
+        """
+        endpoint = os.environ.get('OPENSEARCH_ENDPOINT')
+        if not endpoint:
+            return None
+        return cls(endpoint, maxsize=int(os.environ.get('OPENSEARCH_POOL_SIZE', '10')))
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        """
+        Send a signed request to the domain.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path, starting with '/'.
+            body (str): The request body.
+            content_type (str): The body's content type.
+
+        Returns:
+            tuple: The HTTP status and the decoded JSON response (or None).
+        """
+        url = f"{self.endpoint}{path}"
+        headers = {'Content-Type': content_type}
+        data = body.encode('utf-8') if isinstance(body, str) else body
+
+        # Without credentials (e.g. a local stand-in) requests go out unsigned
+        if self.credentials is not None:
+            aws_request = AWSRequest(method=method, url=url, data=data, headers=headers)
+            SigV4Auth(self.credentials.get_frozen_credentials(), self.service, self.region).add_auth(aws_request)
+            headers = dict(aws_request.headers.items())
+
+        response = self.http.request(method, url, body=data, headers=headers)
+        payload = json.loads(response.data) if response.data else None
+        return response.status, payload
+
+    def create_index(self, index, body):
+        """
+        Create an index with its settings and mappings, unless it already exists.
+
+        Args:
+            index (str): The index name.
+            body (dict): The index settings and mappings.
+
+        Returns:
+            bool: True if the index was created, False if it already existed.
+
+        Raises:
+            RuntimeError: If the index could not be created.
+        """
+        status, response = self.request('PUT', f'/{index}', dumps(body))
+        if status == 200:
+            return True
+        error = (response or {}).get('error') or {}
+        if status == 400 and isinstance(error, dict) and error.get('type') == 'resource_already_exists_exception':
+            return False
+        raise RuntimeError(f"Creating index {index} failed with status {status}: {response}")
+
+    def bulk(self, lines):
+        """
+        Send one _bulk request.
+
+        Args:
+            lines (list): Serialised NDJSON lines (action and source lines).
+
+        Returns:
+            tuple: The HTTP status and the decoded response.
+        """
+        return self.request('POST', '/_bulk', '\n'.join(lines) + '\n', 'application/x-ndjson')
+
+    def msearch(self, index, searches):
+        """
+        Run several searches against an index in one _msearch request.
+
+        Args:
+            index (str): The index to search.
+            searches (list): Search bodies (dicts).
+
+        Returns:
+            list: One response per search, in order. A search that failed
+                returns a dict with an 'error' key.
+        """
+        lines = []
+        for search in searches:
+            lines.append('{}')
+            lines.append(dumps(search))
+        status, response = self.request('POST', f'/{index}/_msearch', '\n'.join(lines) + '\n',
+                                        'application/x-ndjson')
+        if status != 200 or response is None:
+            raise RuntimeError(f"_msearch failed with status {status}: {response}")
+        return response.get('responses', [])
+
+
+def bulk_with_retries(client, actions, max_bytes=5 * 1024 * 1024, max_attempts=5,
+                      base_delay=0.2, max_delay=5.0):
+    """
+    Run bulk actions, retrying only the items that failed with a retryable status.
+
+    Args:
+        client (OpenSearchClient): The client to send requests with.
+        actions (list): (action_line, source_line or None) pairs of serialised JSON.
+        max_bytes (int): The largest request body to send.
+        max_attempts (int): Attempts per item before giving up.
+        base_delay (float): The first backoff delay in seconds.
+        max_delay (float): The longest backoff delay in seconds.
+
+    Returns:
+        dict: Counts of succeeded, retried, rejected (not retryable) and failed
+            (still retryable after every attempt) items.
+    """
+    counts = {'succeeded': 0, 'retried': 0, 'rejected': 0, 'failed': 0}
+    pending = list(actions)
+    attempt = 0
+
+    while pending:
+        attempt += 1
+        retry = []
+
+        for chunk in _chunks(pending, max_bytes):
+            lines = []
+            for action_line, source_line in chunk:
+                lines.append(action_line)
+                if source_line is not None:
+                    lines.append(source_line)
+
+            try:
+                status, response = client.bulk(lines)
+            except Exception as e:
+                logging.error(f"Bulk request failed: {e}")
+                status, response = None, None
+
+            if status != 200 or response is None:
+                # The whole request failed, so every item in it is retried
+                retry.extend(chunk)
+                continue
+
+            if not response.get('errors'):
+                counts['succeeded'] += len(chunk)
+                continue
+
+            for action, item in zip(chunk, response.get('items', [])):
+                result = next(iter(item.values()))
+                item_status = result.get('status', 500)
+                if item_status < 300 or (item_status == 404 and 'delete' in item):
+                    counts['succeeded'] += 1
+                elif item_status in RETRYABLE_STATUSES:
+                    retry.append(action)
+                else:
+                    counts['rejected'] += 1
+                    logging.error(f"Bulk item rejected: {result.get('error')}")
+
+        if not retry:
+            break
+        if attempt >= max_attempts:
+            counts['failed'] += len(retry)
+            break
+
+        counts['retried'] += len(retry)
+        pending = retry
+        time.sleep(random.uniform(0, min(max_delay, base_delay * (2 ** attempt))))
+
+    return counts
+
+
+def _chunks(actions, max_bytes):
+    chunk, size = [], 0
+    for action in actions:
+        action_size = len(action[0]) + (len(action[1]) if action[1] is not None else 0) + 2
+        if chunk and size + action_size > max_bytes:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(action)
+        size += action_size
+    if chunk:
+        yield chunk
@@ -0,0 +1,421 @@
+# src/layers/common_layer/python/common/snapshots.py
+
+import os
+import sys
+import json
+import mmap
+import math
+import time
+import zlib
+import struct
+import logging
+import tempfile
+from array import array
+from decimal import Decimal
+from collections.abc import Sequence
+
+# Where catalogue snapshots are kept: a directory, file:///path or s3://bucket/prefix.
+# S3-compatible stores are reached by setting AWS_ENDPOINT_URL_S3.
+SNAPSHOT_LOCATION = os.environ.get('SNAPSHOT_LOCATION', '')
+# Local copies of snapshots read from S3, reused while the object's ETag is unchanged
+SNAPSHOT_CACHE_DIR = os.environ.get('SNAPSHOT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'catalogue-snapshots'))
+
+MAGIC = b'PCSNAP'
+FORMAT_VERSION = 1
+# Magic, format version and header length
+_PREAMBLE = struct.Struct('<6sHI')
+_ALIGNMENT = 8
+NULL_INT = -2 ** 63
+# Stored as float64 even when every value is whole, so a missing value is NaN rather than NULL_INT
+FLOAT_COLUMNS = ('DiscountPercent',)
+
+_TYPECODES = {'int64': 'q', 'float64': 'd'}
+
+
+def _column_type(values, name=None):
+    kind = None
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+            return 'string'
+        if isinstance(value, int) or (isinstance(value, Decimal) and value == value.to_integral_value()):
+            kind = kind or 'int64'
+        else:
+            kind = 'float64'
+    if kind == 'int64' and name in FLOAT_COLUMNS:
+        return 'float64'
+    return kind or 'string'
+
+
+def _encode_column(column_type, values):
+    if column_type == 'int64':
+        data = array('q', (NULL_INT if value is None else int(value) for value in values))
+    elif column_type == 'float64':
+        data = array('d', (math.nan if value is None else float(value) for value in values))
+    else:
+        encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+        offsets = array('I', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        return offsets.tobytes() + b''.join(encoded)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def encode_snapshot(items, postcode, catalogue_id=None, created_at=None, compress_numeric=False):
+    """
+    Encode a postcode's catalogue as a columnar snapshot.
+
+    Every attribute becomes a column. Whole-number attributes are stored as
+    int64 and other numbers, and the FLOAT_COLUMNS, as float64, with
+    NULL_INT and NaN for missing values; everything else is stored as UTF-8
+    strings behind an offset array, with '' for missing values. String
+    columns are zlib-compressed.
+    Numeric columns are stored raw and 8-byte aligned by default, so readers
+    can scan them straight from a memory map.
+
+    Args:
+        items (list): The postcode's ProductCatalogTable items.
+        postcode (str): The postcode.
+        catalogue_id (str): The catalogue the items came from, if known.
+        created_at (int): Unix time in milliseconds; also the snapshot version.
+        compress_numeric (bool): Compress numeric columns too, trading zero-copy reads for size.
+
+    Returns:
+        bytes: The snapshot.
+    """
+    names = []
+    for item in items:
+        for name in item:
+            if name not in names:
+                names.append(name)
+
+    columns = []
+    blocks = []
+    for name in names:
+        values = [item.get(name) for item in items]
+        column_type = _column_type(values, name)
+        raw = _encode_column(column_type, values)
+        codec = 'zlib' if column_type == 'string' or compress_numeric else 'raw'
+        block = zlib.compress(raw, 6) if codec == 'zlib' else raw
+        columns.append({'name': name, 'type': column_type, 'codec': codec, 'length': len(block),
+                        'raw_length': len(raw)})
+        blocks.append(block)
+
+    created_at = created_at or int(time.time() * 1000)
+    header = {
+        'postcode': str(postcode),
+        'catalogue_id': catalogue_id,
+        'version': created_at,
+        'created_at': created_at,
+        'rows': len(items),
+        'columns': columns
+    }
+    # Offsets are relative to the end of the header, so they don't depend on its length
+    position = 0
+    for column, block in zip(columns, blocks):
+        position += -position % _ALIGNMENT
+        column['offset'] = position
+        position += len(block)
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(_PREAMBLE.size + len(header_bytes)) % _ALIGNMENT)
+    parts = [_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)), header_bytes]
+    position = 0
+    for column, block in zip(columns, blocks):
+        parts.append(b'\0' * (column['offset'] - position))
+        parts.append(block)
+        position = column['offset'] + len(block)
+    return b''.join(parts)
+
+
+class SnapshotRecords(Sequence):
+    """
+    Read-only sequence of a snapshot's rows as dicts, built only when accessed.
+    """
+    def __init__(self, snapshot, columns=None):
+        self.snapshot = snapshot
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.snapshot.row(row, self.columns) for row in range(len(self))[position]]
+        return self.snapshot.row(position, self.columns)
+
+
+class Snapshot:
+    """
+    A columnar catalogue snapshot opened from bytes or a memory-mapped file.
+
+    Columns are decoded on first use and then cached. Raw numeric columns
+    come back as memoryviews over the file ('q' or 'd'), so scanning prices
+    or discounts allocates nothing per product. Views stay valid until the
+    snapshot is closed.
+    """
+    def __init__(self, buffer, file=None):
+        self.buffer = buffer
+        self.file = file
+        magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('not a catalogue snapshot')
+        if version > FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot format {version}, this reader supports up to {FORMAT_VERSION}")
+        self.format_version = version
+        self.header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+        self.data_offset = _PREAMBLE.size + header_length
+        self.column_info = {column['name']: column for column in self.header['columns']}
+        self.cache = {}
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-map a snapshot file.
+
+        Args:
+            path (str): The snapshot file.
+
+        Returns:
+            Snapshot: The open snapshot.
+        """
+        file = open(path, 'rb')
+        try:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), file)
+        except Exception:
+            file.close()
+            raise
+
+    @property
+    def postcode(self):
+        return self.header['postcode']
+
+    @property
+    def version(self):
+        return self.header['version']
+
+    @property
+    def catalogue_id(self):
+        return self.header.get('catalogue_id')
+
+    @property
+    def created_at(self):
+        return self.header['created_at']
+
+    @property
+    def column_names(self):
+        return list(self.column_info)
+
+    def __len__(self):
+        return self.header['rows']
+
+    def _block(self, info):
+        start = self.data_offset + info['offset']
+        if info['codec'] == 'zlib':
+            return memoryview(zlib.decompress(self.buffer[start:start + info['length']]))
+        return memoryview(self.buffer)[start:start + info['length']]
+
+    def column(self, name):
+        """
+        Get a whole column.
+
+        Args:
+            name (str): The column name.
+
+        Returns:
+            memoryview or list: A 'q' or 'd' memoryview for numeric columns,
+            a list of str for string columns, or None if there is no such column.
+        """
+        if name in self.cache:
+            return self.cache[name]
+        info = self.column_info.get(name)
+        if info is None:
+            return None
+
+        block = self._block(info)
+        if info['type'] == 'string':
+            offsets = block[:4 * (len(self) + 1)].cast('I')
+            if sys.byteorder != 'little':
+                offsets = array('I', offsets.tobytes())
+                offsets.byteswap()
+            strings = block[4 * (len(self) + 1):]
+            values = [str(strings[offsets[row]:offsets[row + 1]], 'utf-8') for row in range(len(self))]
+        else:
+            values = block.cast(_TYPECODES[info['type']])
+            if sys.byteorder != 'little':
+                values = array(_TYPECODES[info['type']], values.tobytes())
+                values.byteswap()
+        self.cache[name] = values
+        return values
+
+    def row(self, position, columns=None):
+        """
+        Build one row as a dict, leaving out missing values.
+
+        Args:
+            position (int): The row number.
+            columns (list): The columns to include; all columns by default.
+
+        Returns:
+            dict: The row.
+        """
+        row = {}
+        for name in columns or self.column_names:
+            info = self.column_info.get(name)
+            if info is None:
+                continue
+            value = self.column(name)[position]
+            if info['type'] == 'int64':
+                if value != NULL_INT:
+                    row[name] = value
+            elif info['type'] == 'float64':
+                if not math.isnan(value):
+                    row[name] = value
+            elif value:
+                row[name] = value
+        return row
+
+    def records(self, columns=None):
+        """
+        Get the rows as a lazily built sequence of dicts.
+        """
+        return SnapshotRecords(self, columns)
+
+    def close(self):
+        """
+        Release the column views and unmap the file.
+        """
+        for values in self.cache.values():
+            if isinstance(values, memoryview):
+                values.release()
+        self.cache.clear()
+        if self.file is not None:
+            try:
+                self.buffer.close()
+            except BufferError:
+                # A caller still holds a view; the mapping goes away with the last one
+                pass
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotStore:
+    """
+    Saves and loads catalogue snapshots in a directory or an S3 bucket.
+
+    Each postcode has one object, '<prefix>/v<format>/<postcode>.snap', which
+    is overwritten by every scrape, so a catalogue load is one object read.
+    Snapshots read from S3 are kept in the local cache directory and only
+    downloaded again when their ETag changes.
+    """
+    def __init__(self, location, cache_dir=SNAPSHOT_CACHE_DIR):
+        if location.startswith('s3://'):
+            self.bucket, _, self.prefix = location[len('s3://'):].partition('/')
+            self.directory = None
+        else:
+            self.bucket = None
+            self.prefix = ''
+            self.directory = location[len('file://'):] if location.startswith('file://') else location
+        self.prefix = self.prefix.strip('/')
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Create a store for the SNAPSHOT_LOCATION environment variable.
+
+        Returns:
+            SnapshotStore: The store, or None if no location is configured.
+        """
+        location = os.environ.get('SNAPSHOT_LOCATION', SNAPSHOT_LOCATION)
+        return cls(location) if location else None
+
+    def key(self, postcode):
+        name = f"v{FORMAT_VERSION}/{postcode}.snap"
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def _s3(self):
+        from common import aws
+        return aws.client('s3')
+
+    def save(self, postcode, items, catalogue_id=None):
+        """
+        Write a postcode's snapshot, replacing the previous one.
+
+        Args:
+            postcode (str): The postcode.
+            items (list): The postcode's ProductCatalogTable items.
+            catalogue_id (str): The catalogue the items came from, if known.
+
+        Returns:
+            int: The size of the snapshot in bytes.
+        """
+        data = encode_snapshot(items, postcode, catalogue_id)
+        key = self.key(postcode)
+        if self.bucket:
+            self._s3().put_object(Bucket=self.bucket, Key=key, Body=data,
+                                  ContentType='application/octet-stream')
+        else:
+            path = os.path.join(self.directory, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Readers never see a half-written file
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+        return len(data)
+
+    def load(self, postcode):
+        """
+        Open a postcode's latest snapshot.
+
+        Args:
+            postcode (str): The postcode.
+
+        Returns:
+            Snapshot: The memory-mapped snapshot, or None if there is none.
+        """
+        key = self.key(postcode)
+        if not self.bucket:
+            path = os.path.join(self.directory, key)
+            return Snapshot.open(path) if os.path.exists(path) else None
+
+        from botocore.exceptions import ClientError
+        path = os.path.join(self.cache_dir, key)
+        etag_path = f"{path}.etag"
+        request = {'Bucket': self.bucket, 'Key': key}
+        if os.path.exists(path) and os.path.exists(etag_path):
+            with open(etag_path) as f:
+                request['IfNoneMatch'] = f.read()
+        try:
+            response = self._s3().get_object(**request)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in ('304', 'NotModified'):
+                return Snapshot.open(path)
+            if code in ('NoSuchKey', '404'):
+                return None
+            raise
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            for chunk in response['Body'].iter_chunks(1024 * 1024):
+                f.write(chunk)
+        # Snapshots already mapped keep the replaced file's pages
+        os.replace(temporary, path)
+        with open(etag_path, 'w') as f:
+            f.write(response['ETag'])
+        logging.info(f"Downloaded snapshot {key} ({response.get('ContentLength')} bytes)")
+        return Snapshot.open(path)
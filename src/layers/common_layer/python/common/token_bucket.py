@@ -0,0 +1,83 @@
+# src/layers/common_layer/python/common/token_bucket.py
+
+import os
+import time
+import random
+from decimal import Decimal
+from botocore.exceptions import ClientError
+
+SCRAPE_RATE_LIMIT_TABLE = os.environ.get('SCRAPE_RATE_LIMIT_TABLE', 'ScrapeRateLimitTable')
+# Global limit on browser scrapes against the target site, shared by the scheduler and every scraper
+SCRAPE_BUCKET_NAME = 'woolworths-catalogue'
+SCRAPES_PER_HOUR = float(os.environ.get('SCRAPES_PER_HOUR', '120'))
+SCRAPE_BURST = int(os.environ.get('SCRAPE_BURST', '20'))
+
+
+class DynamoDBTokenBucket:
+    """
+    Token bucket shared by every caller through one item in a DynamoDB table.
+
+    The item holds the tokens left and when they were counted. A caller
+    reads it, adds the tokens that accrued since then at rate_per_second
+    (never more than capacity), takes what it needs and writes the rest
+    back with a condition on the UpdatedAt it read. If another caller got
+    there first the condition fails and the caller reads again, so
+    concurrent schedulers or workers never hand out more than the rate.
+    """
+    def __init__(self, table, name, rate_per_second, capacity, max_attempts=5):
+        self.table = table
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.max_attempts = max_attempts
+
+    def _available(self, item, now):
+        if not item:
+            return float(self.capacity)
+        elapsed = max(0.0, now - float(item['UpdatedAt']))
+        return min(float(self.capacity), float(item['Tokens']) + elapsed * self.rate_per_second)
+
+    def acquire(self, tokens, partial=True):
+        """
+        Take tokens from the bucket without waiting.
+
+        Args:
+            tokens (int): The tokens wanted.
+            partial (bool): Take as many as are available when there are not enough for all.
+
+        Returns:
+            int: The tokens taken, possibly 0.
+        """
+        for attempt in range(self.max_attempts):
+            item = self.table.get_item(Key={'BucketName': self.name}, ConsistentRead=True).get('Item')
+            now = time.time()
+            available = self._available(item, now)
+            granted = min(tokens, int(available)) if partial else (tokens if available >= tokens else 0)
+            if granted <= 0:
+                return 0
+
+            new_item = {
+                'BucketName': self.name,
+                'Tokens': Decimal(str(round(available - granted, 6))),
+                'UpdatedAt': Decimal(str(round(now, 6)))
+            }
+            try:
+                if item:
+                    self.table.put_item(Item=new_item, ConditionExpression='UpdatedAt = :seen',
+                                        ExpressionAttributeValues={':seen': item['UpdatedAt']})
+                else:
+                    self.table.put_item(Item=new_item, ConditionExpression='attribute_not_exists(BucketName)')
+                return granted
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                # Another caller took tokens in between; read the bucket again
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+        return 0
+
+    def available(self):
+        """
+        Get the tokens that could be taken now, without taking them.
+        """
+        item = self.table.get_item(Key={'BucketName': self.name}, ConsistentRead=True).get('Item')
+        return self._available(item, time.time())
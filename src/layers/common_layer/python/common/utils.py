@@ -2,96 +2,486 @@
 
 import json
 import os
+import time
 import uuid
-import boto3
-from decimal import Decimal
-from boto3.dynamodb.conditions import Key, Attr
-
-# Initialize DynamoDB resource
-dynamodb = boto3.resource('dynamodb')
+import random
+import base64
+import binascii
+import zlib
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ThreadPoolExecutor
+from common import aws
+from common.metrics import metrics
 
 # Get the table name from environment variables or default to 'UserRequests'
 USER_REQUESTS_TABLE = os.environ.get('USER_REQUESTS_TABLE', 'UserRequests')
 
-# Initialize the DynamoDB table
-user_requests_table = dynamodb.Table(USER_REQUESTS_TABLE)
+# Page size for /listrequests when the caller does not give a limit, and the largest allowed
+DEFAULT_PAGE_SIZE = int(os.environ.get('LIST_REQUESTS_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.environ.get('LIST_REQUESTS_MAX_PAGE_SIZE', '1000'))
+# Parallel scan segments for the admin export
+EXPORT_SEGMENTS = int(os.environ.get('EXPORT_SEGMENTS', '8'))
+# Token the X-Admin-Token header must carry for an export; exports are disabled without it
+ADMIN_EXPORT_TOKEN = os.environ.get('ADMIN_EXPORT_TOKEN')
+# Largest number of items accepted by one bulk submit or delete call
+MAX_BULK_ITEMS = int(os.environ.get('MAX_BULK_ITEMS', '500'))
+# BatchWriteItem takes at most 25 requests
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_ATTEMPTS = 5
+# Responses smaller than this are sent uncompressed even when the client accepts gzip
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', '1024'))
+# List items serialised per json.dumps call when a response is encoded in chunks
+ENCODE_CHUNK_ITEMS = 500
+
+def get_user_requests_table():
+    """
+    Get the UserRequests table. boto3 and its connections are set up on the
+    first call and reused by every later call in the container.
+    """
+    return aws.table(USER_REQUESTS_TABLE)
+
+def build_request_item(body, context):
+    """
+    Validate a submitted request and build the item to store for it.
+
+    Args:
+        body (dict): The submitted Postcode, ProductName, Discount and PhoneNumber.
+        context: The Lambda context.
+
+    Returns:
+        dict: The UserRequests item, keyed on POSTCODE and ProductName, with a new RequestID.
+
+    Raises:
+        ValueError: If a parameter is missing or invalid.
+    """
+    if not isinstance(body, dict):
+        raise ValueError('Request must be an object')
+
+    postcode = body.get('Postcode')
+    product_name = body.get('ProductName')
+    discount = body.get('Discount')
+    phone_number = body.get('PhoneNumber')
+
+    if not all([postcode, product_name, discount, phone_number]):
+        raise ValueError('Missing required parameters: Postcode, ProductName, Discount, PhoneNumber')
+
+    try:
+        discount = Decimal(str(discount))
+    except InvalidOperation:
+        raise ValueError('Discount must be a number')
+
+    if not isinstance(product_name, str):
+        raise ValueError('ProductName must be a string')
 
+    return {
+        'RequestID': str(uuid.uuid4()),
+        'POSTCODE': str(postcode),
+        'ProductName': product_name,
+        'Discount': discount,
+        'PhoneNumber': phone_number,
+        'Timestamp': Decimal(str(context.get_remaining_time_in_millis()))
+    }
+
+@metrics.timed('SubmitRequest')
 def submit_new_request(event, context):
     """
     Handles the submission of a new user request.
     """
     try:
-        body = json.loads(event.get('body', '{}'))
-
-        # Validate inputs
-        postcode = body.get('Postcode')
-        product_name = body.get('ProductName')
-        discount = body.get('Discount')
-        phone_number = body.get('PhoneNumber')
-
-        if not all([postcode, product_name, discount, phone_number]):
-            return respond(400, {'message': 'Missing required parameters: Postcode, ProductName, Discount, PhoneNumber'})
-
-        # Generate a unique RequestID
-        request_id = str(uuid.uuid4())
-
-        # Create the item to store in DynamoDB
-        item = {
-            'RequestID': request_id,
-            'Postcode': str(postcode),
-            'ProductName': product_name,
-            'Discount': Decimal(str(discount)),
-            'PhoneNumber': phone_number,
-            'Timestamp': Decimal(str(context.get_remaining_time_in_millis()))
-        }
+        body = request_body(event)
+
+        # Validate inputs and generate a unique RequestID
+        try:
+            item = build_request_item(body, context)
+        except ValueError as e:
+            return respond(400, {'message': str(e)})
 
         # Store the request in the UserRequests table
-        user_requests_table.put_item(Item=item)
+        get_user_requests_table().put_item(Item=item)
 
-        return respond(200, {'message': 'Request submitted successfully', 'RequestID': request_id})
+        return respond(200, {'message': 'Request submitted successfully', 'RequestID': item['RequestID']})
     except Exception as e:
         print(f"Error submitting new request: {e}")
         return respond(500, {'message': 'Internal server error'})
 
+def _batch_write(write_requests):
+    """
+    Send write requests with BatchWriteItem, retrying unprocessed items with backoff.
+
+    A batch cannot touch the same key twice, so callers pass one request per
+    key. If DynamoDB rejects a whole batch as invalid, its requests are sent
+    one at a time so only the invalid ones fail.
+
+    Args:
+        write_requests (dict): (POSTCODE, ProductName) key to its PutRequest or DeleteRequest.
+
+    Returns:
+        dict: Key to an error message, for every request that was not written.
+    """
+    errors = {}
+    pending = list(write_requests.items())
+
+    for start in range(0, len(pending), BATCH_WRITE_SIZE):
+        chunk = dict(pending[start:start + BATCH_WRITE_SIZE])
+        for attempt in range(BATCH_WRITE_ATTEMPTS):
+            try:
+                response = aws.resource('dynamodb').batch_write_item(
+                    RequestItems={USER_REQUESTS_TABLE: list(chunk.values())}
+                )
+            except Exception as e:
+                print(f"Error writing batch of {len(chunk)} requests: {e}")
+                if _error_code(e) == 'ValidationException' and len(chunk) > 1:
+                    errors.update(_write_each(chunk))
+                else:
+                    errors.update({key: 'Write failed' for key in chunk})
+                break
+
+            unprocessed = response.get('UnprocessedItems', {}).get(USER_REQUESTS_TABLE, [])
+            if not unprocessed:
+                break
+            chunk = {_write_request_key(request): request for request in unprocessed}
+            if attempt == BATCH_WRITE_ATTEMPTS - 1:
+                errors.update({key: 'Throttled, try again later' for key in chunk})
+            else:
+                time.sleep(random.uniform(0, min(2.0, 0.05 * (2 ** attempt))))
+
+    return errors
+
+def _write_each(write_requests):
+    errors = {}
+    table = get_user_requests_table()
+    for key, request in write_requests.items():
+        try:
+            if 'PutRequest' in request:
+                table.put_item(Item=request['PutRequest']['Item'])
+            else:
+                table.delete_item(Key=request['DeleteRequest']['Key'])
+        except Exception as e:
+            print(f"Error writing request {key}: {e}")
+            errors[key] = 'Invalid item' if _error_code(e) == 'ValidationException' else 'Write failed'
+    return errors
+
+def _error_code(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+def _write_request_key(write_request):
+    if 'PutRequest' in write_request:
+        key = write_request['PutRequest']['Item']
+    else:
+        key = write_request['DeleteRequest']['Key']
+    return key['POSTCODE'], key['ProductName']
+
+def _bulk_items(event, field):
+    """
+    Read the list of items sent to a bulk endpoint.
+
+    Returns:
+        list: The items.
+
+    Raises:
+        ValueError: If the body has no usable list.
+    """
+    body = request_body(event)
+    items = body.get(field) if isinstance(body, dict) else body
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'Body must contain a non-empty {field} list')
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValueError(f'At most {MAX_BULK_ITEMS} items can be sent at once')
+    return items
+
+@metrics.timed('SubmitRequests')
+def submit_requests(event, context):
+    """
+    Handles the submission of many user requests in one call.
+
+    The body is {'Requests': [...]}, each entry shaped like a /submitanewrequest
+    body. Valid entries are written with BatchWriteItem. Invalid or failed
+    entries are reported without failing the rest. A postcode and product
+    can only be requested once per call; later repeats are invalid.
+
+    The response lists one result per entry, in order, with its Index,
+    Status ('submitted', 'invalid' or 'failed') and RequestID or message.
+    """
+    try:
+        try:
+            entries = _bulk_items(event, 'Requests')
+        except ValueError as e:
+            return respond(400, {'message': str(e)})
+
+        results = []
+        write_requests = {}
+        for index, entry in enumerate(entries):
+            try:
+                item = build_request_item(entry, context)
+            except ValueError as e:
+                results.append({'Index': index, 'Status': 'invalid', 'message': str(e)})
+                continue
+            key = (item['POSTCODE'], item['ProductName'])
+            if key in write_requests:
+                results.append({'Index': index, 'Status': 'invalid',
+                                'message': 'Postcode and ProductName repeat an earlier entry'})
+                continue
+            write_requests[key] = {'PutRequest': {'Item': item}}
+            results.append({'Index': index, 'Status': 'submitted', 'RequestID': item['RequestID'], 'Key': key})
+
+        errors = _batch_write(write_requests)
+        for result in results:
+            key = result.pop('Key', None)
+            if key in errors:
+                del result['RequestID']
+                result.update({'Status': 'failed', 'message': errors[key]})
+
+        return respond(200, _bulk_summary(results, 'submitted'), event)
+    except Exception as e:
+        print(f"Error submitting requests: {e}")
+        return respond(500, {'message': 'Internal server error'})
+
+@metrics.timed('DeleteRequests')
+def delete_requests(event):
+    """
+    Deletes many user requests in one call.
+
+    The body is {'Requests': [{'Postcode': ..., 'ProductName': ...}, ...]},
+    the table's key for each request. The response lists one result per
+    entry, in order, with Status 'deleted', 'invalid' or 'failed'.
+    """
+    try:
+        try:
+            entries = _bulk_items(event, 'Requests')
+        except ValueError as e:
+            return respond(400, {'message': str(e)})
+
+        results = []
+        write_requests = {}
+        for index, entry in enumerate(entries):
+            postcode = entry.get('Postcode') if isinstance(entry, dict) else None
+            product_name = entry.get('ProductName') if isinstance(entry, dict) else None
+            if not postcode or not product_name or not isinstance(product_name, str):
+                results.append({'Index': index, 'Status': 'invalid',
+                                'message': 'Each entry needs a Postcode and a ProductName'})
+                continue
+            key = (str(postcode), product_name)
+            # A batch cannot touch the same key twice, so repeated keys share one delete
+            write_requests[key] = {'DeleteRequest': {'Key': {'POSTCODE': key[0], 'ProductName': key[1]}}}
+            results.append({'Index': index, 'Status': 'deleted', 'Key': key})
+
+        errors = _batch_write(write_requests)
+        for result in results:
+            key = result.pop('Key', None)
+            if key in errors:
+                result.update({'Status': 'failed', 'message': errors[key]})
+
+        return respond(200, _bulk_summary(results, 'deleted'), event)
+    except Exception as e:
+        print(f"Error deleting requests: {e}")
+        return respond(500, {'message': 'Internal server error'})
+
+def _bulk_summary(results, success_status):
+    succeeded = sum(1 for result in results if result['Status'] == success_status)
+    return {'Succeeded': succeeded, 'Failed': len(results) - succeeded, 'Results': results}
+
+def encode_next_token(last_evaluated_key, mode='scan'):
+    """
+    Turn a LastEvaluatedKey into an opaque pagination token.
+
+    Key values are stored as DynamoDB JSON, so they decode back to the same
+    types. The token records the listing mode it came from, so it cannot be
+    replayed against a different kind of listing.
+
+    Args:
+        last_evaluated_key (dict): The LastEvaluatedKey from a Query or Scan.
+        mode (str): 'scan' or 'query'.
+
+    Returns:
+        str: The token, or None if there are no more pages.
+    """
+    if not last_evaluated_key:
+        return None
+    return _encode_token({'Mode': mode, 'Key': _serialize_key(last_evaluated_key)})
+
+def decode_next_token(token, mode='scan'):
+    """
+    Turn a pagination token back into an ExclusiveStartKey.
+
+    Args:
+        token (str): A token returned by encode_next_token.
+        mode (str): The listing mode the token must have come from.
+
+    Returns:
+        dict: The ExclusiveStartKey.
+
+    Raises:
+        ValueError: If the token is malformed or was issued for another mode.
+    """
+    payload = _decode_token(token, mode)
+    if not isinstance(payload.get('Key'), dict):
+        raise ValueError('Invalid NextToken: no key')
+    return _deserialize_key(payload['Key'])
+
+def _serialize_key(key):
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return {name: serializer.serialize(value) for name, value in key.items()}
+
+def _deserialize_key(key):
+    from boto3.dynamodb.types import TypeDeserializer
+    deserializer = TypeDeserializer()
+    try:
+        return {name: deserializer.deserialize(value) for name, value in key.items()}
+    except (TypeError, AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid NextToken: {e}")
+
+def _encode_token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+def _decode_token(token, mode):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (binascii.Error, UnicodeError, TypeError, AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid NextToken: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError('Invalid NextToken')
+    if payload.get('Mode') != mode:
+        raise ValueError(f"NextToken belongs to a {payload.get('Mode') or 'different'} listing, not a {mode} listing")
+    return payload
+
+@metrics.timed('ListRequests')
 def list_requests(event):
     """
-    Lists all current user requests.
+    Lists user requests one page at a time.
+
+    Query string parameters:
+        limit: Items per page (default LIST_REQUESTS_PAGE_SIZE, at most LIST_REQUESTS_MAX_PAGE_SIZE).
+        next_token: The NextToken from the previous page of the same kind of listing.
+        postcode: Only list this postcode's requests, with a Query on the table's hash key.
+        export: 'true' to page through the whole table with parallel scans (admin only).
+
+    The response body is {'Items': [...], 'Count': n, 'NextToken': token or None}.
     """
     try:
-        # Scan the UserRequests table to get all items
-        response = user_requests_table.scan()
+        params = event.get('queryStringParameters') or {}
+        export = str(params.get('export', '')).lower() == 'true'
+
+        try:
+            limit = int(params.get('limit') or (MAX_PAGE_SIZE if export else DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return respond(400, {'message': 'limit must be an integer'})
+        if limit < 1:
+            return respond(400, {'message': 'limit must be at least 1'})
+        limit = min(limit, MAX_PAGE_SIZE)
+
+        if export:
+            return export_requests(event, limit, params.get('next_token'))
+
+        postcode = params.get('postcode')
+        mode = 'query' if postcode else 'scan'
+        request_kwargs = {'Limit': limit}
+        if params.get('next_token'):
+            try:
+                request_kwargs['ExclusiveStartKey'] = decode_next_token(params['next_token'], mode)
+            except ValueError as e:
+                return respond(400, {'message': str(e)})
+            if postcode and str(request_kwargs['ExclusiveStartKey'].get('POSTCODE')) != str(postcode):
+                return respond(400, {'message': 'NextToken belongs to a different postcode'})
+
+        if postcode:
+            from boto3.dynamodb.conditions import Key
+            # POSTCODE is the hash key, so only that postcode's items are read
+            response = get_user_requests_table().query(
+                KeyConditionExpression=Key('POSTCODE').eq(str(postcode)),
+                **request_kwargs
+            )
+        else:
+            response = get_user_requests_table().scan(**request_kwargs)
+
         items = response.get('Items', [])
-        return respond(200, items)
+        return respond(200, {
+            'Items': items,
+            'Count': len(items),
+            'NextToken': encode_next_token(response.get('LastEvaluatedKey'), mode)
+        }, event)
     except Exception as e:
         print(f"Error listing requests: {e}")
         return respond(500, {'message': 'Internal server error'})
 
+def _scan_segment_page(segment, total_segments, start_key, limit):
+    scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments, 'Limit': limit}
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+    response = get_user_requests_table().scan(**scan_kwargs)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+def export_requests(event, limit, next_token=None):
+    """
+    Returns one page of every user request, reading the table with parallel segmented scans.
+
+    Each page reads one scan page from every segment that is not finished,
+    sharing the page limit between them, so a response stays well under the
+    Lambda payload limit however large the table is. The NextToken holds the
+    position of each unfinished segment.
+
+    Only available when ADMIN_EXPORT_TOKEN is set and the X-Admin-Token header matches it.
+    """
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if not ADMIN_EXPORT_TOKEN or headers.get('x-admin-token') != ADMIN_EXPORT_TOKEN:
+        return respond(403, {'message': 'Forbidden'})
+
+    if next_token:
+        try:
+            payload = _decode_token(next_token, 'export')
+            total_segments = int(payload['TotalSegments'])
+            segments = {int(segment): _deserialize_key(key) if key else None
+                        for segment, key in payload['Segments'].items()}
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            return respond(400, {'message': str(e) if isinstance(e, ValueError) else 'Invalid NextToken'})
+        if not segments or any(not 0 <= segment < total_segments for segment in segments):
+            return respond(400, {'message': 'Invalid NextToken: bad segments'})
+    else:
+        total_segments = EXPORT_SEGMENTS
+        segments = {segment: None for segment in range(total_segments)}
+
+    per_segment = max(1, limit // len(segments))
+    with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        pages = list(executor.map(
+            lambda segment: _scan_segment_page(segment, total_segments, segments[segment], per_segment),
+            sorted(segments)
+        ))
+
+    items = [item for segment_items, _ in pages for item in segment_items]
+    remaining = {str(segment): _serialize_key(last_key)
+                 for segment, (_, last_key) in zip(sorted(segments), pages) if last_key}
+    token = _encode_token({'Mode': 'export', 'TotalSegments': total_segments, 'Segments': remaining}) if remaining else None
+
+    return respond(200, {'Items': items, 'Count': len(items), 'NextToken': token}, event)
+
+@metrics.timed('DeleteRequest')
 def delete_request(event):
     """
     Deletes a user request by RequestID.
     """
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = request_body(event)
         request_id = body.get('RequestID')
 
         if not request_id:
             return respond(400, {'message': 'Missing required parameter: RequestID'})
 
         # Delete the request from the UserRequests table
-        user_requests_table.delete_item(Key={'RequestID': request_id})
+        get_user_requests_table().delete_item(Key={'RequestID': request_id})
 
         return respond(200, {'message': 'Request deleted successfully'})
     except Exception as e:
         print(f"Error deleting request: {e}")
         return respond(500, {'message': 'Internal server error'})
 
+@metrics.timed('UpdateRequest')
 def update_request(event):
     """
     Updates a user request by RequestID.
     Only ProductName, Discount, and PhoneNumber can be updated.
     """
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = request_body(event)
         request_id = body.get('RequestID')
 
         if not request_id:
@@ -119,7 +509,7 @@ def update_request(event):
         update_expression = update_expression.rstrip(', ')
 
         # Update the request in the UserRequests table
-        user_requests_table.update_item(
+        get_user_requests_table().update_item(
             Key={'RequestID': request_id},
             UpdateExpression=update_expression,
             ExpressionAttributeValues=expression_attribute_values,
@@ -131,16 +521,121 @@ def update_request(event):
         print(f"Error updating request: {e}")
         return respond(500, {'message': 'Internal server error'})
 
-def respond(status_code, body):
+def request_body(event):
+    """
+    Decode the JSON body of an API Gateway event.
+
+    API Gateway base64-encodes bodies whose type is listed in BinaryMediaTypes,
+    so those are decoded first.
+    """
+    body = event.get('body') or '{}'
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    return json.loads(body)
+
+def _coding_quality(params):
+    for param in params.split(';'):
+        name, _, value = param.strip().partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+def accepts_gzip(event):
+    """
+    Check whether the caller's Accept-Encoding header allows a gzip response.
+
+    An explicit gzip entry decides on its own; the * wildcard only applies
+    when gzip is not listed.
+    """
+    if not event:
+        return False
+    headers = event.get('headers') or {}
+    accept_encoding = next((value for name, value in headers.items() if name.lower() == 'accept-encoding'), '')
+    qualities = {}
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.strip().partition(';')
+        qualities[name.strip().lower()] = _coding_quality(params)
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return quality > 0
+
+def _dumps(obj):
+    return _encoder.encode(obj)
+
+def _encode_chunks(body):
+    """
+    Yield the JSON text of a body piece by piece.
+
+    Top-level lists, and lists directly under a top-level key, are encoded
+    ENCODE_CHUNK_ITEMS items at a time, so a compressor can consume the text
+    as it is produced instead of waiting for one large string. The pieces
+    join to exactly json.dumps(body, cls=DecimalEncoder).
+    """
+    if isinstance(body, list):
+        yield '['
+        for start in range(0, len(body), ENCODE_CHUNK_ITEMS):
+            if start:
+                yield ', '
+            yield _dumps(body[start:start + ENCODE_CHUNK_ITEMS])[1:-1]
+        yield ']'
+    elif isinstance(body, dict) and all(isinstance(key, str) for key in body):
+        yield '{'
+        for position, (key, value) in enumerate(body.items()):
+            yield (', ' if position else '') + _dumps(key) + ': '
+            if isinstance(value, list):
+                yield from _encode_chunks(value)
+            else:
+                yield _dumps(value)
+        yield '}'
+    else:
+        yield _dumps(body)
+
+def respond(status_code, body, event=None):
     """
     Helper function to format the HTTP response.
+
+    When the request event is given and its Accept-Encoding allows gzip,
+    bodies of GZIP_MIN_BYTES or more are gzip-compressed while they are
+    encoded. They are returned base64-encoded for API Gateway.
     """
+    headers = {'Content-Type': 'application/json'}
+
+    if not accepts_gzip(event):
+        return {
+            'statusCode': status_code,
+            'body': ''.join(_encode_chunks(body)),
+            'headers': headers
+        }
+
+    buffered, buffered_size, compressor = [], 0, None
+    compressed = []
+    for chunk in _encode_chunks(body):
+        if compressor is None:
+            buffered.append(chunk)
+            buffered_size += len(chunk)
+            if buffered_size < GZIP_MIN_BYTES:
+                continue
+            # Large enough to be worth compressing
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            chunk, buffered = ''.join(buffered), None
+        compressed.append(compressor.compress(chunk.encode('utf-8')))
+
+    if compressor is None:
+        return {
+            'statusCode': status_code,
+            'body': ''.join(buffered),
+            'headers': headers
+        }
+
+    compressed.append(compressor.flush())
+    headers.update({'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
     return {
         'statusCode': status_code,
-        'body': json.dumps(body, cls=DecimalEncoder),
-        'headers': {
-            'Content-Type': 'application/json'
-        }
+        'body': base64.b64encode(b''.join(compressed)).decode('ascii'),
+        'headers': headers,
+        'isBase64Encoded': True
     }
 
 class DecimalEncoder(json.JSONEncoder):
@@ -152,3 +647,6 @@ class DecimalEncoder(json.JSONEncoder):
             # Convert decimal instances to float
             return float(obj)
         return super(DecimalEncoder, self).default(obj)
+
+# One encoder for every response instead of a new DecimalEncoder per json.dumps call
+_encoder = DecimalEncoder()
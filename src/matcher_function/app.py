@@ -0,0 +1,312 @@
+# src/matcher_function/app.py
+
+import os
+import re
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.dynamodb.types import TypeDeserializer
+from common import aws
+from common.metrics import metrics
+from common.opensearch import OPENSEARCH_INDEX, OpenSearchClient
+from common.notifications import NOTIFICATION_LEDGER_TABLE, NotificationDispatcher
+from common.snapshots import SnapshotStore
+from request_index import RequestIndex
+from product_index import ProductIndexCache
+
+USER_REQUESTS_TABLE = os.environ.get('USER_REQUESTS_TABLE', 'UserRequests')
+# Postcode groups searched at the same time
+MATCHER_CONCURRENCY = int(os.environ.get('MATCHER_CONCURRENCY', '8'))
+# Searches sent in a single _msearch request
+MSEARCH_BATCH_SIZE = int(os.environ.get('MSEARCH_BATCH_SIZE', '100'))
+# Products returned per user request
+MAX_MATCHES_PER_REQUEST = int(os.environ.get('MAX_MATCHES_PER_REQUEST', '5'))
+# Seconds a postcode's requests stay in the in-memory request index
+REQUEST_INDEX_TTL = int(os.environ.get('REQUEST_INDEX_TTL', '300'))
+PRODUCT_CATALOG_TABLE = os.environ.get('PRODUCT_CATALOG_TABLE', 'ProductCatalogTable')
+# Catalogues with at most this many products are matched in memory instead of through OpenSearch; 0 turns it off
+LOCAL_INDEX_MAX_PRODUCTS = int(os.environ.get('LOCAL_INDEX_MAX_PRODUCTS', '5000'))
+# Seconds a postcode's product index is reused, and how many postcodes are kept
+PRODUCT_INDEX_TTL = int(os.environ.get('PRODUCT_INDEX_TTL', '300'))
+PRODUCT_INDEX_CACHE_SIZE = int(os.environ.get('PRODUCT_INDEX_CACHE_SIZE', '8'))
+# The scraper's catalogue records, used to tell whether a postcode's snapshot is still current
+CATALOGUE_TABLE = os.environ.get('CATALOGUE_TABLE', 'CatalogueTable')
+CATALOGUE_MAPPING_TABLE = os.environ.get('CATALOGUE_MAPPING_TABLE', 'PostcodeCatalogueTable')
+# Product attributes used to filter, deduplicate and describe matches
+MATCH_ATTRIBUTES = ('POSTCODE', 'ProductName', 'Price', 'Saving', 'OfferValid', 'DiscountPercent')
+
+dynamodb = aws.resource('dynamodb')
+user_requests_table = dynamodb.Table(USER_REQUESTS_TABLE)
+sns = aws.client('sns')
+deserializer = TypeDeserializer()
+
+# Kept across warm invocations so catalogue changes only cost an in-memory lookup
+request_index = RequestIndex(user_requests_table, ttl_seconds=REQUEST_INDEX_TTL)
+
+# Created once per container so signed connections are reused across invocations
+opensearch = OpenSearchClient.from_environment()
+
+def lambda_handler(event, context):
+    """
+    Matches user requests against the catalogue and sends an SMS for each
+    request that has matching discounted products.
+
+    ProductCatalogTable stream batches are matched incrementally: only the
+    changed products are checked, against the requests of their postcode.
+    The daily schedule runs a full match of every active request.
+    """
+    if 'Records' in event:
+        counts = match_changed_products(event['Records'], dispatcher.dispatch)
+        with metrics.timer('Dispatch'):
+            counts['notifications'] = dispatcher.flush()
+        metrics.flush()
+        print(f"Matched {counts['products']} changed products: {counts}")
+        return {
+            'statusCode': 200,
+            'body': json.dumps(counts)
+        }
+
+    requests_by_postcode = load_active_requests()
+    counts = match_requests(requests_by_postcode, dispatcher.dispatch)
+    with metrics.timer('Dispatch'):
+        counts['notifications'] = dispatcher.flush()
+    metrics.flush()
+    print(f"Matched {counts['requests']} requests in {counts['postcodes']} postcodes: {counts}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(counts)
+    }
+
+def request_postcode(request):
+    """
+    Get a user request's postcode, whichever attribute name it was stored under.
+    """
+    return str(request.get('POSTCODE') or request.get('Postcode') or '')
+
+@metrics.timed('LoadRequests')
+def load_active_requests():
+    """
+    Scan UserRequestsTable and group the active requests by postcode.
+
+    Returns:
+        dict: Postcode to the list of its user requests.
+    """
+    requests_by_postcode = defaultdict(list)
+    scan_kwargs = {}
+    while True:
+        response = user_requests_table.scan(**scan_kwargs)
+        for request in response.get('Items', []):
+            if request.get('Active', True) and request.get('ProductName') and request_postcode(request):
+                requests_by_postcode[request_postcode(request)].append(request)
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return requests_by_postcode
+
+def build_search(request):
+    """
+    Build the OpenSearch query for one user request.
+
+    Args:
+        request (dict): The user request.
+
+    Returns:
+        dict: The search body.
+    """
+    filters = [{'term': {'POSTCODE.keyword': request_postcode(request)}}]
+    discount = float(request.get('Discount') or 0)
+    if discount > 0:
+        # DiscountPercent is the numeric discount the scraper stores with each product
+        filters.append({'range': {'DiscountPercent': {'gte': discount}}})
+
+    return {
+        'size': MAX_MATCHES_PER_REQUEST,
+        'query': {
+            'bool': {
+                'must': [{
+                    'match': {
+                        'ProductName': {
+                            'query': request['ProductName'],
+                            'fuzziness': 'AUTO',
+                            'operator': 'and'
+                        }
+                    }
+                }],
+                'filter': filters
+            }
+        }
+    }
+
+_AMOUNT = re.compile(r'\$\s*(\d+(?:\.\d{1,2})?)|(\d+)\s*c\b')
+
+def _amount(text):
+    match = _AMOUNT.search(str(text or ''))
+    if not match:
+        return None
+    return float(match.group(1)) if match.group(1) else int(match.group(2)) / 100
+
+def discount_percent(product):
+    """
+    Get a product's discount, preferring the DiscountPercent stored by the
+    scraper and falling back to the displayed saving and price.
+
+    Args:
+        product (dict): The indexed product.
+
+    Returns:
+        float: The discount in percent, or 0 if it cannot be worked out.
+    """
+    if product.get('DiscountPercent') is not None:
+        return float(product['DiscountPercent'])
+    saving = _amount(product.get('Saving'))
+    price = _amount(product.get('Price'))
+    if not saving or not price:
+        return 0.0
+    return 100 * saving / (price + saving)
+
+def meets_discount(product, request):
+    """
+    Check a product's discount against the user's minimum Discount.
+    """
+    return discount_percent(product) >= float(request.get('Discount') or 0)
+
+@metrics.timed('SearchGroup')
+def search_group(requests):
+    """
+    Run the searches for a group of requests from one postcode.
+
+    The postcode's in-memory product index answers them when its catalogue
+    is small enough; otherwise they go to OpenSearch.
+
+    Args:
+        requests (list): User requests from the same postcode.
+
+    Returns:
+        list: (request, matching products) pairs.
+    """
+    index = product_indexes.get(request_postcode(requests[0])) if product_indexes else None
+    if index is not None:
+        return search_local(index, requests)
+
+    results = []
+    for start in range(0, len(requests), MSEARCH_BATCH_SIZE):
+        batch = requests[start:start + MSEARCH_BATCH_SIZE]
+        responses = opensearch.msearch(OPENSEARCH_INDEX, [build_search(request) for request in batch])
+        for request, response in zip(batch, responses):
+            if 'error' in response:
+                print(f"Search failed for request {request.get('RequestID')}: {response['error']}")
+                continue
+            # The discount filter already ran in the query against DiscountPercent
+            results.append((request, [hit['_source'] for hit in response.get('hits', {}).get('hits', [])]))
+    return results
+
+@metrics.timed('LocalSearch')
+def search_local(index, requests):
+    """
+    Run the searches for a group of requests against their postcode's ProductNameIndex.
+
+    Args:
+        index (ProductNameIndex): The postcode's product index.
+        requests (list): User requests from the same postcode.
+
+    Returns:
+        list: (request, matching products) pairs.
+    """
+    return [
+        (request, index.search(request['ProductName'], min_discount=float(request.get('Discount') or 0),
+                               limit=MAX_MATCHES_PER_REQUEST))
+        for request in requests
+    ]
+
+def match_requests(requests_by_postcode, dispatch):
+    """
+    Search every postcode group concurrently and dispatch matches as groups finish.
+
+    Args:
+        requests_by_postcode (dict): Postcode to its user requests.
+        dispatch (callable): Called with (request, products) for every request
+            that has at least one match.
+
+    Returns:
+        dict: Counts of postcodes, requests, matched requests and failed groups.
+    """
+    counts = {'postcodes': len(requests_by_postcode), 'requests': 0, 'matched': 0, 'failed_postcodes': 0}
+    with ThreadPoolExecutor(max_workers=MATCHER_CONCURRENCY) as executor:
+        futures = {
+            executor.submit(search_group, requests): postcode
+            for postcode, requests in requests_by_postcode.items()
+        }
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"Error matching postcode {futures[future]}: {e}")
+                counts['failed_postcodes'] += 1
+                continue
+            for request, products in results:
+                counts['requests'] += 1
+                if products:
+                    counts['matched'] += 1
+                    dispatch(request, products)
+    return counts
+
+@metrics.timed('MatchChanges')
+def match_changed_products(records, dispatch):
+    """
+    Match the products in a ProductCatalogTable stream batch against the user requests of their postcodes.
+
+    Args:
+        records (list): DynamoDB stream records.
+        dispatch (callable): Called with (request, products) for every request
+            that matches at least one changed product.
+
+    Returns:
+        dict: Counts of changed products, candidate requests and matched requests.
+    """
+    counts = {'products': 0, 'candidates': 0, 'matched': 0}
+    matches = defaultdict(list)
+    requests = {}
+
+    for record in records:
+        if record['eventName'] not in ('INSERT', 'MODIFY'):
+            continue
+        image = record['dynamodb'].get('NewImage', {})
+        product = {name: deserializer.deserialize(value) for name, value in image.items()}
+        counts['products'] += 1
+
+        for request in request_index.candidates(str(product.get('POSTCODE')), product.get('ProductName')):
+            counts['candidates'] += 1
+            if meets_discount(product, request):
+                key = (request_postcode(request), request.get('RequestID') or request.get('ProductName'))
+                requests[key] = request
+                matches[key].append(product)
+
+    # One message per request, however many of its products changed in this batch
+    for key, products in matches.items():
+        counts['matched'] += 1
+        dispatch(requests[key], products[:MAX_MATCHES_PER_REQUEST])
+    return counts
+
+def format_message(request, products):
+    """
+    Build the SMS text for a request's matches.
+    """
+    lines = [f"Good news! Deals matching '{request['ProductName']}':"]
+    for product in products:
+        price = product.get('Price', 'NA')
+        saving = product.get('Saving', 'NA')
+        lines.append(f"- {product.get('ProductName')} {price} ({saving}), {product.get('OfferValid', '')}".rstrip(', '))
+    return '\n'.join(lines)
+
+# Sends each (request, product, offer period) once; its sent-key cache survives warm invocations
+dispatcher = NotificationDispatcher(dynamodb.Table(NOTIFICATION_LEDGER_TABLE), sns, format_message)
+
+# Small catalogues are indexed in memory per postcode, so a full match needs no OpenSearch round trips;
+# the catalogue snapshots written by the scraper are read when SNAPSHOT_LOCATION is set and still current
+product_indexes = ProductIndexCache(
+    dynamodb.Table(PRODUCT_CATALOG_TABLE), max_products=LOCAL_INDEX_MAX_PRODUCTS, ttl_seconds=PRODUCT_INDEX_TTL,
+    max_postcodes=PRODUCT_INDEX_CACHE_SIZE, discount=discount_percent, attributes=MATCH_ATTRIBUTES,
+    snapshots=SnapshotStore.from_environment(), catalogue_table=dynamodb.Table(CATALOGUE_TABLE),
+    mapping_table=dynamodb.Table(CATALOGUE_MAPPING_TABLE)
+) if LOCAL_INDEX_MAX_PRODUCTS > 0 else None
@@ -0,0 +1,325 @@
+# src/matcher_function/product_index.py
+
+import math
+import time
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from boto3.dynamodb.conditions import Key
+from common.snapshots import NULL_INT
+from request_index import TERM_SIMILARITY, tokenize
+
+# Share of trigrams (Dice coefficient) a term needs with a query term before they are compared in full
+TRIGRAM_OVERLAP = 0.5
+
+
+def trigrams(term):
+    """
+    Get a term's trigrams, with '$' marking its start and end so short terms have some too.
+    """
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _pack(postings):
+    """
+    Store lists of IDs back to back in one array, with the offset where each list starts.
+
+    Returns:
+        tuple: (offsets, ids); list n is ids[offsets[n]:offsets[n + 1]].
+    """
+    offsets = array('I', [0])
+    ids = array('I')
+    for posting in postings:
+        ids.extend(posting)
+        offsets.append(len(ids))
+    return offsets, ids
+
+
+class ProductNameIndex:
+    """
+    Compact in-memory index of one postcode's catalogue for fuzzy product name search.
+
+    Product names are split with the same tokenize() as user requests. Each
+    term's postings (the products containing it) are stored back to back in a
+    single array('I'), and each trigram's postings (the terms containing it)
+    the same way, so the index holds a few flat arrays rather than a list per
+    term. A query term matches its own term and any term that shares enough
+    trigrams and is as similar as RequestIndex requires. Discounts sit in an
+    array('d'), so the discount filter does not touch the product dicts.
+
+    Build it with from_items() or from_snapshot(); the constructor takes the
+    product names, their discounts as an array('d'), and the sequence the
+    search results are taken from, all in the same product order.
+    """
+    def __init__(self, names, discounts, products):
+        self.products = products
+        self.discounts = discounts
+
+        self.term_ids = {}
+        term_postings = []
+        for product_id, name in enumerate(names):
+            for term in set(tokenize(name)):
+                term_id = self.term_ids.setdefault(term, len(term_postings))
+                if term_id == len(term_postings):
+                    term_postings.append([])
+                term_postings[term_id].append(product_id)
+        self.terms = list(self.term_ids)
+        self.term_offsets, self.term_postings = _pack(term_postings)
+
+        self.trigram_ids = {}
+        trigram_postings = []
+        self.trigram_counts = array('H')
+        for term_id, term in enumerate(self.terms):
+            grams = trigrams(term)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                gram_id = self.trigram_ids.setdefault(gram, len(trigram_postings))
+                if gram_id == len(trigram_postings):
+                    trigram_postings.append([])
+                trigram_postings[gram_id].append(term_id)
+        self.trigram_offsets, self.trigram_postings = _pack(trigram_postings)
+
+        # Query term to the IDs of the terms it matches; user requests repeat the same few words
+        self.expansions = {}
+
+    @classmethod
+    def from_items(cls, products, discount=None):
+        """
+        Index a list of ProductCatalogTable items.
+
+        Args:
+            products (list): The postcode's products.
+            discount (callable): Gets a product's discount in percent. Defaults to its DiscountPercent.
+
+        Returns:
+            ProductNameIndex: The index.
+        """
+        discount = discount or (lambda product: float(product.get('DiscountPercent') or 0))
+        products = list(products)
+        return cls((product.get('ProductName') for product in products),
+                   array('d', (discount(product) for product in products)), products)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, discount=None, attributes=None):
+        """
+        Index a catalogue snapshot without building a dict per product.
+
+        Discounts are copied from the DiscountPercent column. Only products
+        without one are built as dicts, to pass to the discount function.
+        Search results are built from the snapshot when they are returned.
+
+        Args:
+            snapshot (Snapshot): The postcode's catalogue snapshot.
+            discount (callable): Works out a product's discount when DiscountPercent is missing.
+            attributes (list): The attributes of the returned products; all by default.
+
+        Returns:
+            ProductNameIndex: The index.
+        """
+        column = snapshot.column('DiscountPercent')
+        if column is None:
+            discounts = array('d', [math.nan] * len(snapshot))
+        elif snapshot.column_info['DiscountPercent']['type'] == 'int64':
+            # Snapshots written before DiscountPercent was always float64 mark missing values with NULL_INT
+            discounts = array('d', (math.nan if value == NULL_INT else value for value in column))
+        else:
+            discounts = array('d', column)
+        for product_id, value in enumerate(discounts):
+            if math.isnan(value):
+                discounts[product_id] = discount(snapshot.row(product_id, attributes)) if discount else 0.0
+        return cls(snapshot.column('ProductName') or [], discounts, snapshot.records(attributes))
+
+    def __len__(self):
+        return len(self.products)
+
+    def expand(self, term):
+        """
+        Find the index terms a query term matches, allowing for misspellings.
+
+        Args:
+            term (str): A tokenized query term.
+
+        Returns:
+            list: The matching term IDs.
+        """
+        cached = self.expansions.get(term)
+        if cached is not None:
+            return cached
+
+        exact = self.term_ids.get(term)
+        matches = [] if exact is None else [exact]
+        grams = trigrams(term)
+        shared = {}
+        for gram in grams:
+            gram_id = self.trigram_ids.get(gram)
+            if gram_id is None:
+                continue
+            for term_id in self.trigram_postings[self.trigram_offsets[gram_id]:self.trigram_offsets[gram_id + 1]]:
+                shared[term_id] = shared.get(term_id, 0) + 1
+
+        for term_id, count in shared.items():
+            if term_id == exact or 2 * count / (len(grams) + self.trigram_counts[term_id]) < TRIGRAM_OVERLAP:
+                continue
+            if SequenceMatcher(None, term, self.terms[term_id]).ratio() >= TERM_SIMILARITY:
+                matches.append(term_id)
+
+        self.expansions[term] = matches
+        return matches
+
+    def search(self, query, min_discount=0.0, limit=10):
+        """
+        Find the products whose names match every term of a query.
+
+        Args:
+            query (str): The user's product name.
+            min_discount (float): The smallest discount in percent to return.
+            limit (int): The most products to return.
+
+        Returns:
+            list: The matching products, largest discount first.
+        """
+        candidates = None
+        for term in tokenize(query):
+            product_ids = set()
+            for term_id in self.expand(term):
+                product_ids.update(self.term_postings[self.term_offsets[term_id]:self.term_offsets[term_id + 1]])
+            candidates = product_ids if candidates is None else candidates & product_ids
+            if not candidates:
+                return []
+        if candidates is None:
+            return []
+
+        discounts = self.discounts
+        hits = sorted((product_id for product_id in candidates if discounts[product_id] >= min_discount),
+                      key=lambda product_id: (-discounts[product_id], product_id))
+        return [self.products[product_id] for product_id in hits[:limit]]
+
+
+class ProductIndexCache:
+    """
+    ProductNameIndexes per postcode, kept across warm invocations.
+
+    A postcode's index is built from its catalogue snapshot when there is
+    one, which costs a single object read, and otherwise from a Query on
+    ProductCatalogTable. When the catalogue tables are given, a snapshot is
+    only used if it holds the catalogue the postcode is mapped to, that
+    mapping is still valid, and the catalogue was not scraped again after
+    the snapshot was written; otherwise the table is read. A postcode whose catalogue has more than
+    max_products products gets no index and is remembered as too large
+    until the TTL expires, so callers fall back to OpenSearch without
+    reading the catalogue every time. Only the given attributes are kept
+    for the returned products.
+    """
+    def __init__(self, table, max_products=5000, ttl_seconds=300, max_postcodes=8, discount=None, attributes=None,
+                 snapshots=None, catalogue_table=None, mapping_table=None):
+        self.table = table
+        self.catalogue_table = catalogue_table
+        self.mapping_table = mapping_table
+        self.attributes = attributes
+        self.max_products = max_products
+        self.ttl_seconds = ttl_seconds
+        self.max_postcodes = max_postcodes
+        self.discount = discount
+        self.snapshots = snapshots
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _load_products(self, postcode):
+        products = []
+        query_kwargs = {'KeyConditionExpression': Key('POSTCODE').eq(postcode)}
+        if self.attributes:
+            query_kwargs['ProjectionExpression'] = ', '.join(self.attributes)
+        while True:
+            response = self.table.query(**query_kwargs)
+            products.extend(response.get('Items', []))
+            if len(products) > self.max_products:
+                return None
+            if 'LastEvaluatedKey' not in response:
+                return products
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _snapshot_is_current(self, postcode, snapshot):
+        if self.mapping_table is None or self.catalogue_table is None:
+            return True
+        try:
+            mapping = self.mapping_table.get_item(Key={'POSTCODE': postcode}).get('Item')
+            catalogue = self.catalogue_table.get_item(
+                Key={'CatalogueID': mapping['CatalogueID']}
+            ).get('Item') if mapping else None
+        except Exception as e:
+            logging.error(f"Failed to read the catalogue of postcode {postcode}, not using its snapshot: {e}")
+            return False
+
+        reason = None
+        if not mapping or int(mapping.get('ValidUntil', 0)) <= time.time():
+            reason = 'its catalogue mapping has expired'
+        elif mapping['CatalogueID'] != snapshot.catalogue_id:
+            reason = f"it holds catalogue {snapshot.catalogue_id}, not {mapping['CatalogueID']}"
+        elif catalogue and int(catalogue.get('ScrapedAt', 0)) * 1000 > snapshot.created_at:
+            reason = 'the catalogue was scraped again after it was written'
+        if reason:
+            logging.info(f"Snapshot of postcode {postcode} is stale ({reason}); reading ProductCatalogTable.")
+            return False
+        return True
+
+    def _build(self, postcode):
+        if self.snapshots is not None:
+            try:
+                snapshot = self.snapshots.load(postcode)
+            except Exception as e:
+                logging.error(f"Failed to read the catalogue snapshot of postcode {postcode}: {e}")
+                snapshot = None
+            if snapshot is not None and not self._snapshot_is_current(postcode, snapshot):
+                snapshot.close()
+                snapshot = None
+            if snapshot is not None:
+                if len(snapshot) > self.max_products:
+                    snapshot.close()
+                    return None
+                return ProductNameIndex.from_snapshot(snapshot, self.discount, self.attributes)
+
+        products = self._load_products(postcode)
+        return ProductNameIndex.from_items(products, self.discount) if products is not None else None
+
+    def get(self, postcode):
+        """
+        Get the index of a postcode's catalogue.
+
+        Args:
+            postcode (str): The postcode.
+
+        Returns:
+            ProductNameIndex: The index, or None if the catalogue is too large or could not be read.
+        """
+        postcode = str(postcode)
+        with self.lock:
+            cached = self.indexes.get(postcode)
+            if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+                self.indexes.move_to_end(postcode)
+                return cached[1]
+
+        try:
+            index = self._build(postcode)
+        except Exception as e:
+            logging.error(f"Failed to load the catalogue of postcode {postcode}: {e}")
+            return None
+
+        with self.lock:
+            self.indexes[postcode] = (time.monotonic(), index)
+            self.indexes.move_to_end(postcode)
+            while len(self.indexes) > self.max_postcodes:
+                self.indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, postcode=None):
+        """
+        Drop a postcode's index, or every index, so it is rebuilt.
+        """
+        with self.lock:
+            if postcode is None:
+                self.indexes.clear()
+            else:
+                self.indexes.pop(str(postcode), None)
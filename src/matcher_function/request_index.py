@@ -0,0 +1,132 @@
+# src/matcher_function/request_index.py
+
+import re
+import time
+from difflib import SequenceMatcher
+from boto3.dynamodb.conditions import Key
+
+# Words that say nothing about which product a user wants
+STOPWORDS = {'the', 'and', 'of', 'with', 'for', 'a', 'an', 'in', 'pk', 'pack', 'ea', 'each'}
+# Length of the prefix used to find requests whose terms are misspelt near the end
+PREFIX_LENGTH = 3
+# Similarity two terms need to count as the same word
+TERM_SIMILARITY = 0.8
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """
+    Split a product name into normalised terms.
+
+    Args:
+        text (str): A product name or user search term.
+
+    Returns:
+        list: Lowercase terms with stopwords, sizes and plural 's' removed.
+    """
+    terms = []
+    for token in _TOKEN.findall(str(text or '').lower()):
+        if token in STOPWORDS or token.isdigit() or re.fullmatch(r'\d+[a-z]{1,2}', token):
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def terms_match(request_terms, product_terms):
+    """
+    Check that every request term appears, possibly misspelt, in the product terms.
+
+    Args:
+        request_terms (list): The user's terms.
+        product_terms (set): The product's terms.
+
+    Returns:
+        bool: True if every request term has a close enough product term.
+    """
+    for term in request_terms:
+        if term in product_terms:
+            continue
+        if not any(SequenceMatcher(None, term, candidate).ratio() >= TERM_SIMILARITY for candidate in product_terms):
+            return False
+    return True
+
+
+class RequestIndex:
+    """
+    In-memory index of user requests by product term, built per postcode.
+
+    The index lives at module level, so warm invocations reuse it. A postcode's
+    entry is loaded with a Query on UserRequestsTable the first time one of its
+    products changes and is refreshed once it is older than the TTL.
+    """
+    def __init__(self, table, ttl_seconds=300):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.postcodes = {}
+
+    def _load(self, postcode):
+        terms = {}
+        query_kwargs = {'KeyConditionExpression': Key('POSTCODE').eq(postcode)}
+        while True:
+            response = self.table.query(**query_kwargs)
+            for request in response.get('Items', []):
+                if not request.get('Active', True):
+                    continue
+                request_terms = tokenize(request.get('ProductName'))
+                if not request_terms:
+                    continue
+                entry = (request, request_terms)
+                for term in set(request_terms):
+                    terms.setdefault(term, []).append(entry)
+                    terms.setdefault(term[:PREFIX_LENGTH], []).append(entry)
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        self.postcodes[postcode] = (time.monotonic(), terms)
+        return terms
+
+    def _terms(self, postcode):
+        cached = self.postcodes.get(postcode)
+        if cached and time.monotonic() - cached[0] < self.ttl_seconds:
+            return cached[1]
+        return self._load(postcode)
+
+    def candidates(self, postcode, product_name):
+        """
+        Find the requests in a postcode whose terms match a product name.
+
+        Args:
+            postcode (str): The product's postcode.
+            product_name (str): The product's name.
+
+        Returns:
+            list: The matching user requests.
+        """
+        product_terms = set(tokenize(product_name))
+        if not product_terms:
+            return []
+
+        terms = self._terms(postcode)
+        seen = set()
+        matches = []
+        for term in product_terms:
+            for key in (term, term[:PREFIX_LENGTH]):
+                for request, request_terms in terms.get(key, []):
+                    if id(request) in seen:
+                        continue
+                    seen.add(id(request))
+                    if terms_match(request_terms, product_terms):
+                        matches.append(request)
+        return matches
+
+    def invalidate(self, postcode=None):
+        """
+        Drop a postcode's entry, or the whole index, so it is reloaded.
+        """
+        if postcode is None:
+            self.postcodes.clear()
+        else:
+            self.postcodes.pop(postcode, None)
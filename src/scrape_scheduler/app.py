@@ -0,0 +1,224 @@
+# src/scrape_scheduler/app.py
+
+import os
+import json
+import time
+from botocore.exceptions import ClientError
+from common import aws
+from common.metrics import metrics
+from common.token_bucket import (SCRAPE_BUCKET_NAME, SCRAPE_BURST, SCRAPE_RATE_LIMIT_TABLE, SCRAPES_PER_HOUR,
+                                 DynamoDBTokenBucket)
+
+UNIQUE_POSTCODES_TABLE = os.environ.get('UNIQUE_POSTCODES_TABLE', 'UniquePostcodesTable')
+# Active requests per postcode, kept by the UniquePostcodes updater
+REQUEST_COUNTS_TABLE = os.environ.get('REQUEST_COUNTS_TABLE', 'PostcodeRequestCountsTable')
+SCRAPER_FUNCTION_NAME = os.environ.get('SCRAPER_FUNCTION_NAME', 'ScraperFunction')
+# Every postcode is scraped again once its last scrape is this old
+REFRESH_INTERVAL_HOURS = float(os.environ.get('REFRESH_INTERVAL_HOURS', '168'))
+# A dispatched postcode is not dispatched again for this long; longer than a scraper invocation can run
+SCRAPE_LEASE_MINUTES = float(os.environ.get('SCRAPE_LEASE_MINUTES', '60'))
+# Postcodes per scraper invocation, and scraper invocations started per run
+POSTCODES_PER_WORK_UNIT = int(os.environ.get('POSTCODES_PER_WORK_UNIT', '4'))
+MAX_CONCURRENT_WORKERS = int(os.environ.get('MAX_CONCURRENT_WORKERS', '5'))
+
+# Only read here; the scraper takes a token when it opens a browser
+rate_limit = DynamoDBTokenBucket(
+    aws.table(SCRAPE_RATE_LIMIT_TABLE), SCRAPE_BUCKET_NAME, SCRAPES_PER_HOUR / 3600, SCRAPE_BURST
+)
+
+def lambda_handler(event, context):
+    """
+    Dispatches the postcodes due for a refresh to scraper workers.
+
+    Runs on a schedule. Due postcodes are ordered by how many active user
+    requests they have, limited to the scrapes the global rate limit has
+    tokens for, leased so an overlapping run cannot dispatch them again,
+    and split into work units that are sent to ScraperFunction as
+    asynchronous invocations. Tokens are only taken by the scraper when it
+    opens a browser, so postcodes filled from an already scraped catalogue
+    cost none.
+    """
+    now = time.time()
+    due = due_postcodes(now)
+    counts = {'due': len(due), 'available': 0, 'dispatched': 0, 'units': 0, 'failed': 0}
+
+    if due:
+        ranked = prioritise(due, request_counts([postcode for postcode, _ in due]))
+        with metrics.timer('ReadTokens'):
+            counts['available'] = int(rate_limit.available())
+        wanted = min(len(ranked), counts['available'], POSTCODES_PER_WORK_UNIT * MAX_CONCURRENT_WORKERS)
+
+        claimed = []
+        for postcode in ranked:
+            if len(claimed) >= wanted:
+                break
+            if claim(postcode, now):
+                claimed.append(postcode)
+
+        for unit in shard(claimed, POSTCODES_PER_WORK_UNIT, MAX_CONCURRENT_WORKERS):
+            if dispatch(unit):
+                counts['units'] += 1
+                counts['dispatched'] += len(unit)
+            else:
+                counts['failed'] += len(unit)
+                for postcode in unit:
+                    release(postcode)
+
+    backlog_hours = (counts['due'] - counts['dispatched']) / SCRAPES_PER_HOUR if SCRAPES_PER_HOUR else 0
+    if backlog_hours > REFRESH_INTERVAL_HOURS:
+        print(f"Refresh backlog of {counts['due'] - counts['dispatched']} postcodes needs {backlog_hours:.0f}h "
+              f"at {SCRAPES_PER_HOUR:g} scrapes/hour, more than the {REFRESH_INTERVAL_HOURS:g}h refresh interval")
+
+    for name in ('due', 'dispatched', 'failed'):
+        metrics.record('Schedule', name.capitalize(), counts[name], unit='Count')
+    metrics.flush()
+    print(f"Scrape schedule: {counts}")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(counts)
+    }
+
+def _scan(table, **scan_kwargs):
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+@metrics.timed('DuePostcodes')
+def due_postcodes(now):
+    """
+    List the postcodes whose last scrape is older than the refresh interval and that are not leased.
+
+    Args:
+        now (float): The current Unix time.
+
+    Returns:
+        list: (postcode, last scraped at) pairs; never scraped postcodes have 0.
+    """
+    refresh_before = now - REFRESH_INTERVAL_HOURS * 3600
+    lease_expired = now - SCRAPE_LEASE_MINUTES * 60
+    due = []
+    table = aws.table(UNIQUE_POSTCODES_TABLE)
+    for item in _scan(table, ProjectionExpression='POSTCODE, LastScrapedAt, ScheduledAt'):
+        last_scraped = float(item.get('LastScrapedAt', 0))
+        if last_scraped < refresh_before and float(item.get('ScheduledAt', 0)) < lease_expired:
+            due.append((str(item['POSTCODE']), last_scraped))
+    return due
+
+@metrics.timed('CountRequests')
+def request_counts(postcodes):
+    """
+    Read the active request counts of the given postcodes, 100 keys per BatchGetItem.
+
+    The counts are kept by the UniquePostcodes updater, so UserRequests is never scanned.
+
+    Args:
+        postcodes (list): The due postcodes.
+
+    Returns:
+        dict: Postcode to its number of active requests; postcodes without a count are left out.
+    """
+    counts = {}
+    dynamodb = aws.resource('dynamodb')
+    for start in range(0, len(postcodes), 100):
+        request = {REQUEST_COUNTS_TABLE: {'Keys': [{'POSTCODE': postcode} for postcode in postcodes[start:start + 100]],
+                                          'ProjectionExpression': 'POSTCODE, ActiveRequests'}}
+        while request:
+            try:
+                response = dynamodb.batch_get_item(RequestItems=request)
+            except ClientError as e:
+                # Without counts the postcodes are still dispatched, oldest scrape first
+                print(f"Error reading request counts: {e.response['Error']['Message']}")
+                break
+            for item in response.get('Responses', {}).get(REQUEST_COUNTS_TABLE, []):
+                counts[str(item['POSTCODE'])] = int(item.get('ActiveRequests', 0))
+            request = response.get('UnprocessedKeys')
+    return counts
+
+def prioritise(due, request_counts):
+    """
+    Order due postcodes by active requests, most first, then by the oldest scrape.
+
+    Args:
+        due (list): (postcode, last scraped at) pairs.
+        request_counts (dict): Postcode to its number of active requests.
+
+    Returns:
+        list: The postcodes in dispatch order.
+    """
+    return [postcode for postcode, _ in
+            sorted(due, key=lambda entry: (-request_counts.get(entry[0], 0), entry[1], entry[0]))]
+
+def shard(postcodes, per_unit, max_units):
+    """
+    Split postcodes into work units, dealing them out in turn so every unit starts with high-priority postcodes.
+
+    Args:
+        postcodes (list): The postcodes in priority order.
+        per_unit (int): The most postcodes in a unit.
+        max_units (int): The most units.
+
+    Returns:
+        list: The work units, each a list of postcodes.
+    """
+    if not postcodes:
+        return []
+    units = min(max_units, -(-len(postcodes) // per_unit))
+    return [postcodes[index:units * per_unit:units] for index in range(units)]
+
+def claim(postcode, now):
+    """
+    Lease a postcode so no other scheduler run dispatches it until the lease expires.
+
+    Returns:
+        bool: True if this run holds the lease.
+    """
+    try:
+        aws.table(UNIQUE_POSTCODES_TABLE).update_item(
+            Key={'POSTCODE': postcode},
+            UpdateExpression='SET ScheduledAt = :now',
+            ConditionExpression='attribute_exists(POSTCODE) AND '
+                                '(attribute_not_exists(ScheduledAt) OR ScheduledAt < :expired)',
+            ExpressionAttributeValues={':now': int(now), ':expired': int(now - SCRAPE_LEASE_MINUTES * 60)}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"Error leasing postcode {postcode}: {e.response['Error']['Message']}")
+        return False
+
+def release(postcode):
+    """
+    Drop a postcode's lease so the next run can dispatch it.
+    """
+    try:
+        aws.table(UNIQUE_POSTCODES_TABLE).update_item(
+            Key={'POSTCODE': postcode},
+            UpdateExpression='REMOVE ScheduledAt'
+        )
+    except ClientError as e:
+        print(f"Error releasing postcode {postcode}: {e.response['Error']['Message']}")
+
+def dispatch(postcodes):
+    """
+    Start a scraper worker for a work unit.
+
+    Args:
+        postcodes (list): The postcodes of the unit.
+
+    Returns:
+        bool: True if the invocation was accepted.
+    """
+    try:
+        aws.client('lambda').invoke(
+            FunctionName=SCRAPER_FUNCTION_NAME,
+            InvocationType='Event',
+            Payload=json.dumps({'postcodes': postcodes}).encode('utf-8')
+        )
+        return True
+    except ClientError as e:
+        print(f"Error dispatching postcodes {postcodes}: {e.response['Error']['Message']}")
+        return False
@@ -2,81 +2,117 @@ import os
 import boto3
 import json
 import time
-import tempfile 
+import threading
 import logging
 
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException
-
-# Configure logging
+from batch_writer import BatchWriter
+from category_pool import recommended_pool_size, scrape_categories_in_parallel
+from driver_manager import DriverManager
+from catalogue_registry import CatalogueRegistry, catalogue_valid_until
+from change_detection import ChangeDetector
+from prices import normalise_prices
+from checkpoints import CheckpointStore, Deadline, ScrapeFailed, ScrapeIncomplete, ScrapeProgress, ScrapeRateLimited
+from common.metrics import metrics
+from common.snapshots import SnapshotStore
+from common.token_bucket import (SCRAPE_BUCKET_NAME, SCRAPE_BURST, SCRAPE_RATE_LIMIT_TABLE, SCRAPES_PER_HOUR,
+                                 DynamoDBTokenBucket)
+
+# Configure logging; Lambda forwards stdout/stderr to CloudWatch, and /var/task is read-only
 logging.basicConfig(
     level=logging.INFO,  # Set the logging level
     format='%(asctime)s - %(levelname)s - %(message)s',  # Log format
-    handlers=[
-        logging.FileHandler('app.log'),  
-        logging.StreamHandler()  #log to console
-    ]
+    handlers=[logging.StreamHandler()]
 )
 
 
 # Initialize DynamoDB resource
 dynamodb = boto3.resource('dynamodb')
 product_table = dynamodb.Table('ProductCatalogTable')  # Name of the DynamoDB table
+unique_postcodes_table = dynamodb.Table(os.environ.get('UNIQUE_POSTCODES_TABLE', 'UniquePostcodesTable'))
+
+# Maps postcodes to regional catalogues so each catalogue is scraped once per week
+catalogue_registry = CatalogueRegistry(dynamodb, product_table)
+
+# Progress of scrapes that had to stop before the Lambda timeout
+checkpoint_store = CheckpointStore(dynamodb)
+
+# One token per browser scrape; postcodes filled from an already scraped catalogue take none
+rate_limit = DynamoDBTokenBucket(
+    dynamodb.Table(SCRAPE_RATE_LIMIT_TABLE), SCRAPE_BUCKET_NAME, SCRAPES_PER_HOUR / 3600, SCRAPE_BURST
+)
+
+def create_market(slot):
+    """
+    Start the Market browser for a pool slot; slot N uses debugging port 9222 + N.
+    """
+    # Selenium is only imported once a browser is needed, so catalogue fan-out never loads it
+    from market import Market
+    return Market(remote_debugging_port=9222 + slot)
+
+# Columnar catalogue snapshots for bulk readers such as the matcher; off unless SNAPSHOT_LOCATION is set
+snapshot_store = SnapshotStore.from_environment()
+
+# Browsers survive across warm invocations
+driver_manager = DriverManager(create_market)
 
 def lambda_handler(event, context):
     """
     Lambda function to scrape Woolworths catalogue based on a DynamoDB event
     and write product data to a DynamoDB table.
+
+    The scrape scheduler also invokes it directly with {'postcodes': [...]},
+    a work unit of postcodes due for their refresh.
     """
+    deadline = Deadline(context)
+    scheduled = 'postcodes' in event
     try:
-        # Extract DynamoDB event data (Assume it's an INSERT event for new postcode requests)
-        records = event.get('Records', [])
-        
-        for record in records:
-            if record['eventName'] == 'INSERT':
-                # Get the new record from DynamoDB Stream
-                new_image = record['dynamodb']['NewImage']
-                postcode = int(new_image['POSTCODE']['S'])  # Assuming POSTCODE is stored as a string in DynamoDB
-
-                # Initialize the Market bot
-                bot = Market()
-                
-                # Land on the first page
-                bot.land_first_page(url='https://www.woolworths.com.au/shop/catalogue')
-                
-                # Enter the postcode from the event data
-                bot.enter_postcode(postcode=postcode)
-                bot.select_first_postcode_option()
-                bot.click_read_catalogue_button()
-                
-                # Get the list of categories
-                category_list = bot.get_category_list()
-                
-                # Iterate through each category and extract product data
-                for category in category_list:
-                    # Click the category to load its products
-                    bot.click_category(category)
-
-                    # Extract all products in the current category
-                    category_data = bot.extract_products_in_category(category)
-
-                    # Store the extracted product data
-                    bot.store_product_data(category_data, postcode, category)
-
-                    time.sleep(0.5)
-        
+        if scheduled:
+            pending = [int(postcode) for postcode in event['postcodes']]
+        else:
+            # Extract DynamoDB event data (Assume it's an INSERT event for new postcode requests)
+            pending = [
+                int(record['dynamodb']['NewImage']['POSTCODE']['S'])  # Assuming POSTCODE is stored as a string in DynamoDB
+                for record in event.get('Records', []) if record['eventName'] == 'INSERT'
+            ]
+        postcodes = []
+
+        for postcode in pending:
+            if postcodes and deadline.near():
+                # The rest of the work unit stays due and is dispatched again by a later schedule
+                logging.info(f"Leaving postcodes {pending[len(postcodes):]} for the next schedule")
+                break
+            try:
+                with metrics.context(Postcode=postcode):
+                    complete = scrape_postcode(postcode, deadline)
+            except ScrapeFailed as e:
+                # LastScrapedAt stays old, so the scheduler dispatches the postcode again
+                logging.error(f"Postcode {postcode}: scrape failed: {e}")
+                complete = False
+            except ScrapeRateLimited as e:
+                # Nothing was scraped, so the next schedule may dispatch the postcode straight away
+                logging.info(f"Postcode {postcode}: {e}; leaving it for the next schedule")
+                release_lease(postcode)
+                complete = False
+            if complete:
+                record_scraped(postcode)
+            postcodes.append(postcode)
+
         return {
             'statusCode': 200,
-            'body': json.dumps(f'Data scraped and saved for postcode: {postcode}')
+            'body': json.dumps(f'Data scraped and saved for postcode: {", ".join(map(str, postcodes))}')
         }
 
+    except ScrapeIncomplete as e:
+        logging.info(f"Stopping before the timeout: {e}")
+        if scheduled:
+            # The checkpoint is kept, and the postcode is dispatched again once its lease expires
+            return {
+                'statusCode': 202,
+                'body': json.dumps(f'Scrape stopped early and will be resumed: {e}')
+            }
+        # Failing the batch makes the stream redeliver the record, which resumes from the checkpoint
+        raise
+
     except Exception as e:
         # Handle PATH errors specifically
         if 'in PATH' in str(e):
@@ -93,313 +129,297 @@ def lambda_handler(event, context):
             print(f"Error: {e}")
             raise
 
+    finally:
+        # Write the stage timings of this invocation as CloudWatch metrics
+        metrics.flush()
+
     return {
         'statusCode': 500,
         'body': json.dumps('An error occurred during the scraping process.')
     }
 
 
+def release_lease(postcode):
+    """
+    Drop the scheduler's lease on a postcode that was not scraped.
 
-
-class Market(webdriver.Chrome):
+    Args:
+        postcode (int): The postcode.
     """
-    A class to automate interactions with the Woolworths online catalogue using Selenium WebDriver.
+    try:
+        unique_postcodes_table.update_item(
+            Key={'POSTCODE': str(postcode)},
+            UpdateExpression='REMOVE ScheduledAt',
+            ConditionExpression='attribute_exists(POSTCODE)'
+        )
+    except Exception as e:
+        # The lease expires on its own
+        logging.error(f"Error releasing the lease on postcode {postcode}: {e}")
+
+
+def record_scraped(postcode):
     """
-    def __init__(self) -> None:
-
-        options = webdriver.ChromeOptions()
-        service = Service("/opt/chromedriver")  
-
-        USER_AGENT: str = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) \
-    AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.111 Safari/537.36"
-
-        options.binary_location = '/opt/chrome/chrome'
-        options.add_argument("--headless=new")
-        options.add_argument('--no-sandbox')
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1080x1920")
-        options.add_argument("--single-process")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-dev-tools")
-        options.add_argument("--no-zygote")
-        options.add_argument(f"--user-data-dir={tempfile.mkdtemp()}")  # Use tempfile.mkdtemp()
-        options.add_argument(f"--data-path={tempfile.mkdtemp()}")      # Use tempfile.mkdtemp()
-        options.add_argument(f"--disk-cache-dir={tempfile.mkdtemp()}") # Use tempfile.mkdtemp()
-        options.add_argument("--remote-debugging-port=9222")
-        options.add_argument(f"--user-agent={USER_AGENT}")
-
-        try:
-            super().__init__(options=options, service=service)
-            logging.info("WebDriver initialized successfully.")
-            
-            # Initialize product extractor or any other related components
-            self.product_extractor = ProductExtractor(self)
-        except Exception as e:
-            logging.error(f"Failed to initialize WebDriver: {e}")
-        
-    def land_first_page(self,url):
-        """
-        Navigate to the Woolworths URL defined in constants.
-        """
-        self.get(url)
-
-    def enter_postcode(self, postcode):
-        """
-        Enter the postcode into the search input.
-        """
-        try:
-            # Create a wait object
-            wait = WebDriverWait(self, 10)  # Timeout after 10 seconds
-
-            # Wait for the input element to be present and visible
-            input_postcode = wait.until(
-                EC.visibility_of_element_located((By.ID, 'wx-digital-catalogue-autocomplete'))
-            )
+    Record when a postcode was last scraped, so the scrape scheduler knows when it is due again.
 
-            # Send the postcode to the input element
-            input_postcode.send_keys(postcode)
-        except Exception as e:
-            # Take a screenshot if an error occurs
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            screenshot_filename = f'error_screenshot_{timestamp}.png'
-            self.save_screenshot(screenshot_filename)  # Use self to call save_screenshot
-            print(f"An error occurred while entering postcode: {str(e)}. Screenshot saved as '{screenshot_filename}'.")
-            print(f"Page source:\n{self.page_source}")  # Print the page source for further diagnosis
-
-    def select_first_postcode_option(self):
-        """
-        Select the first postcode option from the autocomplete dropdown.
-        """
-        select_postcode = WebDriverWait(self, 5).until(
-            EC.element_to_be_clickable((By.ID, 'wx-digital-catalogue-autocomplete-item-0'))
-        )
-        select_postcode.click()
-
-    def click_read_catalogue_button(self):
-        """
-        Click the button to read the digital catalogue.
-        """
-        read_catalogue_button = WebDriverWait(self, 5).until(
-            EC.element_to_be_clickable((By.CLASS_NAME, 'core-button-secondary'))
+    Args:
+        postcode (int): The postcode that was scraped.
+    """
+    try:
+        unique_postcodes_table.update_item(
+            Key={'POSTCODE': str(postcode)},
+            UpdateExpression='SET LastScrapedAt = :now REMOVE ScheduledAt',
+            ConditionExpression='attribute_exists(POSTCODE)',
+            ExpressionAttributeValues={':now': int(time.time())}
         )
-        read_catalogue_button.click()
-
-    def hover_to_toggle_categories(self):
-        """
-        Hover over the categories toggle to display the category list.
-        """
-        action = ActionChains(self)
-        try:
-            # Wait for the hover element to be visible
-            hover_element = WebDriverWait(self, 10).until(
-                EC.visibility_of_element_located((By.ID, 'sf-navcategory-button'))
-            )
-            
-            # Perform the hover action
-            action.move_to_element(hover_element).perform()
+    except Exception as e:
+        # The scrape itself succeeded; at worst the postcode is scraped again early
+        logging.error(f"Error recording the scrape of postcode {postcode}: {e}")
 
-            # Wait for the category links to be present after hovering
-            WebDriverWait(self, 10).until(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-navcategory-link'))
-            )
 
-            logging.info("Successfully hovered over the categories toggle.")
-            
-        except TimeoutException:
-            logging.error("Timeout occurred while waiting for the categories toggle or links.")
-        except Exception as e:
-            logging.error(f"Error during hover: {e}")
-
-    def click_category(self, category):
-        """
-        Click on a specific category from the category list.
-
-        Args:
-            category (str): The name of the category to click.
-        """
-        try:
-            self.hover_to_toggle_categories()
-            categories = WebDriverWait(self, 60).until(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-navcategory-link'))
+def scrape_postcode(postcode, deadline=None):
+    """
+    Scrape every category of a postcode's catalogue into ProductCatalogTable.
+
+    Postcodes that resolve to a catalogue already scraped this week get a copy
+    of that catalogue's products instead of a new scrape. Only products whose
+    content changed are written, and products missing from a complete scrape
+    are deleted.
+
+    When the deadline gets close the scrape stores what it has, saves a
+    checkpoint and raises ScrapeIncomplete. The next invocation for the
+    postcode skips the finished categories and continues partly scraped
+    ones from the saved page.
+
+    Nothing is shared, pruned or snapshotted unless every category was
+    opened and read to its last page and every product was written: a
+    category that did not load or could not be read, or a write that
+    failed, leaves the catalogue unrecorded and the postcode's other
+    products in place.
+
+    Args:
+        postcode (int): The postcode to scrape.
+        deadline (Deadline): Signals when to stop, or None to run to completion.
+
+    Returns:
+        bool: True if the postcode now holds its complete catalogue.
+
+    Raises:
+        ScrapeIncomplete: If the scrape stopped early and has to be resumed.
+        ScrapeFailed: If the catalogue's categories could not be read.
+        ScrapeRateLimited: If a browser was needed and the scrape rate limit has no token left.
+    """
+    deadline = deadline or Deadline(None)
+
+    # One writer per postcode so duplicates across categories are written once
+    writer = BatchWriter(dynamodb, product_table.name)
+    detector = ChangeDetector(product_table, postcode)
+    progress = ScrapeProgress(checkpoint_store.load(postcode))
+
+    # A valid postcode mapping answers the question without opening a browser
+    catalogue_id = catalogue_registry.lookup_postcode(postcode)
+    catalogue = catalogue_registry.get_catalogue(catalogue_id) if catalogue_id and not progress.resumed else None
+    if catalogue:
+        if catalogue['SourcePostcode'] == str(postcode):
+            logging.info(f"Postcode {postcode}: catalogue {catalogue_id} already scraped.")
+            return True
+        if fan_out_catalogue(catalogue, postcode, writer, detector):
+            return True
+
+    # Only scrapes that load the site count against the global rate limit
+    if not rate_limit.acquire(1, partial=False):
+        raise ScrapeRateLimited("the scrape rate limit has no token left")
+
+    # Reuse the warm Market bot when there is a healthy one
+    bot = driver_manager.acquire(0)
+    bot.page_waiter.reset()
+    
+    # Land on the first page, enter the postcode and open the catalogue
+    bot.open_catalogue(postcode)
+    
+    # Get the list of categories
+    category_list = bot.get_category_list()
+
+    # Another postcode may already have scraped the catalogue this one resolves to
+    catalogue_id = bot.get_catalogue_id(category_list)
+    catalogue = catalogue_registry.get_catalogue(catalogue_id)
+    if catalogue and catalogue['SourcePostcode'] != str(postcode) and \
+            fan_out_catalogue(catalogue, postcode, writer, detector):
+        checkpoint_store.clear(postcode)
+        return True
+
+    remaining = progress.remaining(category_list)
+    if progress.resumed:
+        logging.info(f"Postcode {postcode}: resuming with {len(remaining)} of {len(category_list)} categories left.")
+
+    scraped_items = []
+    write_seconds = 0.0
+    write_lock = threading.Lock()
+
+    def scrape_category(market, category):
+        nonlocal write_seconds
+        # Pool workers run in their own threads, so each tags its own samples
+        with metrics.context(Postcode=postcode, Category=category):
+            # Click the category to load its products
+            if not market.click_category(category):
+                raise ScrapeFailed(f"{category} could not be opened")
+
+            # Extract the category's products, stopping between pages near the deadline
+            category_data, next_page = market.extract_category_pages(
+                category, start_page=progress.start_page(category), should_stop=deadline.near
             )
-            # Iterate over the category elements to find the one that matches the name
-            for element in categories:
-                if element.text == category:
-                    # Wait for the element to be clickable after scrolling
-                    WebDriverWait(self, 10).until(EC.element_to_be_clickable(element))
-                    # Scroll the element into view
-                    self.execute_script("arguments[0].click();", element)
-                    time.sleep(1) # Wait for page to be fully loaded
-                    logging.info(f"Clicked on category: {category}")
-                    return True
-        except TimeoutException:
-            logging.error(f"Timeout occurred while waiting for category: {category}")
-        except Exception as e:
-            logging.error(f"An error occurred while clicking category: {category}. Error: {e}")
+            metrics.record('ExtractCategory', 'Products', len(category_data), unit='Count')
+
+            # Store the extracted product data before recording the progress
+            with write_lock, metrics.timer('StoreProducts'):
+                write_start = time.perf_counter()
+                items = normalise_prices(
+                    [market.build_product_item(product, postcode, category) for product in category_data]
+                )
+                scraped_items.extend(items)
+                writer.put_items(detector.filter_changed(items))
+                write_seconds += time.perf_counter() - write_start
+            progress.update(category, next_page)
+
+    # Split the categories across a pool of browser sessions; a pool of one scrapes them in order
+    pool_size = recommended_pool_size(len(remaining))
+    failures = scrape_postcode_in_parallel(bot, postcode, remaining, pool_size, scrape_category, deadline.near)
+
+    if progress.remaining(category_list) and deadline.near():
+        checkpoint_store.save(postcode, progress)
+        raise ScrapeIncomplete(f"postcode {postcode} stopped with {len(progress.remaining(category_list))} categories left")
+    checkpoint_store.clear(postcode)
+
+    # A category only counts once it was opened and read to its last page, whatever the failures say
+    unfinished = progress.remaining(category_list)
+    complete = (not failures and not unfinished and not writer.counts['failed']
+                and bool(scraped_items or progress.resumed))
+    if failures:
+        logging.warning(f"Postcode {postcode}: {len(failures)} categories failed: {failures}")
+    elif writer.counts['failed']:
+        # The table lacks these products, so it must not be shared, pruned or marked as scraped
+        logging.warning(f"Postcode {postcode}: {writer.counts['failed']} products could not be written")
+    elif unfinished:
+        logging.warning(f"Postcode {postcode}: {len(unfinished)} categories were not scraped: {unfinished}")
+    elif not complete:
+        logging.warning(f"Postcode {postcode}: no products were scraped, keeping the stored catalogue")
+    elif progress.resumed:
+        # Earlier invocations stored part of the catalogue, so this run has not seen every product and
+        # cannot prune; the postcode's rows may hold products that left, so it never becomes a source
+        catalogue_registry.record_mapping(postcode, catalogue_id, catalogue_valid_until())
+    else:
+        # Only complete catalogues are shared with other postcodes or prove a product is gone
+        catalogue_registry.record_catalogue(catalogue_id, postcode, scraped_items, catalogue_valid_until())
+        remove_stale_products(postcode, writer, detector)
+        save_snapshot(postcode, scraped_items, catalogue_id)
+
+    logging.info(
+        f"Postcode {postcode}: wrote {writer.counts['written']}, "
+        f"unchanged {detector.unchanged}, skipped {writer.counts['skipped']}, "
+        f"deleted {writer.counts['deleted']}, failed {writer.counts['failed']} "
+        f"products in {write_seconds:.2f}s."
+    )
+    logging.info(f"Postcode {postcode}: page waits {bot.page_waiter.summary()}")
+    logging.info(f"Browser startup timings: {driver_manager.timing_summary()}")
+    return complete
+
+
+def fan_out_catalogue(catalogue, postcode, writer, detector):
+    """
+    Give a postcode the products of a catalogue another postcode already scraped.
+
+    A catalogue without products is never copied, since it would delete
+    every product the postcode has.
+
+    Args:
+        catalogue (dict): The CatalogueTable item.
+        postcode (int): The postcode to copy the products to.
+        writer (BatchWriter): The writer for ProductCatalogTable.
+        detector (ChangeDetector): The postcode's change detector.
+
+    Returns:
+        bool: True if the products were copied, False if the catalogue has none.
+
+    Raises:
+        ScrapeFailed: If some products could not be written, so the postcode
+            is neither pruned nor recorded as scraped.
+    """
+    if not catalogue_registry.load_products(catalogue):
+        logging.warning(f"Catalogue {catalogue['CatalogueID']} has no products; scraping postcode {postcode} instead.")
         return False
+    counts = catalogue_registry.fan_out(catalogue, postcode, writer, detector)
+    if counts['failed']:
+        raise ScrapeFailed(f"{counts['failed']} products of catalogue {catalogue['CatalogueID']} could not be copied")
+    remove_stale_products(postcode, writer, detector)
+    items = [dict(item, POSTCODE=str(postcode)) for item in catalogue_registry.load_products(catalogue)]
+    save_snapshot(postcode, items, catalogue['CatalogueID'])
+    return True
 
-    def get_category_list(self):
-        """
-        Retrieve and return the list of categories.
-
-        Returns:
-            list: A list of category names.
-        """
-        self.hover_to_toggle_categories()
-        try:
-            categories = WebDriverWait(self, 10).until(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-navcategory-link'))
-            )
-            category_names = [category.text for category in categories]
-            return category_names
-        except Exception as e:
-            print(f"Error fetching categories: {e}")
-            return []
-
-    def click_next_page(self):
-        """
-        Click the button to navigate to the next page of products.
-
-        Returns:
-            bool: True if navigation to the next page was successful, False otherwise.
-        """
-        try:
-            # Wait for the next page button to be clickable
-            next_page_btn = WebDriverWait(self, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'a[aria-label="Next page"]'))
-            )
-            # Scroll to the next page button
-            self.execute_script("arguments[0].scrollIntoView(true);", next_page_btn)
 
-            time.sleep(0.5) 
+def save_snapshot(postcode, items, catalogue_id):
+    """
+    Write a postcode's catalogue snapshot, if snapshots are configured.
 
-            # Attempt to click the button
-            self.execute_script("arguments[0].click();", next_page_btn)     
-            time.sleep(0.75)    
-            return True
-        except TimeoutException:
-            logging.info("No 'Next page' button found or it was not clickable. Reached the end of pagination.")
-            return False
-        except Exception as e:
-            print(f"Error clicking next page: {e}")
-            return False
-
-    def extract_products_in_category(self,category):
-        """
-        Extract products from all pages of a category.
-
-        Returns:
-            list: A list of product data from the category.
-        """
-        products = []  # To store the products from all pages in the category
-        try:
-            while True:
-                # Extract products from the current page
-                page_products = self.product_extractor.get_products_from_current_page()
-                print(f"Extracted {len(page_products)} products from the {category} page.")
-                products.extend(page_products)
-
-                # Check if there's a "Next page" button to click
-                if not self.click_next_page():
-                    return False
-        except Exception as e:
-            print(f"An error occurred during product extraction: {e}")
-        finally:
-            return products
-
-    def store_product_data(self, product_data, postcode, category):
-        try:
-            for product in product_data:
-                item = {
-                    'ProductName': product.get('ProductName', 'NA'),
-                    'POSTCODE': str(postcode),
-                    'Category': str(category),
-                    'Price': product.get('price', 'NA'),
-                    'OptionSuffix': product.get('option_suffix', 'NA'),
-                    'SalePrice': product.get('sale_price', 'NA'),
-                    'RegularPrice': product.get('regular_price', 'NA'),
-                    'Saving': product.get('saving', 'NA'),
-                    'OfferValid': product.get('offer_valid', 'NA'),
-                    'ComparativeText': product.get('comparative_text', 'NA'),
-                    'SaleOption': product.get('sale_option', 'NA')
-                }
-                # Assuming product_table is initialized elsewhere in the class
-                product_table.put_item(Item=item)
-        except Exception as e:
-            print(f"Error writing to DynamoDB: {e}")
-
-class ProductExtractor:
+    ProductCatalogTable stays the source of truth, so a failed snapshot is
+    logged and the scrape still succeeds; readers fall back to the table.
+
+    Args:
+        postcode (int): The postcode.
+        items (list): Every product of the postcode's catalogue.
+        catalogue_id (str): The catalogue the products came from.
     """
-    This class is responsible for extracting data from a single product page.
+    if snapshot_store is None:
+        return
+    # A product listed in several categories is stored once, as BatchWriter does
+    unique = {}
+    for item in items:
+        unique.setdefault(item['ProductName'], item)
+    try:
+        with metrics.timer('SaveSnapshot'):
+            size = snapshot_store.save(postcode, list(unique.values()), catalogue_id)
+        logging.info(f"Postcode {postcode}: saved a snapshot of {len(unique)} products ({size} bytes).")
+    except Exception as e:
+        logging.error(f"Failed to save the catalogue snapshot for postcode {postcode}: {e}")
+
+
+def remove_stale_products(postcode, writer, detector):
     """
-    def __init__(self, driver: WebDriver):
-        self.driver = driver
-
-    def try_get_text(self, parent: WebDriver, selector: str, default: str) -> str:
-        """
-        Try to get the text content of an element.
-
-        Args:
-            parent (WebDriver): The parent WebDriver instance.
-            selector (str): The CSS selector of the element.
-            default (str): The default value to return if the element is not found.
-
-        Returns:
-            str: The text content of the element or the default value.
-        """
-        try:
-            return parent.find_element(By.CSS_SELECTOR, selector).text
-        except:
-            return default
-
-    def try_get_attribute(self, parent: WebDriver, selector: str, attribute: str, default: str) -> str:
-        """
-        Try to get an attribute value of an element.
-
-        Args:
-            parent (WebDriver): The parent WebDriver instance.
-            selector (str): The CSS selector of the element.
-            attribute (str): The attribute to retrieve.
-            default (str): The default value to return if the element is not found.
-
-        Returns:
-            str: The attribute value or the default value.
-        """
-        try:
-            return parent.find_element(By.CSS_SELECTOR, selector).get_attribute(attribute)
-        except:
-            return default
-
-    def get_products_from_current_page(self) -> list:
-        """
-        Extract product data from the current page.
-
-        Returns:
-            list: A list of product data dictionaries.
-        """
-        try:
-            products = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-item-content'))
-            )
+    Delete products that are no longer in the postcode's catalogue.
+
+    Args:
+        postcode (int): The postcode that was scraped.
+        writer (BatchWriter): The writer for ProductCatalogTable.
+        detector (ChangeDetector): The detector that saw the complete scrape.
+    """
+    stale_keys = detector.stale_keys()
+    if stale_keys:
+        counts = writer.delete_keys(stale_keys)
+        logging.info(f"Postcode {postcode}: removed {counts['deleted']} products no longer in the catalogue.")
 
-            product_list = []
-
-            for product in products:
-                data = {
-                    "ProductName": self.try_get_text(product, ".sf-item-heading", "NA"),
-                    "price": self.try_get_text(product, ".sf-pricedisplay", "NA"),
-                    "option_suffix": self.try_get_text(product, ".sf-optionsuffix", "NA"),
-                    "sale_price": self.try_get_text(product, ".sf-saleoptiontext", "NA"),
-                    "regular_price": self.try_get_text(product, ".sf-regprice", "NA"),
-                    "regoptiondesc": self.try_get_text(product, ".sf-regoptiondesc", "NA"),
-                    "saving": self.try_get_text(product, ".sf-regprice", "NA"),
-                    "offer_valid": self.try_get_text(product, ".sale-dates", "NA"),
-                    "comparative_text": self.try_get_text(product, ".sf-comparativeText", "NA"),
-                    "sale_option": self.try_get_text(product, ".sf-saleoptiondesc", "NA")
-                }
-                product_list.append(data)
-            return product_list
-
-        except Exception as e:
-            print(f"An error occurred: {e}")
-            return []  # Return an empty list if an error occurs
+
+def scrape_postcode_in_parallel(bot, postcode, category_list, pool_size, scrape_category, should_stop=None):
+    """
+    Scrape a postcode's categories with a pool of Market sessions.
+
+    The bot that listed the categories becomes the first worker; the other
+    workers get their own Chrome instance, kept warm by the driver manager,
+    and their own catalogue session.
+
+    Args:
+        bot (Market): The Market already on the postcode's catalogue.
+        postcode (int): The postcode being scraped.
+        category_list (list): The categories to scrape.
+        pool_size (int): The number of concurrent sessions.
+        scrape_category (callable): Called with (market, category) per category.
+        should_stop (callable): Returns True when no new category should start.
+
+    Returns:
+        dict: Category name to error message for every category that failed.
+    """
+    def open_market(slot):
+        if slot == 0:
+            return bot
+        market = driver_manager.acquire(slot)
+        market.open_catalogue(postcode)
+        return market
+
+    return scrape_categories_in_parallel(category_list, open_market, pool_size, scrape_category, should_stop)
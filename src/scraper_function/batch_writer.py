@@ -0,0 +1,124 @@
+import time
+import random
+import logging
+
+# DynamoDB accepts at most 25 put/delete requests per BatchWriteItem call
+MAX_BATCH_SIZE = 25
+
+
+class BatchWriter:
+    """
+    Writes and deletes items in a DynamoDB table in 25-item BatchWriteItem requests.
+
+    Items are de-duplicated on the table key, so a product that shows up in
+    several categories is only written once per writer. Unprocessed items
+    returned by DynamoDB are retried with exponential backoff.
+    """
+    def __init__(self, dynamodb, table_name, key_names=('POSTCODE', 'ProductName'),
+                 max_retries=5, base_delay=0.05, max_delay=2.0):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_names = key_names
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.seen_keys = set()
+        self.counts = {'written': 0, 'skipped': 0, 'failed': 0, 'deleted': 0}
+
+    def item_key(self, item):
+        """
+        Build the de-duplication key for an item.
+
+        Args:
+            item (dict): The item to be written.
+
+        Returns:
+            tuple: The values of the table key attributes.
+        """
+        return tuple(item.get(name) for name in self.key_names)
+
+    def put_items(self, items):
+        """
+        Write a list of items, skipping any key already written by this writer.
+
+        Args:
+            items (list): The items to write.
+
+        Returns:
+            dict: The written, skipped and failed counts for this call.
+        """
+        counts = {'written': 0, 'skipped': 0, 'failed': 0}
+        pending = []
+
+        for item in items:
+            key = self.item_key(item)
+            if key in self.seen_keys:
+                counts['skipped'] += 1
+                continue
+            self.seen_keys.add(key)
+            pending.append({'PutRequest': {'Item': item}})
+
+        counts['written'], counts['failed'] = self._send(pending)
+
+        for name, value in counts.items():
+            self.counts[name] += value
+        return counts
+
+    def delete_keys(self, keys):
+        """
+        Delete items by key.
+
+        Args:
+            keys (list): The key dicts of the items to delete.
+
+        Returns:
+            dict: The deleted and failed counts for this call.
+        """
+        requests = [{'DeleteRequest': {'Key': key}} for key in keys]
+        deleted, failed = self._send(requests)
+        self.counts['deleted'] += deleted
+        self.counts['failed'] += failed
+        return {'deleted': deleted, 'failed': failed}
+
+    def _send(self, requests):
+        succeeded = failed = 0
+        for start in range(0, len(requests), MAX_BATCH_SIZE):
+            batch_succeeded, batch_failed = self._write_batch(requests[start:start + MAX_BATCH_SIZE])
+            succeeded += batch_succeeded
+            failed += batch_failed
+        return succeeded, failed
+
+    def _write_batch(self, requests):
+        """
+        Send one BatchWriteItem request, retrying unprocessed items with backoff.
+
+        Args:
+            requests (list): Up to 25 PutRequest or DeleteRequest entries.
+
+        Returns:
+            tuple: The number of items written and the number that failed.
+        """
+        total = len(requests)
+        attempt = 0
+
+        while requests:
+            try:
+                response = self.dynamodb.batch_write_item(
+                    RequestItems={self.table_name: requests}
+                )
+                requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            except Exception as e:
+                logging.error(f"BatchWriteItem failed for {self.table_name}: {e}")
+
+            if not requests:
+                break
+
+            attempt += 1
+            if attempt > self.max_retries:
+                logging.error(f"Giving up on {len(requests)} unprocessed items for {self.table_name}.")
+                break
+
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            time.sleep(random.uniform(0, delay))
+
+        return total - len(requests), len(requests)
@@ -0,0 +1,176 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from boto3.dynamodb.conditions import Key
+
+CATALOGUE_TABLE = os.environ.get('CATALOGUE_TABLE', 'CatalogueTable')
+CATALOGUE_MAPPING_TABLE = os.environ.get('CATALOGUE_MAPPING_TABLE', 'PostcodeCatalogueTable')
+# Number of catalogues whose products are kept in memory across warm invocations
+CATALOGUE_CACHE_SIZE = int(os.environ.get('CATALOGUE_CACHE_SIZE', '4'))
+# Catalogues roll over on Wednesday (weekday 2) at midnight Australian Eastern Standard Time
+CATALOGUE_ROLLOVER_WEEKDAY = int(os.environ.get('CATALOGUE_ROLLOVER_WEEKDAY', '2'))
+CATALOGUE_TIMEZONE = timezone(timedelta(hours=10))
+
+
+def catalogue_valid_until(now=None):
+    """
+    Get the time the current weekly catalogue stops being valid.
+
+    Args:
+        now (datetime): The reference time, defaults to the current time.
+
+    Returns:
+        int: The next rollover as a Unix timestamp.
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(CATALOGUE_TIMEZONE)
+    days_ahead = (CATALOGUE_ROLLOVER_WEEKDAY - now.weekday()) % 7 or 7
+    rollover = (now + timedelta(days=days_ahead)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(rollover.timestamp())
+
+
+class CatalogueRegistry:
+    """
+    Tracks which regional catalogue each postcode resolves to.
+
+    CatalogueTable records, per catalogue, the postcode it was scraped under
+    and how long it is valid. PostcodeCatalogueTable maps each postcode to its
+    catalogue so later lookups need no browser at all. Scraped product sets
+    are also kept in memory, so a warm container can fan a catalogue out to
+    another postcode without reading it back from ProductCatalogTable.
+    """
+    def __init__(self, dynamodb, product_table):
+        self.catalogue_table = dynamodb.Table(CATALOGUE_TABLE)
+        self.mapping_table = dynamodb.Table(CATALOGUE_MAPPING_TABLE)
+        self.product_table = product_table
+        self.product_cache = OrderedDict()
+
+    def lookup_postcode(self, postcode):
+        """
+        Find the still-valid catalogue a postcode was last mapped to.
+
+        Args:
+            postcode (int): The postcode to look up.
+
+        Returns:
+            str: The catalogue ID, or None if there is no valid mapping.
+        """
+        try:
+            item = self.mapping_table.get_item(Key={'POSTCODE': str(postcode)}).get('Item')
+        except Exception as e:
+            logging.error(f"Failed to read catalogue mapping for {postcode}: {e}")
+            return None
+        if item and int(item.get('ValidUntil', 0)) > time.time():
+            return item['CatalogueID']
+        return None
+
+    def get_catalogue(self, catalogue_id):
+        """
+        Get a catalogue's record if it has been scraped and is still valid.
+
+        Args:
+            catalogue_id (str): The catalogue ID.
+
+        Returns:
+            dict: The CatalogueTable item, or None.
+        """
+        try:
+            item = self.catalogue_table.get_item(Key={'CatalogueID': catalogue_id}).get('Item')
+        except Exception as e:
+            logging.error(f"Failed to read catalogue {catalogue_id}: {e}")
+            return None
+        if item and int(item.get('ValidUntil', 0)) > time.time():
+            return item
+        return None
+
+    def record_mapping(self, postcode, catalogue_id, valid_until):
+        """
+        Remember which catalogue a postcode resolves to.
+
+        Args:
+            postcode (int): The postcode.
+            catalogue_id (str): The catalogue it resolved to.
+            valid_until (int): Unix timestamp the mapping expires at.
+        """
+        self.mapping_table.put_item(Item={
+            'POSTCODE': str(postcode),
+            'CatalogueID': catalogue_id,
+            'ValidUntil': valid_until
+        })
+
+    def record_catalogue(self, catalogue_id, postcode, items, valid_until):
+        """
+        Record a freshly scraped catalogue and cache its products.
+
+        Args:
+            catalogue_id (str): The catalogue ID.
+            postcode (int): The postcode it was scraped under.
+            items (list): The ProductCatalogTable items of the complete scrape.
+            valid_until (int): Unix timestamp the catalogue expires at.
+        """
+        self.catalogue_table.put_item(Item={
+            'CatalogueID': catalogue_id,
+            'SourcePostcode': str(postcode),
+            'ScrapedAt': int(time.time()),
+            'ValidUntil': valid_until
+        })
+        self.record_mapping(postcode, catalogue_id, valid_until)
+        self._cache_products(catalogue_id, valid_until, items)
+
+    def _cache_products(self, catalogue_id, valid_until, items):
+        self.product_cache[catalogue_id] = (valid_until, items)
+        self.product_cache.move_to_end(catalogue_id)
+        while len(self.product_cache) > CATALOGUE_CACHE_SIZE:
+            self.product_cache.popitem(last=False)
+
+    def load_products(self, catalogue):
+        """
+        Get a catalogue's product items from memory or from its source postcode.
+
+        Args:
+            catalogue (dict): The CatalogueTable item.
+
+        Returns:
+            list: The ProductCatalogTable items of the source postcode.
+        """
+        catalogue_id = catalogue['CatalogueID']
+        cached = self.product_cache.get(catalogue_id)
+        if cached and cached[0] > time.time():
+            self.product_cache.move_to_end(catalogue_id)
+            return cached[1]
+
+        items = []
+        query_kwargs = {'KeyConditionExpression': Key('POSTCODE').eq(catalogue['SourcePostcode'])}
+        while True:
+            response = self.product_table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        self._cache_products(catalogue_id, int(catalogue['ValidUntil']), items)
+        return items
+
+    def fan_out(self, catalogue, postcode, writer, detector):
+        """
+        Copy a scraped catalogue's products to another postcode.
+
+        Args:
+            catalogue (dict): The CatalogueTable item.
+            postcode (int): The postcode to copy the products to.
+            writer (BatchWriter): The writer for ProductCatalogTable.
+            detector (ChangeDetector): Drops products the postcode already has.
+
+        Returns:
+            dict: The written, skipped and failed counts.
+        """
+        items = [dict(item, POSTCODE=str(postcode)) for item in self.load_products(catalogue)]
+        counts = writer.put_items(detector.filter_changed(items))
+        self.record_mapping(postcode, catalogue['CatalogueID'], int(catalogue['ValidUntil']))
+        logging.info(
+            f"Fanned out catalogue {catalogue['CatalogueID']} from postcode "
+            f"{catalogue['SourcePostcode']} to {postcode}: {counts}"
+        )
+        return counts
@@ -0,0 +1,94 @@
+import os
+import queue
+import logging
+import threading
+
+# Rough resident size of one headless Chrome session on a catalogue page
+BROWSER_MEMORY_MB = int(os.environ.get('BROWSER_MEMORY_MB', '500'))
+# Memory kept back for the Python process and the category results
+RESERVED_MEMORY_MB = int(os.environ.get('RESERVED_MEMORY_MB', '300'))
+MAX_POOL_SIZE = int(os.environ.get('SCRAPER_POOL_SIZE', '4'))
+
+
+def recommended_pool_size(category_count):
+    """
+    Work out how many browser sessions fit in the function's memory.
+
+    Args:
+        category_count (int): The number of categories to scrape.
+
+    Returns:
+        int: The pool size, at least 1 and never more than the categories.
+    """
+    memory_mb = int(os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '0'))
+    if memory_mb:
+        fits = (memory_mb - RESERVED_MEMORY_MB) // BROWSER_MEMORY_MB
+    else:
+        fits = MAX_POOL_SIZE
+    return max(1, min(MAX_POOL_SIZE, fits, category_count))
+
+
+def scrape_categories_in_parallel(categories, open_market, pool_size, scrape_category, should_stop=None):
+    """
+    Scrape categories across a bounded pool of browser sessions.
+
+    Each worker opens its own Market through ``open_market``, so every worker
+    keeps its own postcode and catalogue session, then pulls categories from a
+    shared queue until it is empty or ``should_stop`` returns True. A failing
+    category is recorded and the worker moves on; a worker whose session
+    cannot be opened leaves its share of the queue to the others.
+
+    Args:
+        categories (list): The category names to scrape.
+        open_market (callable): Called with a worker slot, returns a Market
+            that has already entered the postcode and opened the catalogue.
+        pool_size (int): The number of concurrent browser sessions.
+        scrape_category (callable): Called with (market, category) to scrape
+            and store one category. Raises on failure.
+        should_stop (callable): Returns True when no new category should start.
+
+    Returns:
+        dict: Category name to error message for every category that failed.
+    """
+    pending = queue.Queue()
+    for category in categories:
+        pending.put(category)
+
+    failures = {}
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def worker(slot):
+        try:
+            market = open_market(slot)
+        except Exception as e:
+            logging.error(f"Worker {slot} could not open a catalogue session: {e}")
+            return
+
+        while True:
+            if should_stop is not None and should_stop():
+                stopped.set()
+                return
+            try:
+                category = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                scrape_category(market, category)
+            except Exception as e:
+                logging.error(f"Worker {slot} failed on category {category}: {e}")
+                with lock:
+                    failures[category] = str(e)
+
+    threads = [threading.Thread(target=worker, args=(slot,), daemon=True) for slot in range(pool_size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Categories left behind when every worker failed to start; a stop leaves them for later
+    if not stopped.is_set():
+        while not pending.empty():
+            failures[pending.get_nowait()] = "no browser session available"
+
+    return failures
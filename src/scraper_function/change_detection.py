@@ -0,0 +1,94 @@
+import json
+import hashlib
+import logging
+
+from boto3.dynamodb.conditions import Key
+
+# Attributes left out of the content hash. Category is excluded because a
+# product listed under several categories can be attributed to any of them
+# depending on scrape order, which would otherwise rewrite it every week.
+UNHASHED_ATTRIBUTES = ('POSTCODE', 'ProductName', 'Category', 'ContentHash')
+
+
+def content_hash(item):
+    """
+    Compute a stable hash of an item's content.
+
+    Args:
+        item (dict): A ProductCatalogTable item.
+
+    Returns:
+        str: The hex digest of the item's content attributes.
+    """
+    content = {name: value for name, value in item.items() if name not in UNHASHED_ATTRIBUTES}
+    payload = json.dumps(content, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ChangeDetector:
+    """
+    Compares scraped products with what ProductCatalogTable already holds for a postcode.
+
+    Stored content hashes are read once per postcode. Items whose hash is
+    unchanged are dropped before they reach the writer, so they cost no write
+    units and produce no stream records. Products that were stored but not
+    seen in a complete scrape are reported as stale.
+    """
+    def __init__(self, product_table, postcode):
+        self.postcode = str(postcode)
+        self.stored_hashes = self._load_stored_hashes(product_table)
+        self.seen_names = set()
+        self.unchanged = 0
+
+    def _load_stored_hashes(self, product_table):
+        hashes = {}
+        query_kwargs = {
+            'KeyConditionExpression': Key('POSTCODE').eq(self.postcode),
+            'ProjectionExpression': 'ProductName, ContentHash'
+        }
+        try:
+            while True:
+                response = product_table.query(**query_kwargs)
+                for item in response.get('Items', []):
+                    hashes[item['ProductName']] = item.get('ContentHash')
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            # Without the stored hashes every item is treated as changed
+            logging.error(f"Failed to load stored products for postcode {self.postcode}: {e}")
+        return hashes
+
+    def filter_changed(self, items):
+        """
+        Stamp each item with its content hash and keep only new or changed ones.
+
+        Args:
+            items (list): ProductCatalogTable items for this postcode.
+
+        Returns:
+            list: The items that need to be written.
+        """
+        changed = []
+        for item in items:
+            item['ContentHash'] = content_hash(item)
+            self.seen_names.add(item['ProductName'])
+            if self.stored_hashes.get(item['ProductName']) == item['ContentHash']:
+                self.unchanged += 1
+            else:
+                changed.append(item)
+        return changed
+
+    def stale_keys(self):
+        """
+        Get the keys of stored products that were not seen in this scrape.
+
+        Only meaningful once every category has been scraped.
+
+        Returns:
+            list: Key dicts for the products that disappeared from the catalogue.
+        """
+        return [
+            {'POSTCODE': self.postcode, 'ProductName': name}
+            for name in self.stored_hashes if name not in self.seen_names
+        ]
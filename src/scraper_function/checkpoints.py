@@ -0,0 +1,164 @@
+import os
+import time
+import logging
+import threading
+
+SCRAPE_CHECKPOINT_TABLE = os.environ.get('SCRAPE_CHECKPOINT_TABLE', 'ScrapeCheckpointTable')
+# Stop this long before the Lambda deadline so progress can be stored and saved
+CHECKPOINT_MARGIN_MS = int(os.environ.get('CHECKPOINT_MARGIN_MS', '60000'))
+# Abandoned checkpoints expire after this many seconds
+CHECKPOINT_TTL_SECONDS = int(os.environ.get('CHECKPOINT_TTL_SECONDS', str(2 * 24 * 3600)))
+
+
+class ScrapeIncomplete(Exception):
+    """
+    Raised when a scrape stops before the deadline with a checkpoint saved.
+    """
+
+
+class ScrapeFailed(Exception):
+    """
+    Raised when the catalogue could not be read completely, e.g. its categories
+    did not load or a page did not change after clicking "Next page".
+    """
+
+
+class ScrapeRateLimited(Exception):
+    """
+    Raised before a browser is opened when the global scrape rate limit has no token left.
+    """
+
+
+class Deadline:
+    """
+    Tells the scraper when it has to stop to stay within the Lambda timeout.
+    """
+    def __init__(self, context, margin_ms=CHECKPOINT_MARGIN_MS):
+        self.context = context
+        self.margin_ms = margin_ms
+        self.reached = False
+
+    def near(self):
+        """
+        Check whether the remaining time has dropped below the safety margin.
+
+        Returns:
+            bool: True once the scraper should stop. Always False without a context.
+        """
+        if not self.reached and self.context is not None:
+            self.reached = self.context.get_remaining_time_in_millis() < self.margin_ms
+        return self.reached
+
+
+class ScrapeProgress:
+    """
+    The categories of a postcode that are finished or partly scraped.
+
+    Attributes:
+        completed (set): Categories that are fully stored.
+        in_progress (dict): Category name to the next page to scrape.
+        resumed (bool): True if this progress was loaded from a checkpoint.
+    """
+    def __init__(self, checkpoint=None):
+        checkpoint = checkpoint or {}
+        self.completed = set(checkpoint.get('CompletedCategories', []))
+        self.in_progress = {name: int(page) for name, page in checkpoint.get('InProgress', {}).items()}
+        self.resumed = bool(checkpoint)
+        self.lock = threading.Lock()
+
+    def start_page(self, category):
+        """
+        Get the page a category should be scraped from.
+
+        Args:
+            category (str): The category name.
+
+        Returns:
+            int: The 1-based page number.
+        """
+        return self.in_progress.get(category, 1)
+
+    def update(self, category, next_page):
+        """
+        Record how far a category got.
+
+        Args:
+            category (str): The category name.
+            next_page (int): The next page to scrape, or None if the category is finished.
+        """
+        with self.lock:
+            if next_page is None:
+                self.completed.add(category)
+                self.in_progress.pop(category, None)
+            else:
+                self.in_progress[category] = next_page
+
+    def remaining(self, category_list):
+        """
+        Get the categories that still need scraping, partly scraped ones first.
+
+        Args:
+            category_list (list): All categories of the catalogue.
+
+        Returns:
+            list: The categories that are not completed.
+        """
+        pending = [category for category in category_list if category not in self.completed]
+        return sorted(pending, key=lambda category: category not in self.in_progress)
+
+
+class CheckpointStore:
+    """
+    Saves scrape progress per postcode in ScrapeCheckpointTable.
+    """
+    def __init__(self, dynamodb, table_name=SCRAPE_CHECKPOINT_TABLE):
+        self.table = dynamodb.Table(table_name)
+
+    def load(self, postcode):
+        """
+        Load the checkpoint of an unfinished scrape.
+
+        Args:
+            postcode (int): The postcode.
+
+        Returns:
+            dict: The checkpoint item, or None if there is nothing to resume.
+        """
+        try:
+            return self.table.get_item(Key={'POSTCODE': str(postcode)}, ConsistentRead=True).get('Item')
+        except Exception as e:
+            logging.error(f"Failed to load checkpoint for postcode {postcode}: {e}")
+            return None
+
+    def save(self, postcode, progress):
+        """
+        Save the progress of a scrape that is about to stop.
+
+        Args:
+            postcode (int): The postcode.
+            progress (ScrapeProgress): The progress to save.
+        """
+        now = int(time.time())
+        self.table.put_item(Item={
+            'POSTCODE': str(postcode),
+            'CompletedCategories': sorted(progress.completed),
+            'InProgress': progress.in_progress,
+            'UpdatedAt': now,
+            'ExpiresAt': now + CHECKPOINT_TTL_SECONDS
+        })
+        logging.info(
+            f"Checkpoint saved for postcode {postcode}: {len(progress.completed)} categories done, "
+            f"in progress {progress.in_progress}"
+        )
+
+    def clear(self, postcode):
+        """
+        Remove the checkpoint once a postcode is fully scraped.
+
+        Args:
+            postcode (int): The postcode.
+        """
+        try:
+            self.table.delete_item(Key={'POSTCODE': str(postcode)})
+        except Exception as e:
+            logging.error(f"Failed to clear checkpoint for postcode {postcode}: {e}")
@@ -0,0 +1,136 @@
+import os
+import time
+import logging
+from collections import deque
+
+# Origin whose cookies and storage hold the selected postcode
+CATALOGUE_ORIGIN = 'https://www.woolworths.com.au'
+# Recycle a browser after this many invocations to keep its memory in check
+MAX_DRIVER_USES = int(os.environ.get('MAX_DRIVER_USES', '50'))
+# Startup timings kept for inspection; the summary uses running totals instead
+STARTUP_TIMINGS_KEPT = 100
+
+
+class DriverManager:
+    """
+    Keeps Market browsers alive across warm Lambda invocations.
+
+    Each pool slot holds at most one browser. Before a browser is handed out
+    again it is health-checked and its postcode session (cookies and storage
+    for the catalogue origin) is cleared; the disk cache is kept. Unhealthy or
+    worn-out browsers are shut down, which also removes their temp directories.
+    """
+    def __init__(self, factory, max_uses=MAX_DRIVER_USES):
+        self.factory = factory
+        self.max_uses = max_uses
+        self.drivers = {}
+        self.uses = {}
+        self.startup_timings = deque(maxlen=STARTUP_TIMINGS_KEPT)
+        self.startup_totals = {'cold': [0, 0.0], 'warm': [0, 0.0]}
+
+    def acquire(self, slot=0):
+        """
+        Get a browser for a pool slot, reusing the warm one when it is healthy.
+
+        Args:
+            slot (int): The pool slot, 0 for the main browser.
+
+        Returns:
+            Market: A browser with no postcode session.
+        """
+        start = time.perf_counter()
+        driver = self.drivers.get(slot)
+        mode = 'cold'
+
+        if driver is not None:
+            if self.uses.get(slot, 0) < self.max_uses and self.is_healthy(driver) and self.reset_session(driver):
+                mode = 'warm'
+            else:
+                self.recycle(slot)
+                driver = None
+
+        if driver is None:
+            driver = self.factory(slot)
+            self.drivers[slot] = driver
+            self.uses[slot] = 0
+
+        self.uses[slot] += 1
+        timing = {'slot': slot, 'mode': mode, 'seconds': round(time.perf_counter() - start, 3)}
+        self.startup_timings.append(timing)
+        totals = self.startup_totals[mode]
+        totals[0] += 1
+        totals[1] += timing['seconds']
+        logging.info(f"Browser startup: {timing}")
+        return driver
+
+    def is_healthy(self, driver):
+        """
+        Check that a browser still answers commands.
+
+        Args:
+            driver (Market): The browser to check.
+
+        Returns:
+            bool: True if the browser responded.
+        """
+        try:
+            return driver.session_id is not None and driver.execute_script("return 1;") == 1
+        except Exception as e:
+            logging.warning(f"Browser failed its health check: {e}")
+            return False
+
+    def reset_session(self, driver):
+        """
+        Clear the postcode session so the next postcode starts from scratch.
+
+        Args:
+            driver (Market): The browser to reset.
+
+        Returns:
+            bool: True if the session was cleared.
+        """
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                'origin': CATALOGUE_ORIGIN,
+                'storageTypes': 'cookies,local_storage,session_storage,indexeddb,service_workers'
+            })
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            logging.warning(f"Failed to reset browser session: {e}")
+            return False
+
+    def recycle(self, slot):
+        """
+        Shut down the browser in a slot and remove its temp directories.
+
+        Args:
+            slot (int): The pool slot to empty.
+        """
+        driver = self.drivers.pop(slot, None)
+        self.uses.pop(slot, None)
+        if driver is not None:
+            driver.shutdown()
+
+    def shutdown_all(self):
+        """
+        Shut down every managed browser.
+        """
+        for slot in list(self.drivers):
+            self.recycle(slot)
+
+    def timing_summary(self):
+        """
+        Summarise cold and warm startup timings.
+
+        Returns:
+            dict: Count and average seconds for cold and warm starts.
+        """
+        summary = {}
+        for mode, (count, seconds) in self.startup_totals.items():
+            summary[mode] = {
+                'count': count,
+                'avg_seconds': round(seconds / count, 3) if count else 0.0
+            }
+        return summary
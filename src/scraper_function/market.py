@@ -0,0 +1,582 @@
+import os
+import re
+import time
+import random
+import hashlib
+import shutil
+import tempfile
+import logging
+
+from selenium import webdriver
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
+
+from checkpoints import ScrapeFailed
+from page_waits import PageChangeWaiter
+from common.metrics import metrics
+from resource_blocking import (
+    add_lean_profile_options, apply_url_blocking, blocked_url_patterns,
+    collect_page_metrics, resource_blocking_enabled
+)
+
+# Overridable so the benchmark harness can point the scraper at a local copy of the catalogue
+CATALOGUE_URL = os.environ.get('CATALOGUE_URL', 'https://www.woolworths.com.au/shop/catalogue')
+CHROME_BINARY = os.environ.get('CHROME_BINARY', '/opt/chrome/chrome')
+CHROMEDRIVER_PATH = os.environ.get('CHROMEDRIVER_PATH', '/opt/chromedriver')
+
+# Share of failures that log the page source, how much of it, and how many times per container
+PAGE_SOURCE_SAMPLE_RATE = float(os.environ.get('PAGE_SOURCE_SAMPLE_RATE', '0.1'))
+PAGE_SOURCE_MAX_CHARS = int(os.environ.get('PAGE_SOURCE_MAX_CHARS', '5000'))
+PAGE_SOURCE_MAX_DUMPS = int(os.environ.get('PAGE_SOURCE_MAX_DUMPS', '3'))
+
+page_source_dumps = 0
+
+def log_page_source(driver, reason):
+    """
+    Log the start of the current page source for a sample of failures.
+
+    A full catalogue page is hundreds of kilobytes, so only a sampled,
+    truncated copy is logged, at most PAGE_SOURCE_MAX_DUMPS times per container.
+
+    Args:
+        driver (WebDriver): The browser on the failing page.
+        reason (str): What failed, for the log line.
+    """
+    global page_source_dumps
+    metrics.record('PageSourceDump', 'Failures', 1, unit='Count')
+    if page_source_dumps >= PAGE_SOURCE_MAX_DUMPS or random.random() >= PAGE_SOURCE_SAMPLE_RATE:
+        return
+    page_source_dumps += 1
+    try:
+        source = driver.page_source
+    except Exception as e:
+        logging.error(f"Could not read the page source after {reason}: {e}")
+        return
+    logging.error(f"Page source after {reason} (first {min(len(source), PAGE_SOURCE_MAX_CHARS)} "
+                  f"of {len(source)} characters):\n{source[:PAGE_SOURCE_MAX_CHARS]}")
+
+class Market(webdriver.Chrome):
+    """
+    A class to automate interactions with the Woolworths online catalogue using Selenium WebDriver.
+    """
+    def __init__(self, remote_debugging_port: int = 9222, block_resources: bool = None) -> None:
+        if block_resources is None:
+            block_resources = resource_blocking_enabled()
+
+        options = webdriver.ChromeOptions()
+        service = Service(CHROMEDRIVER_PATH)
+
+        USER_AGENT: str = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) \
+    AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.111 Safari/537.36"
+
+        options.binary_location = CHROME_BINARY
+        options.add_argument("--headless=new")
+        options.add_argument('--no-sandbox')
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1080x1920")
+        options.add_argument("--single-process")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-dev-tools")
+        options.add_argument("--no-zygote")
+        # Temp directories are removed again in shutdown()
+        self.temp_dirs = [tempfile.mkdtemp() for _ in range(3)]
+        options.add_argument(f"--user-data-dir={self.temp_dirs[0]}")
+        options.add_argument(f"--data-path={self.temp_dirs[1]}")
+        options.add_argument(f"--disk-cache-dir={self.temp_dirs[2]}")
+        options.add_argument(f"--remote-debugging-port={remote_debugging_port}")
+        options.add_argument(f"--user-agent={USER_AGENT}")
+        if block_resources:
+            add_lean_profile_options(options)
+
+        try:
+            super().__init__(options=options, service=service)
+            logging.info("WebDriver initialized successfully.")
+
+            # Skip images, fonts and trackers the scraper never reads
+            if block_resources:
+                apply_url_blocking(self, blocked_url_patterns())
+            
+            # Initialize product extractor or any other related components
+            bulk_extraction = os.environ.get('BULK_EXTRACTION', 'true').lower() == 'true'
+            self.product_extractor = ProductExtractor(self, bulk=bulk_extraction)
+            self.page_waiter = PageChangeWaiter(self)
+        except Exception as e:
+            logging.error(f"Failed to initialize WebDriver: {e}")
+
+    def shutdown(self):
+        """
+        Quit the browser and remove its temp directories.
+        """
+        try:
+            self.quit()
+        except Exception as e:
+            logging.error(f"Failed to quit WebDriver: {e}")
+        finally:
+            for temp_dir in self.temp_dirs:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        
+    def land_first_page(self,url):
+        """
+        Navigate to the Woolworths URL defined in constants.
+        """
+        self.get(url)
+
+    @metrics.timed('OpenCatalogue')
+    def open_catalogue(self, postcode, url=CATALOGUE_URL):
+        """
+        Land on the catalogue page, enter the postcode and open its catalogue.
+
+        Args:
+            postcode (int): The postcode to open the catalogue for.
+            url (str): The catalogue landing page.
+        """
+        self.land_first_page(url=url)
+        self.enter_postcode(postcode=postcode)
+        self.select_first_postcode_option()
+        self.click_read_catalogue_button()
+        logging.info(f"Catalogue page metrics: {self.page_metrics()}")
+
+    def page_metrics(self):
+        """
+        Get load time, bytes transferred and JS heap size for the current page.
+
+        Returns:
+            dict: The page metrics.
+        """
+        return collect_page_metrics(self)
+
+    def enter_postcode(self, postcode):
+        """
+        Enter the postcode into the search input.
+        """
+        try:
+            # Create a wait object
+            wait = WebDriverWait(self, 10)  # Timeout after 10 seconds
+
+            # Wait for the input element to be present and visible
+            input_postcode = wait.until(
+                EC.visibility_of_element_located((By.ID, 'wx-digital-catalogue-autocomplete'))
+            )
+
+            # Send the postcode to the input element
+            input_postcode.send_keys(postcode)
+        except Exception as e:
+            # Take a screenshot if an error occurs
+            timestamp = time.strftime("%Y%m%d-%H%M%S")
+            screenshot_filename = os.path.join(tempfile.gettempdir(), f'error_screenshot_{timestamp}.png')
+            self.save_screenshot(screenshot_filename)  # Use self to call save_screenshot
+            print(f"An error occurred while entering postcode: {str(e)}. Screenshot saved as '{screenshot_filename}'.")
+            log_page_source(self, "entering the postcode")  # A sample of page sources for further diagnosis
+
+    def select_first_postcode_option(self):
+        """
+        Select the first postcode option from the autocomplete dropdown.
+        """
+        select_postcode = WebDriverWait(self, 5).until(
+            EC.element_to_be_clickable((By.ID, 'wx-digital-catalogue-autocomplete-item-0'))
+        )
+        select_postcode.click()
+
+    def click_read_catalogue_button(self):
+        """
+        Click the button to read the digital catalogue.
+        """
+        read_catalogue_button = WebDriverWait(self, 5).until(
+            EC.element_to_be_clickable((By.CLASS_NAME, 'core-button-secondary'))
+        )
+        read_catalogue_button.click()
+
+    def hover_to_toggle_categories(self):
+        """
+        Hover over the categories toggle to display the category list.
+        """
+        action = ActionChains(self)
+        try:
+            # Wait for the hover element to be visible
+            hover_element = WebDriverWait(self, 10).until(
+                EC.visibility_of_element_located((By.ID, 'sf-navcategory-button'))
+            )
+            
+            # Perform the hover action
+            action.move_to_element(hover_element).perform()
+
+            # Wait for the category links to be present after hovering
+            WebDriverWait(self, 10).until(
+                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-navcategory-link'))
+            )
+
+            logging.info("Successfully hovered over the categories toggle.")
+            
+        except TimeoutException:
+            logging.error("Timeout occurred while waiting for the categories toggle or links.")
+        except Exception as e:
+            logging.error(f"Error during hover: {e}")
+
+    @metrics.timed('ClickCategory')
+    def click_category(self, category):
+        """
+        Click on a specific category from the category list.
+
+        Args:
+            category (str): The name of the category to click.
+
+        Returns:
+            bool: True once the category's products replaced the previous page,
+                False if it could not be clicked or its page never loaded.
+        """
+        try:
+            self.hover_to_toggle_categories()
+            categories = WebDriverWait(self, 60).until(
+                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-navcategory-link'))
+            )
+            # Iterate over the category elements to find the one that matches the name
+            for element in categories:
+                if element.text == category:
+                    # Wait for the element to be clickable after scrolling
+                    WebDriverWait(self, 10).until(EC.element_to_be_clickable(element))
+                    before = self.page_waiter.snapshot()
+                    # Scroll the element into view
+                    self.execute_script("arguments[0].click();", element)
+                    # Wait until the previous products are replaced
+                    if not self.page_waiter.wait_for_change(before, f"category:{category}"):
+                        # The page still shows the previous category, which must not be read as this one
+                        logging.error(f"Category {category} did not load after clicking it")
+                        log_page_source(self, f"opening {category}")
+                        return False
+                    logging.info(f"Clicked on category: {category}")
+                    return True
+        except TimeoutException:
+            logging.error(f"Timeout occurred while waiting for category: {category}")
+        except Exception as e:
+            logging.error(f"An error occurred while clicking category: {category}. Error: {e}")
+        return False
+
+    def get_category_list(self):
+        """
+        Retrieve and return the list of categories.
+
+        Returns:
+            list: A list of category names.
+
+        Raises:
+            ScrapeFailed: If no categories could be read.
+        """
+        self.hover_to_toggle_categories()
+        try:
+            categories = WebDriverWait(self, 10).until(
+                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-navcategory-link'))
+            )
+            category_names = [category.text for category in categories if category.text]
+        except Exception as e:
+            log_page_source(self, "listing categories")
+            raise ScrapeFailed(f"categories could not be read: {e}") from e
+        if not category_names:
+            log_page_source(self, "listing categories")
+            raise ScrapeFailed("the catalogue lists no categories")
+        return category_names
+
+    def get_catalogue_id(self, category_list):
+        """
+        Identify the regional catalogue the current postcode resolved to.
+
+        Uses the sale ID from the catalogue URL, falling back to a fingerprint
+        of the category list and the first offer dates on the page.
+
+        Args:
+            category_list (list): The categories of the open catalogue.
+
+        Returns:
+            str: The catalogue ID.
+
+        Raises:
+            ScrapeFailed: If there is no sale ID and no categories to fingerprint.
+        """
+        match = re.search(r'saleId=(\d+)', self.current_url)
+        if match:
+            return f"sale-{match.group(1)}"
+
+        # Every catalogue that failed to open would share the fingerprint of an empty list
+        if not category_list:
+            raise ScrapeFailed("cannot identify a catalogue without categories")
+        offer_dates = self.product_extractor.try_get_text(self, ".sale-dates", "NA")
+        fingerprint = "|".join(category_list) + "|" + offer_dates
+        return "fingerprint-" + hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+    @metrics.timed('NextPage')
+    def click_next_page(self):
+        """
+        Click the button to navigate to the next page of products.
+
+        Returns:
+            bool: True if the next page loaded, False if this is the last page.
+
+        Raises:
+            ScrapeFailed: If the button was clicked but the page did not change.
+        """
+        try:
+            # Wait for the next page button to be clickable
+            next_page_btn = WebDriverWait(self, 10).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'a[aria-label="Next page"]'))
+            )
+        except TimeoutException:
+            logging.info("No 'Next page' button found. Reached the end of pagination.")
+            return False
+
+        if next_page_btn.get_attribute('aria-disabled') == 'true' or \
+                'disabled' in (next_page_btn.get_attribute('class') or ''):
+            logging.info("The 'Next page' button is disabled. Reached the end of pagination.")
+            return False
+
+        try:
+            # Scroll to the next page button
+            self.execute_script("arguments[0].scrollIntoView(true);", next_page_btn)
+
+            before = self.page_waiter.snapshot()
+
+            # Attempt to click the button
+            self.execute_script("arguments[0].click();", next_page_btn)
+            changed = self.page_waiter.wait_for_change(before, "next_page")
+        except Exception as e:
+            raise ScrapeFailed(f"next page could not be opened: {e}") from e
+
+        # The rest of the category is unknown, so it cannot be treated as finished
+        if not changed:
+            raise ScrapeFailed("next page did not load")
+        return True
+
+    def extract_products_in_category(self,category):
+        """
+        Extract products from all pages of a category.
+
+        Returns:
+            list: A list of product data from the category.
+        """
+        products, _ = self.extract_category_pages(category)
+        return products
+
+    @metrics.timed('ExtractCategory')
+    def extract_category_pages(self, category, start_page=1, should_stop=None):
+        """
+        Extract products from a category's pages, optionally starting part way through.
+
+        Args:
+            category (str): The category name, used for logging.
+            start_page (int): The 1-based page to start extracting from. Earlier
+                pages are skipped without being read.
+            should_stop (callable): Checked after each page; returning True stops
+                the extraction so it can be resumed later.
+
+        Returns:
+            tuple: The extracted products and the next page to extract, or None
+                if the category is finished.
+
+        Raises:
+            ScrapeFailed: If a page could not be read, so the category is incomplete.
+        """
+        products = []  # To store the products from all pages in the category
+        page = 1
+        try:
+            # Skip pages that an earlier invocation already stored
+            while page < start_page:
+                if not self.click_next_page():
+                    return products, None
+                page += 1
+
+            while True:
+                # Extract products from the current page
+                page_products = self.product_extractor.get_products_from_current_page()
+                logging.info(f"Extracted {len(page_products)} products from the {category} page.")
+                products.extend(page_products)
+
+                # Check if there's a "Next page" button to click
+                if not self.click_next_page():
+                    return products, None
+                page += 1
+
+                if should_stop is not None and should_stop():
+                    return products, page
+        except Exception as e:
+            logging.error(f"An error occurred during product extraction: {e}")
+            log_page_source(self, f"extracting {category}")
+            raise ScrapeFailed(f"{category} stopped after {len(products)} products on page {page}: {e}") from e
+
+    def build_product_item(self, product, postcode, category):
+        """
+        Build the ProductCatalogTable item for a scraped product.
+
+        Args:
+            product (dict): The product data from the extractor.
+            postcode (int): The postcode the catalogue was scraped for.
+            category (str): The category the product was found in.
+
+        Returns:
+            dict: The DynamoDB item.
+        """
+        return {
+            'ProductName': product.get('ProductName', 'NA'),
+            'POSTCODE': str(postcode),
+            'Category': str(category),
+            'Price': product.get('price', 'NA'),
+            'OptionSuffix': product.get('option_suffix', 'NA'),
+            'SalePrice': product.get('sale_price', 'NA'),
+            'RegularPrice': product.get('regular_price', 'NA'),
+            'Saving': product.get('saving', 'NA'),
+            'OfferValid': product.get('offer_valid', 'NA'),
+            'ComparativeText': product.get('comparative_text', 'NA'),
+            'SaleOption': product.get('sale_option', 'NA')
+        }
+
+# CSS selectors for each product field, relative to a '.sf-item-content' element.
+PRODUCT_FIELD_SELECTORS = {
+    "ProductName": ".sf-item-heading",
+    "price": ".sf-pricedisplay",
+    "option_suffix": ".sf-optionsuffix",
+    "sale_price": ".sf-saleoptiontext",
+    "regular_price": ".sf-regprice",
+    "regoptiondesc": ".sf-regoptiondesc",
+    "saving": ".sf-regprice",
+    "offer_valid": ".sale-dates",
+    "comparative_text": ".sf-comparativeText",
+    "sale_option": ".sf-saleoptiondesc"
+}
+
+# Reads every field of every product on the page in a single round trip.
+# Missing elements come back as null so the defaults stay on the Python side.
+BULK_EXTRACT_SCRIPT = """
+const fields = arguments[0];
+const items = document.getElementsByClassName('sf-item-content');
+const results = [];
+for (const item of items) {
+    const data = {};
+    for (const [name, selector] of fields) {
+        const element = item.querySelector(selector);
+        data[name] = element ? element.innerText.trim() : null;
+    }
+    results.push(data);
+}
+return results;
+"""
+
+class ProductExtractor:
+    """
+    This class is responsible for extracting data from a single product page.
+    """
+    def __init__(self, driver: WebDriver, bulk: bool = True):
+        self.driver = driver
+        self.bulk = bulk
+
+    def try_get_text(self, parent: WebDriver, selector: str, default: str) -> str:
+        """
+        Try to get the text content of an element.
+
+        Args:
+            parent (WebDriver): The parent WebDriver instance.
+            selector (str): The CSS selector of the element.
+            default (str): The default value to return if the element is not found.
+
+        Returns:
+            str: The text content of the element or the default value.
+        """
+        try:
+            return parent.find_element(By.CSS_SELECTOR, selector).text
+        except:
+            return default
+
+    def try_get_attribute(self, parent: WebDriver, selector: str, attribute: str, default: str) -> str:
+        """
+        Try to get an attribute value of an element.
+
+        Args:
+            parent (WebDriver): The parent WebDriver instance.
+            selector (str): The CSS selector of the element.
+            attribute (str): The attribute to retrieve.
+            default (str): The default value to return if the element is not found.
+
+        Returns:
+            str: The attribute value or the default value.
+        """
+        try:
+            return parent.find_element(By.CSS_SELECTOR, selector).get_attribute(attribute)
+        except:
+            return default
+
+    @metrics.timed('ExtractPage')
+    def get_products_from_current_page(self) -> list:
+        """
+        Extract product data from the current page.
+
+        Uses a single script call per page when bulk mode is enabled, otherwise
+        falls back to one lookup per product field.
+
+        Returns:
+            list: A list of product data dictionaries.
+
+        Raises:
+            ScrapeFailed: If the page's products could not be read, so an
+                unreadable page is never taken for an empty one.
+        """
+        if self.bulk:
+            return self.get_products_from_current_page_bulk()
+        return self.get_products_from_current_page_per_element()
+
+    def get_products_from_current_page_bulk(self) -> list:
+        """
+        Extract product data from the current page with one script call.
+
+        Returns:
+            list: A list of product data dictionaries.
+
+        Raises:
+            ScrapeFailed: If the products did not appear or the script failed.
+        """
+        try:
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.CLASS_NAME, 'sf-item-content'))
+            )
+
+            raw_products = self.driver.execute_script(
+                BULK_EXTRACT_SCRIPT, list(PRODUCT_FIELD_SELECTORS.items())
+            ) or []
+
+            return [
+                {field: (raw.get(field) if raw.get(field) is not None else "NA")
+                 for field in PRODUCT_FIELD_SELECTORS}
+                for raw in raw_products
+            ]
+
+        except Exception as e:
+            raise ScrapeFailed(f"products could not be read from the page: {e}") from e
+
+    def get_products_from_current_page_per_element(self) -> list:
+        """
+        Extract product data from the current page, one element lookup per field.
+
+        Returns:
+            list: A list of product data dictionaries.
+
+        Raises:
+            ScrapeFailed: If the products did not appear or went stale while being read.
+        """
+        try:
+            products = WebDriverWait(self.driver, 10).until(
+                EC.presence_of_all_elements_located((By.CLASS_NAME, 'sf-item-content'))
+            )
+
+            product_list = []
+
+            for product in products:
+                data = {
+                    field: self.try_get_text(product, selector, "NA")
+                    for field, selector in PRODUCT_FIELD_SELECTORS.items()
+                }
+                product_list.append(data)
+            return product_list
+
+        except Exception as e:
+            raise ScrapeFailed(f"products could not be read from the page: {e}") from e
@@ -0,0 +1,110 @@
+import os
+import time
+import logging
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+
+PRODUCT_SELECTOR = '.sf-item-content'
+PAGE_INDICATOR_SELECTOR = os.environ.get('PAGE_INDICATOR_SELECTOR', 'a[aria-current="page"]')
+
+
+class PageChangeWaiter:
+    """
+    Waits for the catalogue page to change after a click instead of sleeping.
+
+    A page counts as changed once the product nodes seen before the click have
+    gone stale, or the page indicator shows a different page, and new product
+    nodes are present. Every wait is recorded so the real wait time can be logged.
+    """
+    def __init__(self, driver, timeout=None, poll_frequency=0.05):
+        self.driver = driver
+        self.timeout = timeout if timeout is not None else float(os.environ.get('PAGE_WAIT_TIMEOUT', '10'))
+        self.poll_frequency = poll_frequency
+        self.wait_times = []
+
+    def snapshot(self):
+        """
+        Capture the current first product node and page indicator text.
+
+        Returns:
+            tuple: The first product element (or None) and the indicator text (or None).
+        """
+        products = self.driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR)
+        indicators = self.driver.find_elements(By.CSS_SELECTOR, PAGE_INDICATOR_SELECTOR)
+        first_product = products[0] if products else None
+        try:
+            indicator_text = indicators[0].text if indicators else None
+        except StaleElementReferenceException:
+            indicator_text = None
+        return first_product, indicator_text
+
+    def _has_changed(self, before):
+        old_product, old_indicator = before
+
+        changed = False
+        if old_product is None:
+            changed = True
+        else:
+            try:
+                old_product.is_enabled()
+            except StaleElementReferenceException:
+                changed = True
+
+        if not changed and old_indicator is not None:
+            indicators = self.driver.find_elements(By.CSS_SELECTOR, PAGE_INDICATOR_SELECTOR)
+            try:
+                changed = bool(indicators) and indicators[0].text != old_indicator
+            except StaleElementReferenceException:
+                changed = True
+
+        return changed and bool(self.driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR))
+
+    def wait_for_change(self, before, label):
+        """
+        Block until the page differs from a snapshot or the timeout ceiling is hit.
+
+        Args:
+            before (tuple): The snapshot taken before the click.
+            label (str): A name for the wait, used in the recorded timings.
+
+        Returns:
+            bool: True if the page changed, False if the ceiling was reached.
+        """
+        start = time.perf_counter()
+        try:
+            WebDriverWait(
+                self.driver, self.timeout, poll_frequency=self.poll_frequency,
+                ignored_exceptions=(WebDriverException,)
+            ).until(lambda driver: self._has_changed(before))
+            changed = True
+        except TimeoutException:
+            changed = False
+        elapsed = time.perf_counter() - start
+
+        self.wait_times.append((label, elapsed, changed))
+        if not changed:
+            logging.warning(f"Page did not change after '{label}' within {self.timeout}s.")
+        return changed
+
+    def reset(self):
+        """
+        Forget the recorded waits, e.g. when a warm browser starts a new postcode.
+        """
+        self.wait_times = []
+
+    def summary(self):
+        """
+        Summarise the recorded waits.
+
+        Returns:
+            dict: The number of waits, total and longest wait in seconds, and timeouts.
+        """
+        durations = [elapsed for _, elapsed, _ in self.wait_times]
+        return {
+            'waits': len(durations),
+            'total_seconds': round(sum(durations), 3),
+            'max_seconds': round(max(durations), 3) if durations else 0.0,
+            'timeouts': sum(1 for _, _, changed in self.wait_times if not changed)
+        }
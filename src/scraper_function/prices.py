@@ -0,0 +1,186 @@
+import re
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+# "$4.50", "$4", "4.50", "85c", "2 for $5", "Save $1.20", "$1.20 per 100g"
+_MULTI_BUY = re.compile(r'(\d+)\s*for\s*\$\s*(\d+(?:\.\d{1,2})?)', re.IGNORECASE)
+_DOLLARS = re.compile(r'\$\s*(\d{1,5}(?:,\d{3})*(?:\.\d{1,2})?)')
+_CENTS = re.compile(r'(?<![\d.])(\d{1,3})\s*c\b', re.IGNORECASE)
+_BARE_NUMBER = re.compile(r'^\s*(\d{1,5}(?:\.\d{1,2})?)\s*$')
+_HALF_PRICE = re.compile(r'\b(half\s*price|1/2\s*price)\b', re.IGNORECASE)
+_PERCENT_OFF = re.compile(r'(\d{1,2}(?:\.\d+)?)\s*%\s*off', re.IGNORECASE)
+# Wording that says what the second price next to a product is
+_SAVING_WORDING = re.compile(r'\bsave\b', re.IGNORECASE)
+_REGULAR_WORDING = re.compile(r'\b(?:was|reg(?:ular)?|normally|rrp)\b', re.IGNORECASE)
+_UNIT = re.compile(r'(?:per|/)\s*(\d*\.?\d*\s*(?:kg|g|ml|l|ea|each|m|sheets?|pack|pk)\b)', re.IGNORECASE)
+
+
+def _to_cents(amount):
+    return int((Decimal(amount.replace(',', '')) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+@lru_cache(maxsize=4096)
+def parse_cents(text):
+    """
+    Parse a displayed price into integer cents.
+
+    Multi-buy prices such as "2 for $5" are converted to the price of one item.
+
+    Args:
+        text (str): The displayed string, e.g. "$4.50", "85c" or "NA".
+
+    Returns:
+        int: The amount in cents, or None if the string holds no price.
+    """
+    if not text or text == 'NA':
+        return None
+    multi_buy = _MULTI_BUY.search(text)
+    if multi_buy:
+        quantity = int(multi_buy.group(1))
+        return round(_to_cents(multi_buy.group(2)) / quantity) if quantity else None
+    dollars = _DOLLARS.search(text)
+    if dollars:
+        return _to_cents(dollars.group(1))
+    cents = _CENTS.search(text)
+    if cents:
+        return int(cents.group(1))
+    bare = _BARE_NUMBER.match(text)
+    if bare:
+        return _to_cents(bare.group(1))
+    return None
+
+
+@lru_cache(maxsize=4096)
+def parse_reference_price(text):
+    """
+    Parse the second price shown next to a product and tell what it is.
+
+    "Save $1.20" is a saving; "Was $4.50" (or "Reg", "Normally", "RRP") is
+    the regular price.
+
+    Args:
+        text (str): The displayed string.
+
+    Returns:
+        tuple: ('saving', 'regular' or None when the wording does not say, cents),
+            or (None, None) if the string holds no price.
+    """
+    cents = parse_cents(text)
+    if cents is None:
+        return None, None
+    if _SAVING_WORDING.search(text):
+        return 'saving', cents
+    if _REGULAR_WORDING.search(text):
+        return 'regular', cents
+    return None, cents
+
+
+@lru_cache(maxsize=4096)
+def parse_unit(text):
+    """
+    Parse the unit of a comparative price, e.g. "100g" from "$1.20 per 100g".
+
+    Args:
+        text (str): The comparative price string.
+
+    Returns:
+        str: The normalised unit, or None.
+    """
+    if not text or text == 'NA':
+        return None
+    match = _UNIT.search(text)
+    return re.sub(r'\s+', '', match.group(1)).lower() if match else None
+
+
+def _reference_prices(item, price):
+    """
+    Work out the regular price and saving from the RegularPrice and Saving strings.
+
+    Both fields are read from the same element on the site, so the wording
+    decides what the number is. Unlabelled numbers fall back to the field
+    they came from, or, when both fields hold the same string, to a saving
+    if it is below the price and the regular price otherwise.
+    """
+    regular = saving = None
+    same_element = item.get('RegularPrice') == item.get('Saving')
+    for field, field_kind in (('RegularPrice', 'regular'), ('Saving', 'saving')):
+        kind, cents = parse_reference_price(item.get(field))
+        if cents is None:
+            continue
+        if kind is None:
+            if not same_element:
+                kind = field_kind
+            else:
+                kind = 'saving' if price is not None and cents < price else 'regular'
+        if kind == 'regular' and regular is None:
+            regular = cents
+        elif kind == 'saving' and saving is None:
+            saving = cents
+
+    if price is None:
+        return regular, saving
+    if saving is not None and saving <= 0:
+        saving = None
+    if regular is None and saving is not None:
+        regular = price + saving
+    if regular is not None and regular <= price:
+        # Not a reduction, whatever the wording says
+        return None, None
+    if regular is not None:
+        saving = regular - price
+    return regular, saving
+
+
+def _discount(price, regular, saving, texts):
+    if saving is not None and regular:
+        # Worked out in Decimal from the whole cents, so halves are never lost to binary floats
+        return saving, (Decimal(saving) * 100 / Decimal(regular)).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+    for text in texts:
+        if not text:
+            continue
+        if _HALF_PRICE.search(text):
+            return (price if price is not None else None), Decimal('50.0')
+        percent = _PERCENT_OFF.search(text)
+        if percent:
+            return saving, Decimal(percent.group(1)).quantize(Decimal('0.1'))
+    return saving, None
+
+
+def normalise_prices(items):
+    """
+    Add numeric price fields to a batch of ProductCatalogTable items.
+
+    The raw display strings are kept as they are. Identical strings across
+    the batch are parsed once.
+
+    Adds PriceCents, SalePriceCents, RegularPriceCents, SavingCents,
+    ComparativeCents, ComparativeUnit and DiscountPercent (a Decimal with one
+    decimal place). A "Save" amount gives the regular price as price plus
+    saving; a "Was" amount is the regular price. A regular price at or below
+    the current price is dropped, along with its saving and discount. Fields
+    that cannot be worked out are left out.
+
+    Args:
+        items (list): Items with Price, SalePrice, RegularPrice, Saving and
+            ComparativeText display strings. Updated in place.
+
+    Returns:
+        list: The same items.
+    """
+    for item in items:
+        price = parse_cents(item.get('Price'))
+        regular, saving = _reference_prices(item, price)
+        saving, discount = _discount(price, regular, saving, (item.get('Saving'), item.get('SaleOption')))
+
+        numeric = {
+            'PriceCents': price,
+            'SalePriceCents': parse_cents(item.get('SalePrice')),
+            'RegularPriceCents': regular,
+            'SavingCents': saving,
+            'ComparativeCents': parse_cents(item.get('ComparativeText')),
+            'ComparativeUnit': parse_unit(item.get('ComparativeText')),
+            'DiscountPercent': discount
+        }
+        item.update({name: value for name, value in numeric.items() if value is not None})
+    return items
@@ -0,0 +1,135 @@
+import os
+import logging
+
+# URL patterns (Chrome DevTools wildcard syntax) for resources the scraper never reads
+RESOURCE_GROUPS = {
+    'images': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico'],
+    'fonts': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.mp3'],
+    'trackers': [
+        '*google-analytics.com*',
+        '*googletagmanager.com*',
+        '*doubleclick.net*',
+        '*facebook.net*',
+        '*hotjar.com*',
+        '*nr-data.net*',
+        '*newrelic.com*',
+        '*quantummetric.com*',
+        '*demdex.net*',
+        '*omtrdc.net*',
+        '*adobedtm.com*',
+        '*bing.com/bat*',
+        '*tiktok.com*'
+    ]
+}
+
+DEFAULT_BLOCKED_GROUPS = 'images,fonts,media,trackers'
+
+# Navigation timing, bytes transferred and JS heap for the current page
+PAGE_METRICS_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let transferred = navigation ? navigation.transferSize : 0;
+for (const resource of resources) {
+    transferred += resource.transferSize || 0;
+}
+return {
+    load_ms: navigation ? navigation.loadEventEnd - navigation.startTime : null,
+    dom_content_loaded_ms: navigation ? navigation.domContentLoadedEventEnd - navigation.startTime : null,
+    resource_count: resources.length,
+    bytes_transferred: transferred,
+    js_heap_bytes: performance.memory ? performance.memory.usedJSHeapSize : null
+};
+"""
+
+
+def _split_env(name, default=''):
+    return [value.strip() for value in os.environ.get(name, default).split(',') if value.strip()]
+
+
+def resource_blocking_enabled():
+    """
+    Check whether the lean browsing profile is switched on.
+
+    Returns:
+        bool: False only when BLOCK_RESOURCES is set to false.
+    """
+    return os.environ.get('BLOCK_RESOURCES', 'true').lower() == 'true'
+
+
+def blocked_groups():
+    """
+    Get the resource groups selected by BLOCKED_RESOURCE_GROUPS.
+
+    Returns:
+        list: The group names, e.g. ['images', 'fonts'].
+    """
+    return [group for group in _split_env('BLOCKED_RESOURCE_GROUPS', DEFAULT_BLOCKED_GROUPS)
+            if group in RESOURCE_GROUPS]
+
+
+def blocked_url_patterns():
+    """
+    Build the deny list from the selected groups and the allow/deny overrides.
+
+    BLOCKED_URL_PATTERNS adds patterns to the deny list and
+    ALLOWED_URL_PATTERNS removes patterns from it.
+
+    Returns:
+        list: URL patterns to block.
+    """
+    allowed = set(_split_env('ALLOWED_URL_PATTERNS'))
+    patterns = []
+    for group in blocked_groups():
+        patterns.extend(RESOURCE_GROUPS[group])
+    patterns.extend(_split_env('BLOCKED_URL_PATTERNS'))
+    return [pattern for pattern in dict.fromkeys(patterns) if pattern not in allowed]
+
+
+def add_lean_profile_options(options):
+    """
+    Turn off image decoding in the Chrome options when images are blocked.
+
+    Args:
+        options (ChromeOptions): The options used to start Chrome.
+    """
+    if 'images' in blocked_groups():
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+
+
+def apply_url_blocking(driver, patterns):
+    """
+    Block matching requests for the lifetime of the browser session.
+
+    Args:
+        driver (WebDriver): A Chrome WebDriver.
+        patterns (list): URL patterns to block.
+    """
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+        logging.info(f"Blocking {len(patterns)} URL patterns.")
+    except Exception as e:
+        logging.error(f"Failed to enable URL blocking: {e}")
+
+
+def collect_page_metrics(driver):
+    """
+    Read load time, bytes transferred and JS heap size for the current page.
+
+    Args:
+        driver (WebDriver): A Chrome WebDriver.
+
+    Returns:
+        dict: The page metrics, empty if they could not be read.
+    """
+    try:
+        return driver.execute_script(PAGE_METRICS_SCRIPT) or {}
+    except Exception as e:
+        logging.error(f"Failed to collect page metrics: {e}")
+        return {}
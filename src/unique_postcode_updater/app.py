@@ -1,37 +1,174 @@
+import os
 import json
-import boto3
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
+from common import aws
+from common.metrics import metrics
+
+UNIQUE_POSTCODES_TABLE = os.environ.get('UNIQUE_POSTCODES_TABLE', 'UniquePostcodesTable')
+# Active requests per postcode, read by the scrape scheduler; kept apart so counting never touches UniquePostcodes
+REQUEST_COUNTS_TABLE = os.environ.get('REQUEST_COUNTS_TABLE', 'PostcodeRequestCountsTable')
+# Postcodes known to be in UniquePostcodes, remembered across warm invocations
+KNOWN_POSTCODES_CACHE_SIZE = int(os.environ.get('KNOWN_POSTCODES_CACHE_SIZE', '10000'))
+# Conditional writes sent at the same time
+WRITE_CONCURRENCY = int(os.environ.get('WRITE_CONCURRENCY', '8'))
+
+known_postcodes = OrderedDict()
 
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb')
-    unique_postcodes_table = dynamodb.Table('UniquePostcodes')
+    """
+    Adds the postcodes of new user requests to the UniquePostcodes table.
+
+    Each postcode in the stream batch is written once, with a conditional put
+    that only succeeds if the postcode is not in the table yet, so only truly
+    new postcodes create an item (and a stream record for the scraper).
+    Postcodes already known to exist are skipped without calling DynamoDB.
 
+    The net number of requests added and removed per postcode is added to
+    its count in the request counts table, which the scrape scheduler uses
+    to rank postcodes without scanning UserRequests. Counting only starts
+    once every new postcode is added, so a batch the stream retries is
+    never counted twice.
+    """
+    postcodes = []
+    changes = Counter()
     for record in event['Records']:
-        # Check if the event is an INSERT operation
-        if record['eventName'] == 'INSERT':
-            new_image = record['dynamodb']['NewImage']
-            postcode = new_image['POSTCODE']['S']
-
-            try:
-                # Check if the postcode already exists in UniquePostcodes table
-                response = unique_postcodes_table.get_item(
-                    Key={'POSTCODE': postcode}
-                )
-
-                if 'Item' not in response:
-                    # Postcode does not exist, add it to UniquePostcodes table
-                    unique_postcodes_table.put_item(
-                        Item={'POSTCODE': postcode}
-                    )
-                    print(f"Added new postcode: {postcode} to UniquePostcodes table.")
-                else:
-                    print(f"Postcode {postcode} already exists in UniquePostcodes table.")
-            except ClientError as e:
-                print(f"Error accessing UniquePostcodes table: {e.response['Error']['Message']}")
-        else:
-            print(f"Event {record['eventName']} is not an INSERT operation. Skipping.")
+        change = {'INSERT': 1, 'REMOVE': -1}.get(record['eventName'])
+        if change is None:
+            continue
+        postcode = record_postcode(record['dynamodb'])
+        if not postcode:
+            continue
+        changes[postcode] += change
+        if change > 0 and postcode not in postcodes:
+            postcodes.append(postcode)
+
+    new_postcodes = [postcode for postcode in postcodes if not is_known(postcode)]
+    changed = [(postcode, change) for postcode, change in changes.items() if change]
+    counts = {'records': len(event['Records']), 'postcodes': len(postcodes),
+              'cached': len(postcodes) - len(new_postcodes), 'added': 0, 'existing': 0, 'failed': 0,
+              'counted': 0, 'count_failed': 0}
+
+    if new_postcodes:
+        with metrics.timer('AddPostcodes'), ThreadPoolExecutor(max_workers=min(WRITE_CONCURRENCY, len(new_postcodes))) as executor:
+            for postcode, result in zip(new_postcodes, executor.map(add_postcode, new_postcodes)):
+                counts[result] += 1
+                if result != 'failed':
+                    remember(postcode)
+
+    if counts['failed']:
+        metrics.flush()
+        print(f"UniquePostcodes update: {counts}")
+        # Fail the batch before anything is counted, so the stream's retry counts it once;
+        # the conditional writes make the postcodes already added safe to replay
+        raise RuntimeError(f"{counts['failed']} postcodes could not be added to {UNIQUE_POSTCODES_TABLE}")
+
+    if changed:
+        with metrics.timer('CountRequests'), ThreadPoolExecutor(max_workers=min(WRITE_CONCURRENCY, len(changed))) as executor:
+            for counted in executor.map(lambda entry: count_requests(*entry), changed):
+                counts['counted' if counted else 'count_failed'] += 1
+
+    metrics.record('AddPostcodes', 'NewPostcodes', counts['added'], unit='Count')
+    metrics.flush()
+    print(f"UniquePostcodes update: {counts}")
+    # A failed count is only logged: a replay would count the rest of the batch twice, and the
+    # counts only order the scheduler's dispatches
 
     return {
         'statusCode': 200,
         'body': json.dumps('UniquePostcodes table updated successfully.')
     }
+
+def record_postcode(stream_record):
+    """
+    Get the postcode of a UserRequests stream record from its keys, or from an image stored under the old name.
+    """
+    for image in (stream_record.get('Keys', {}), stream_record.get('NewImage', {})):
+        attribute = image.get('POSTCODE') or image.get('Postcode') or {}
+        postcode = attribute.get('S') or attribute.get('N')
+        if postcode:
+            return postcode
+    return None
+
+def is_known(postcode):
+    """
+    Check the warm cache for a postcode already in UniquePostcodes, marking it as recently used.
+    """
+    if postcode in known_postcodes:
+        known_postcodes.move_to_end(postcode)
+        return True
+    return False
+
+def remember(postcode):
+    """
+    Cache a postcode as being in UniquePostcodes, dropping the least recently used beyond the cache size.
+    """
+    known_postcodes[postcode] = True
+    known_postcodes.move_to_end(postcode)
+    while len(known_postcodes) > KNOWN_POSTCODES_CACHE_SIZE:
+        known_postcodes.popitem(last=False)
+
+def add_postcode(postcode):
+    """
+    Write a postcode to UniquePostcodes unless it is already there.
+
+    Args:
+        postcode (str): The postcode.
+
+    Returns:
+        str: 'added', 'existing' or 'failed'.
+    """
+    try:
+        aws.table(UNIQUE_POSTCODES_TABLE).put_item(
+            Item={'POSTCODE': postcode, 'AddedAt': int(time.time())},
+            ConditionExpression='attribute_not_exists(POSTCODE)'
+        )
+        print(f"Added new postcode: {postcode} to UniquePostcodes table.")
+        return 'added'
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return 'existing'
+        print(f"Error accessing UniquePostcodes table: {e.response['Error']['Message']}")
+        return 'failed'
+
+def count_requests(postcode, change):
+    """
+    Add a change to a postcode's count of active requests, never taking it below zero.
+
+    Requests made before counting started were never counted, so removing
+    them neither creates a count nor leaves a negative one.
+
+    Args:
+        postcode (str): The postcode.
+        change (int): The net number of requests added, negative if more were deleted.
+
+    Returns:
+        bool: True if the count was updated or had nothing to take the change from.
+    """
+    table = aws.table(REQUEST_COUNTS_TABLE)
+    update = {
+        'Key': {'POSTCODE': postcode},
+        'UpdateExpression': 'ADD ActiveRequests :change',
+        'ExpressionAttributeValues': {':change': change}
+    }
+    if change < 0:
+        update['ConditionExpression'] = 'attribute_exists(POSTCODE)'
+        update['ReturnValues'] = 'UPDATED_NEW'
+    try:
+        response = table.update_item(**update)
+        if int(response.get('Attributes', {}).get('ActiveRequests', 0)) < 0:
+            # Only reset a count that is still negative, so a concurrent increment is kept
+            table.update_item(
+                Key={'POSTCODE': postcode},
+                UpdateExpression='SET ActiveRequests = :zero',
+                ConditionExpression='ActiveRequests < :zero',
+                ExpressionAttributeValues={':zero': 0}
+            )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return True
+        print(f"Error counting the requests of postcode {postcode}: {e.response['Error']['Message']}")
+        return False
@@ -0,0 +1,31 @@
+# tests/conftest.py
+
+import os
+import sys
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+sys.path.insert(0, os.path.join(SRC, 'layers', 'common_layer', 'python'))
+# The in-memory AWS stand-ins are shared with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# The stand-ins replace every AWS call; these keep boto3 from looking for a region or instance credentials
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-southeast-2')
+os.environ.setdefault('AWS_EC2_METADATA_DISABLED', 'true')
+os.environ.setdefault('USER_REQUESTS_TABLE', 'UserRequestsTable')
+os.environ.setdefault('UNIQUE_POSTCODES_TABLE', 'UniquePostcodesTable')
+
+
+def load_function(name):
+    """
+    Import a function's app module under a unique name, with its directory importable.
+    """
+    directory = os.path.join(SRC, name)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(f"{name}_app", os.path.join(directory, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,56 @@
+# tests/unit/test_indexer_function.py
+
+import json
+from decimal import Decimal
+
+import pytest
+
+from common.opensearch import OPENSEARCH_INDEX, OpenSearchClient, dumps
+
+
+@pytest.fixture
+def opensearch():
+    from standins import OpenSearchStandIn
+
+    with OpenSearchStandIn() as standin:
+        yield standin
+
+
+@pytest.fixture
+def indexer(opensearch, monkeypatch):
+    from conftest import load_function
+
+    module = load_function('indexer_function')
+    monkeypatch.setattr(module, 'opensearch', OpenSearchClient(opensearch.endpoint))
+    return module
+
+
+def stream_record(postcode, product_name, **attributes):
+    from standins import _serialize
+
+    keys = {'POSTCODE': postcode, 'ProductName': product_name}
+    return {'eventName': 'INSERT', 'dynamodb': {'Keys': _serialize(keys), 'NewImage': _serialize({**keys, **attributes})}}
+
+
+def test_index_is_created_with_numeric_fields_as_float(indexer, opensearch):
+    indexer.lambda_handler({'Records': [stream_record('3000', 'Milk', DiscountPercent=Decimal('50.0'))]}, None)
+    indexer.lambda_handler({'Records': [stream_record('3000', 'Rice', DiscountPercent=Decimal('12.5'))]}, None)
+
+    mappings = opensearch.mappings[OPENSEARCH_INDEX]
+    assert mappings['properties']['DiscountPercent'] == {'type': 'float'}
+    assert mappings['properties']['PriceCents'] == {'type': 'float'}
+    assert mappings['properties']['POSTCODE']['fields']['keyword']['type'] == 'keyword'
+    assert opensearch.requests['create_index'] == 1
+    assert opensearch.document_count(OPENSEARCH_INDEX) == 2
+
+
+def test_existing_index_is_left_alone(opensearch):
+    client = OpenSearchClient(opensearch.endpoint)
+
+    assert client.create_index('products', {'mappings': {}}) is True
+    assert client.create_index('products', {'mappings': {'properties': {}}}) is False
+
+
+def test_whole_decimals_are_sent_as_numbers():
+    assert json.loads(dumps({'DiscountPercent': Decimal('50.0'), 'Discount': Decimal('12.5')})) == \
+        {'DiscountPercent': 50, 'Discount': 12.5}
@@ -0,0 +1,164 @@
+# tests/unit/test_matcher_function.py
+
+import os
+import sys
+import time
+from decimal import Decimal
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import SRC
+from common.notifications import NotificationDispatcher, ledger_key
+from common.snapshots import Snapshot, SnapshotStore, encode_snapshot
+
+sys.path.insert(0, os.path.join(SRC, 'matcher_function'))
+from product_index import ProductIndexCache, ProductNameIndex  # noqa: E402
+
+REQUEST = {'RequestID': 'request-1', 'PhoneNumber': '0400000000', 'POSTCODE': '3000', 'ProductName': 'Milk'}
+MILK = {'POSTCODE': '3000', 'ProductName': 'Milk 2L', 'OfferValid': 'Ends Tue'}
+BREAD = {'POSTCODE': '3000', 'ProductName': 'Bread', 'OfferValid': 'Ends Tue'}
+
+
+@pytest.fixture
+def ledger():
+    from standins import InMemoryDynamoDB
+
+    return InMemoryDynamoDB({'NotificationLedgerTable': ('LedgerKey',)}).Table('NotificationLedgerTable')
+
+
+@pytest.fixture
+def sns():
+    from standins import SNSStandIn
+
+    return SNSStandIn()
+
+
+def dispatcher(ledger, sns):
+    return NotificationDispatcher(ledger, sns, lambda request, products: ', '.join(p['ProductName'] for p in products),
+                                  rate_per_second=1000)
+
+
+def test_repeated_matches_are_sent_once(ledger, sns):
+    first = dispatcher(ledger, sns)
+    first.dispatch(REQUEST, [MILK])
+    assert first.flush()['sent'] == 1
+
+    # The same container remembers the key without reading the ledger
+    first.dispatch(REQUEST, [MILK])
+    assert first.flush()['cached_duplicates'] == 1
+
+    # Another container is stopped by the ledger's conditional write
+    second = dispatcher(ledger, sns)
+    second.dispatch(REQUEST, [MILK, BREAD])
+    counts = second.flush()
+
+    assert (counts['sent'], counts['ledger_duplicates']) == (1, 1)
+    assert sns.messages == [('0400000000', 'Milk 2L'), ('0400000000', 'Bread')]
+
+
+class FailingLedger:
+    """
+    Passes calls to a table but fails the put of one ledger key with an unexpected error.
+    """
+    def __init__(self, table, failing_key):
+        self.table = table
+        self.failing_key = failing_key
+
+    def put_item(self, Item, **kwargs):
+        if Item['LedgerKey'] == self.failing_key:
+            raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'boom'}}, 'PutItem')
+        return self.table.put_item(Item=Item, **kwargs)
+
+    def delete_item(self, **kwargs):
+        return self.table.delete_item(**kwargs)
+
+
+def test_failed_claim_releases_earlier_claims(ledger, sns):
+    failing = dispatcher(FailingLedger(ledger, ledger_key(REQUEST, BREAD)), sns)
+    failing.dispatch(REQUEST, [MILK, BREAD])
+
+    assert failing.flush()['failed'] == 1
+    assert not sns.messages
+    assert not ledger.items
+
+    retry = dispatcher(ledger, sns)
+    retry.dispatch(REQUEST, [MILK, BREAD])
+    assert retry.flush()['sent'] == 1
+    assert sns.messages == [('0400000000', 'Milk 2L, Bread')]
+
+
+def test_failed_publish_releases_its_claims(ledger):
+    class FailingSNS:
+        def publish(self, **kwargs):
+            raise ClientError({'Error': {'Code': 'InvalidParameter', 'Message': 'bad number'}}, 'Publish')
+
+    failing = dispatcher(ledger, FailingSNS())
+    failing.dispatch(REQUEST, [MILK])
+
+    assert failing.flush()['failed'] == 1
+    assert not ledger.items
+
+
+def test_whole_discounts_keep_missing_values_missing():
+    items = [{'POSTCODE': '3000', 'ProductName': 'Milk 2L', 'DiscountPercent': Decimal('25')},
+             {'POSTCODE': '3000', 'ProductName': 'Bread'}]
+    snapshot = Snapshot(encode_snapshot(items, '3000'))
+
+    assert snapshot.column_info['DiscountPercent']['type'] == 'float64'
+    assert snapshot.row(1) == {'POSTCODE': '3000', 'ProductName': 'Bread'}
+    index = ProductNameIndex.from_snapshot(snapshot, lambda product: 10.0)
+    assert list(index.discounts) == [25.0, 10.0]
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    from standins import InMemoryDynamoDB
+
+    dynamodb = InMemoryDynamoDB({'ProductCatalogTable': ('POSTCODE', 'ProductName'),
+                                 'CatalogueTable': ('CatalogueID',), 'PostcodeCatalogueTable': ('POSTCODE',)})
+    store = SnapshotStore(str(tmp_path))
+    store.save('3000', [{'POSTCODE': '3000', 'ProductName': 'Old Milk', 'DiscountPercent': 50}], 'catalogue-1')
+    dynamodb.Table('ProductCatalogTable').load([{'POSTCODE': '3000', 'ProductName': 'New Milk',
+                                                 'DiscountPercent': Decimal('50')}])
+    return dynamodb, store
+
+
+def product_names(dynamodb, store):
+    cache = ProductIndexCache(dynamodb.Table('ProductCatalogTable'), snapshots=store,
+                              catalogue_table=dynamodb.Table('CatalogueTable'),
+                              mapping_table=dynamodb.Table('PostcodeCatalogueTable'))
+    return [product['ProductName'] for product in cache.get('3000').search('milk')]
+
+
+def record(dynamodb, catalogue_id, scraped_at, valid_until):
+    dynamodb.Table('CatalogueTable').put_item(Item={'CatalogueID': catalogue_id, 'ScrapedAt': scraped_at,
+                                                    'ValidUntil': valid_until})
+    dynamodb.Table('PostcodeCatalogueTable').put_item(Item={'POSTCODE': '3000', 'CatalogueID': catalogue_id,
+                                                            'ValidUntil': valid_until})
+
+
+def test_current_snapshot_is_used(catalogue):
+    dynamodb, store = catalogue
+    record(dynamodb, 'catalogue-1', int(time.time()) - 60, int(time.time()) + 3600)
+
+    assert product_names(dynamodb, store) == ['Old Milk']
+
+
+@pytest.mark.parametrize('catalogue_id, scraped_ago, valid_for', [
+    # Scraped again after the snapshot, which was not replaced
+    ('catalogue-1', -60, 3600),
+    # The catalogue the snapshot holds has rolled over
+    ('catalogue-1', 60, -60),
+    # The postcode now resolves to another catalogue
+    ('catalogue-2', 60, 3600),
+])
+def test_stale_snapshot_falls_back_to_the_table(catalogue, catalogue_id, scraped_ago, valid_for):
+    dynamodb, store = catalogue
+    record(dynamodb, catalogue_id, int(time.time()) - scraped_ago, int(time.time()) + valid_for)
+
+    assert product_names(dynamodb, store) == ['New Milk']
+
+
+def test_unmapped_postcode_falls_back_to_the_table(catalogue):
+    assert product_names(*catalogue) == ['New Milk']
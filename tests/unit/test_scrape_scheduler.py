@@ -0,0 +1,41 @@
+# tests/unit/test_scrape_scheduler.py
+
+import time
+
+import pytest
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    from common import aws
+    from common.token_bucket import DynamoDBTokenBucket
+    from conftest import load_function
+    from standins import InMemoryDynamoDB
+
+    module = load_function('scrape_scheduler')
+    dynamodb = InMemoryDynamoDB({module.UNIQUE_POSTCODES_TABLE: ('POSTCODE',), module.REQUEST_COUNTS_TABLE: ('POSTCODE',),
+                                 'ScrapeRateLimitTable': ('BucketName',)})
+    monkeypatch.setitem(aws._resources, 'dynamodb', dynamodb)
+    monkeypatch.setattr(aws, '_tables', {})
+    module.rate_limit_table = dynamodb.Table('ScrapeRateLimitTable')
+    monkeypatch.setattr(module, 'rate_limit', DynamoDBTokenBucket(module.rate_limit_table, 'test', 0, 2))
+    module.dispatched = []
+    monkeypatch.setattr(module, 'dispatch', lambda unit: module.dispatched.extend(unit) or True)
+    module.table = dynamodb.Table(module.UNIQUE_POSTCODES_TABLE)
+    module.counts_table = dynamodb.Table(module.REQUEST_COUNTS_TABLE)
+    return module
+
+
+def test_busiest_due_postcodes_are_dispatched_without_taking_tokens(scheduler):
+    recent = int(time.time())
+    scheduler.table.load([{'POSTCODE': '3000'}, {'POSTCODE': '3001'}, {'POSTCODE': '3002', 'LastScrapedAt': recent},
+                          {'POSTCODE': '3003'}, {'POSTCODE': '3004'}])
+    scheduler.counts_table.load([{'POSTCODE': '3000', 'ActiveRequests': 1}, {'POSTCODE': '3001', 'ActiveRequests': 5},
+                                   {'POSTCODE': '3002', 'ActiveRequests': 9}, {'POSTCODE': '3003', 'ActiveRequests': 3}])
+
+    scheduler.lambda_handler({}, None)
+
+    # Two tokens are available, so the two busiest due postcodes are sent
+    assert scheduler.dispatched == ['3001', '3003']
+    # The scraper takes a token only when it opens a browser
+    assert not scheduler.rate_limit_table.items
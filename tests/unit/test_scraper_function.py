@@ -0,0 +1,440 @@
+# tests/unit/test_scraper_function.py
+
+import os
+import sys
+import time
+from decimal import Decimal
+
+import pytest
+
+from conftest import SRC
+
+sys.path.insert(0, os.path.join(SRC, 'scraper_function'))
+from prices import normalise_prices, parse_cents, parse_reference_price, parse_unit  # noqa: E402
+
+
+@pytest.mark.parametrize('text, cents', [
+    ('$4.50', 450),
+    ('$4', 400),
+    ('$ 12.99', 1299),
+    ('$1,299.00', 129900),
+    ('85c', 85),
+    ('4.50', 450),
+    ('2 for $5', 250),
+    ('3 for $10.00', 333),
+    ('Save $1.20', 120),
+    ('Was $6.00', 600),
+    ('$1.20 per 100g', 120),
+    ('NA', None),
+    ('', None),
+    ('Half Price', None),
+])
+def test_parse_cents(text, cents):
+    assert parse_cents(text) == cents
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Save $1.20', ('saving', 120)),
+    ('SAVE $5.00', ('saving', 500)),
+    ('Was $6.00', ('regular', 600)),
+    ('was $3', ('regular', 300)),
+    ('Reg. $4.00', ('regular', 400)),
+    ('Normally $8.50', ('regular', 850)),
+    ('RRP $19.99', ('regular', 1999)),
+    ('$2.00', (None, 200)),
+    ('NA', (None, None)),
+])
+def test_parse_reference_price(text, expected):
+    assert parse_reference_price(text) == expected
+
+
+@pytest.mark.parametrize('text, unit', [
+    ('$1.20 per 100g', '100g'),
+    ('$12.00 / 1KG', '1kg'),
+    ('$0.45 per 1EA', '1ea'),
+    ('$3.30 per 1L', '1l'),
+    ('NA', None),
+])
+def test_parse_unit(text, unit):
+    assert parse_unit(text) == unit
+
+
+def numeric_fields(price, reference='NA', sale_option='NA'):
+    # RegularPrice and Saving are read from the same .sf-regprice element
+    item = {'Price': price, 'RegularPrice': reference, 'Saving': reference, 'SaleOption': sale_option,
+            'SalePrice': 'NA', 'ComparativeText': 'NA'}
+    normalise_prices([item])
+    return (item.get('RegularPriceCents'), item.get('SavingCents'), item.get('DiscountPercent'))
+
+
+@pytest.mark.parametrize('price, reference, sale_option, expected', [
+    # A saving gives the regular price as price plus saving
+    ('$4.00', 'Save $5.00', 'NA', (900, 500, Decimal('55.6'))),
+    ('$2.00', 'Save $1.00', 'NA', (300, 100, Decimal('33.3'))),
+    ('$3.50', 'Save $3.50', 'NA', (700, 350, Decimal('50.0'))),
+    # 0.15% exactly, which a float would round down
+    ('$19.97', 'Save $0.03', 'NA', (2000, 3, Decimal('0.2'))),
+    # A "Was" price is the regular price
+    ('$4.50', 'Was $6.00', 'NA', (600, 150, Decimal('25.0'))),
+    ('$10', 'Was $20', 'NA', (2000, 1000, Decimal('50.0'))),
+    ('2 for $5', 'Was $3.50', 'Multi-buy', (350, 100, Decimal('28.6'))),
+    # A regular price at or below the current price is no discount
+    ('$3.00', 'Was $3.00', 'NA', (None, None, None)),
+    ('$3.00', 'Was $2.50', 'NA', (None, None, None)),
+    # Without a reference price the wording of the offer decides
+    ('$2.25', 'NA', 'Half Price', (None, 225, Decimal('50.0'))),
+    ('$6.00', 'NA', '30% off', (None, None, Decimal('30.0'))),
+    ('$4.00', 'NA', 'NA', (None, None, None)),
+    # Unlabelled amounts: below the price is a saving, above it the regular price
+    ('$4.00', '$1.00', 'NA', (500, 100, Decimal('20.0'))),
+    ('$4.00', '$5.00', 'NA', (500, 100, Decimal('20.0'))),
+])
+def test_normalise_prices(price, reference, sale_option, expected):
+    assert numeric_fields(price, reference, sale_option) == expected
+
+
+def test_normalise_prices_uses_the_field_of_unlabelled_amounts():
+    item = {'Price': '$4.00', 'RegularPrice': '$6.00', 'Saving': '$2.00'}
+    normalise_prices([item])
+    assert (item['RegularPriceCents'], item['SavingCents'], item['DiscountPercent']) == (600, 200, Decimal('33.3'))
+
+
+def test_normalise_prices_keeps_display_strings():
+    item = {'Price': '$4.00', 'RegularPrice': 'Save $5.00', 'Saving': 'Save $5.00', 'ComparativeText': '$4.00 per 1KG'}
+    normalise_prices([item])
+    assert item['Saving'] == 'Save $5.00'
+    assert (item['PriceCents'], item['ComparativeCents'], item['ComparativeUnit']) == (400, 400, '1kg')
+
+
+KEY_SCHEMAS = {
+    'ProductCatalogTable': ('POSTCODE', 'ProductName'),
+    'CatalogueTable': ('CatalogueID',),
+    'PostcodeCatalogueTable': ('POSTCODE',),
+    'ScrapeCheckpointTable': ('POSTCODE',),
+    'UniquePostcodesTable': ('POSTCODE',),
+    'ScrapeRateLimitTable': ('BucketName',),
+}
+
+
+class FakeWaiter:
+    def __init__(self, changes=True):
+        self.changes = changes
+
+    def reset(self):
+        pass
+
+    def snapshot(self):
+        return None
+
+    def wait_for_change(self, before, label):
+        return self.changes
+
+    def summary(self):
+        return {}
+
+
+class FakeElement:
+    def __init__(self, attributes=None):
+        self.attributes = attributes or {}
+
+    def get_attribute(self, name):
+        return self.attributes.get(name)
+
+
+class FakeMarket:
+    """
+    Stands in for a Market on a catalogue whose categories list fixed products.
+
+    Categories named in failing raise ScrapeFailed part way through, and
+    those named in unloaded never load when clicked.
+    """
+    def __init__(self, categories, failing=(), catalogue_id='sale-1', unloaded=()):
+        from market import Market
+        self.build_product_item = Market.build_product_item.__get__(self)
+        self.categories = categories
+        self.failing = set(failing)
+        self.unloaded = set(unloaded)
+        self.catalogue_id = catalogue_id
+        self.page_waiter = FakeWaiter()
+
+    def open_catalogue(self, postcode):
+        pass
+
+    def get_category_list(self):
+        return list(self.categories)
+
+    def get_catalogue_id(self, category_list):
+        return self.catalogue_id
+
+    def click_category(self, category):
+        return category not in self.unloaded
+
+    def extract_category_pages(self, category, start_page=1, should_stop=None):
+        from checkpoints import ScrapeFailed
+        if category in self.failing:
+            raise ScrapeFailed(f"{category} stopped on page 2")
+        return [{'ProductName': name, 'price': '$4.00'} for name in self.categories[category]], None
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    from conftest import load_function
+    from standins import InMemoryDynamoDB
+    from catalogue_registry import CatalogueRegistry
+    from checkpoints import CheckpointStore
+    from common.token_bucket import DynamoDBTokenBucket
+
+    module = load_function('scraper_function')
+    dynamodb = InMemoryDynamoDB(KEY_SCHEMAS)
+    product_table = dynamodb.Table('ProductCatalogTable')
+    monkeypatch.setattr(module, 'dynamodb', dynamodb)
+    monkeypatch.setattr(module, 'product_table', product_table)
+    monkeypatch.setattr(module, 'unique_postcodes_table', dynamodb.Table('UniquePostcodesTable'))
+    monkeypatch.setattr(module, 'catalogue_registry', CatalogueRegistry(dynamodb, product_table))
+    monkeypatch.setattr(module, 'checkpoint_store', CheckpointStore(dynamodb))
+    monkeypatch.setattr(module, 'snapshot_store', None)
+    monkeypatch.setattr(module, 'recommended_pool_size', lambda count: 1)
+    monkeypatch.setattr(module, 'rate_limit', DynamoDBTokenBucket(dynamodb.Table('ScrapeRateLimitTable'), 'test', 0, 5))
+    module.tables = dynamodb.tables
+    return module
+
+
+def use_market(scraper, monkeypatch, market):
+    monkeypatch.setattr(scraper.driver_manager, 'acquire', lambda slot=0: market)
+
+
+def stored_names(scraper, postcode):
+    return sorted(name for code, name in scraper.tables['ProductCatalogTable'].items if code == str(postcode))
+
+
+def test_complete_scrape_replaces_the_catalogue(scraper, monkeypatch):
+    scraper.product_table.put_item(Item={'POSTCODE': '3000', 'ProductName': 'Gone'})
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': ['Rice', 'Oats'], 'Dairy': ['Milk']}))
+
+    assert scraper.scrape_postcode(3000) is True
+
+    assert stored_names(scraper, 3000) == ['Milk', 'Oats', 'Rice']
+    assert ('sale-1',) in scraper.tables['CatalogueTable'].items
+
+
+def test_failed_category_keeps_products_and_records_no_catalogue(scraper, monkeypatch):
+    scraper.product_table.put_item(Item={'POSTCODE': '3000', 'ProductName': 'Bread'})
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': ['Rice'], 'Bakery': ['Bread']}, failing={'Bakery'}))
+
+    assert scraper.scrape_postcode(3000) is False
+
+    assert stored_names(scraper, 3000) == ['Bread', 'Rice']
+    assert not scraper.tables['CatalogueTable'].items
+
+
+def test_category_that_never_loads_keeps_products_and_records_no_catalogue(scraper, monkeypatch):
+    scraper.product_table.put_item(Item={'POSTCODE': '3000', 'ProductName': 'Bread'})
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': ['Rice'], 'Bakery': ['Bread']}, unloaded={'Bakery'}))
+
+    assert scraper.scrape_postcode(3000) is False
+
+    assert stored_names(scraper, 3000) == ['Bread', 'Rice']
+    assert not scraper.tables['CatalogueTable'].items
+
+
+def fail_batch_writes(scraper, monkeypatch):
+    from batch_writer import BatchWriter
+
+    monkeypatch.setattr(scraper, 'BatchWriter', lambda dynamodb, table_name: BatchWriter(dynamodb, table_name, max_retries=0))
+    monkeypatch.setattr(scraper.dynamodb, 'batch_write_item', lambda RequestItems, **kwargs: {'UnprocessedItems': RequestItems})
+
+
+def test_failed_writes_keep_products_and_record_no_catalogue(scraper, monkeypatch):
+    scraper.product_table.put_item(Item={'POSTCODE': '3000', 'ProductName': 'Gone'})
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': ['Rice']}))
+    fail_batch_writes(scraper, monkeypatch)
+
+    assert scraper.scrape_postcode(3000) is False
+
+    assert stored_names(scraper, 3000) == ['Gone']
+    assert not scraper.tables['CatalogueTable'].items
+
+
+def test_failed_fan_out_keeps_products_and_is_not_recorded_as_scraped(scraper, monkeypatch):
+    scraper.catalogue_registry.record_catalogue('sale-1', 3000, [{'POSTCODE': '3000', 'ProductName': 'Rice'}],
+                                                int(time.time()) + 3600)
+    scraper.catalogue_registry.record_mapping(3001, 'sale-1', int(time.time()) + 3600)
+    scraper.product_table.put_item(Item={'POSTCODE': '3001', 'ProductName': 'Gone'})
+    scraper.unique_postcodes_table.put_item(Item={'POSTCODE': '3001'})
+    use_market(scraper, monkeypatch, None)
+    fail_batch_writes(scraper, monkeypatch)
+
+    scraper.lambda_handler({'postcodes': ['3001']}, None)
+
+    assert stored_names(scraper, 3001) == ['Gone']
+    assert 'LastScrapedAt' not in scraper.unique_postcodes_table.get_item(Key={'POSTCODE': '3001'})['Item']
+
+
+def test_empty_scrape_keeps_products_and_records_no_catalogue(scraper, monkeypatch):
+    scraper.product_table.put_item(Item={'POSTCODE': '3000', 'ProductName': 'Bread'})
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': []}))
+
+    assert scraper.scrape_postcode(3000) is False
+
+    assert stored_names(scraper, 3000) == ['Bread']
+    assert not scraper.tables['CatalogueTable'].items
+
+
+def test_resumed_scrape_is_never_fanned_out(scraper, monkeypatch):
+    from checkpoints import ScrapeProgress
+
+    # 3000 stopped after Pantry; its stored rows still hold a product that has left the catalogue
+    scraper.product_table.put_item(Item={'POSTCODE': '3000', 'ProductName': 'Gone'})
+    progress = ScrapeProgress()
+    progress.update('Pantry', None)
+    scraper.checkpoint_store.save(3000, progress)
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': ['Rice'], 'Dairy': ['Milk']}))
+
+    assert scraper.scrape_postcode(3000) is True
+    assert not scraper.tables['CatalogueTable'].items
+
+    # 3001 resolves to the same catalogue, so it is scraped itself rather than copied from 3000
+    assert scraper.scrape_postcode(3001) is True
+
+    assert stored_names(scraper, 3001) == ['Milk', 'Rice']
+    catalogue = scraper.catalogue_registry.get_catalogue('sale-1')
+    assert catalogue['SourcePostcode'] == '3001'
+
+
+def test_empty_catalogue_is_not_fanned_out(scraper, monkeypatch):
+    valid_until = int(time.time()) + 3600
+    scraper.catalogue_registry.record_catalogue('sale-1', 3000, [], valid_until)
+    scraper.product_table.put_item(Item={'POSTCODE': '3001', 'ProductName': 'Bread'})
+    use_market(scraper, monkeypatch, FakeMarket({'Bakery': ['Bread', 'Rolls']}))
+
+    assert scraper.scrape_postcode(3001) is True
+
+    assert stored_names(scraper, 3001) == ['Bread', 'Rolls']
+
+
+def test_failed_scrape_is_not_recorded_as_scraped(scraper, monkeypatch):
+    from checkpoints import ScrapeFailed
+
+    scraper.unique_postcodes_table.put_item(Item={'POSTCODE': '3000'})
+
+    def fail(postcode, deadline=None):
+        raise ScrapeFailed("the catalogue lists no categories")
+    monkeypatch.setattr(scraper, 'scrape_postcode', fail)
+
+    response = scraper.lambda_handler({'postcodes': ['3000']}, None)
+
+    assert response['statusCode'] == 200
+    assert 'LastScrapedAt' not in scraper.unique_postcodes_table.get_item(Key={'POSTCODE': '3000'})['Item']
+
+
+def test_only_browser_scrapes_take_a_token(scraper, monkeypatch):
+    use_market(scraper, monkeypatch, FakeMarket({'Pantry': ['Rice']}))
+    assert scraper.scrape_postcode(3000) is True
+    assert scraper.rate_limit.available() == 4
+
+    # 3001 resolves to the catalogue 3000 scraped, so it is filled without a browser
+    scraper.catalogue_registry.record_mapping(3001, 'sale-1', int(time.time()) + 3600)
+    use_market(scraper, monkeypatch, None)
+    assert scraper.scrape_postcode(3001) is True
+    assert stored_names(scraper, 3001) == ['Rice']
+    assert scraper.rate_limit.available() == 4
+
+
+def test_rate_limited_scrape_releases_its_lease(scraper, monkeypatch):
+    from common.token_bucket import DynamoDBTokenBucket
+
+    monkeypatch.setattr(scraper, 'rate_limit', DynamoDBTokenBucket(scraper.tables['ScrapeRateLimitTable'], 'test', 0, 0))
+    scraper.unique_postcodes_table.put_item(Item={'POSTCODE': '3000', 'ScheduledAt': int(time.time())})
+    use_market(scraper, monkeypatch, None)
+
+    response = scraper.lambda_handler({'postcodes': ['3000']}, None)
+
+    assert response['statusCode'] == 200
+    assert scraper.unique_postcodes_table.get_item(Key={'POSTCODE': '3000'})['Item'] == {'POSTCODE': '3000'}
+
+
+class FakeDriver:
+    current_url = 'https://www.woolworths.com.au/shop/catalogue'
+
+    def __init__(self, next_button=None, changes=True):
+        self.next_button = next_button
+        self.page_waiter = FakeWaiter(changes)
+
+    def find_element(self, by, selector):
+        from selenium.common.exceptions import NoSuchElementException
+        if self.next_button is None:
+            raise NoSuchElementException(selector)
+        return self.next_button
+
+    def execute_script(self, script, *args):
+        pass
+
+
+def test_catalogue_id_needs_categories():
+    from market import Market
+    from checkpoints import ScrapeFailed
+
+    with pytest.raises(ScrapeFailed):
+        Market.get_catalogue_id(FakeDriver(), [])
+
+
+def test_next_page_that_does_not_load_fails():
+    from market import Market
+    from checkpoints import ScrapeFailed
+
+    with pytest.raises(ScrapeFailed):
+        Market.click_next_page(FakeDriver(FakeElement(), changes=False))
+    assert Market.click_next_page(FakeDriver(FakeElement(), changes=True)) is True
+    assert Market.click_next_page(FakeDriver(FakeElement({'aria-disabled': 'true'}), changes=False)) is False
+
+
+class FakeCategoryDriver(FakeDriver):
+    """
+    Lists category links that are always clickable.
+    """
+    def __init__(self, categories, changes=True):
+        from selenium.webdriver.remote.webelement import WebElement
+
+        class FakeLink(WebElement):
+            text = None
+
+            def __init__(self, text):
+                self.text = text
+
+            def is_displayed(self):
+                return True
+
+            def is_enabled(self):
+                return True
+
+        super().__init__(changes=changes)
+        self.links = [FakeLink(category) for category in categories]
+
+    def hover_to_toggle_categories(self):
+        pass
+
+    def find_elements(self, by, selector):
+        return self.links
+
+
+def test_category_that_does_not_load_is_not_opened(monkeypatch):
+    import market
+    from market import Market
+
+    monkeypatch.setattr(market, 'log_page_source', lambda driver, reason: None)
+
+    assert Market.click_category(FakeCategoryDriver(['Pantry', 'Dairy'], changes=False), 'Dairy') is False
+    assert Market.click_category(FakeCategoryDriver(['Pantry', 'Dairy'], changes=True), 'Dairy') is True
+    assert Market.click_category(FakeCategoryDriver(['Pantry'], changes=True), 'Dairy') is False
+
+
+def test_unreadable_page_is_not_an_empty_page():
+    from market import ProductExtractor
+    from checkpoints import ScrapeFailed
+
+    class BrokenPage(FakeDriver):
+        def execute_script(self, script, *args):
+            raise RuntimeError("stale element reference")
+
+    with pytest.raises(ScrapeFailed):
+        ProductExtractor(BrokenPage(FakeElement())).get_products_from_current_page()
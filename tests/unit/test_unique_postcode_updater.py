@@ -0,0 +1,99 @@
+# tests/unit/test_unique_postcode_updater.py
+
+import pytest
+
+
+@pytest.fixture
+def updater(monkeypatch):
+    from common import aws
+    from conftest import load_function
+    from standins import InMemoryDynamoDB
+
+    module = load_function('unique_postcode_updater')
+    dynamodb = InMemoryDynamoDB({module.UNIQUE_POSTCODES_TABLE: ('POSTCODE',), module.REQUEST_COUNTS_TABLE: ('POSTCODE',)},
+                                streams={module.UNIQUE_POSTCODES_TABLE})
+    monkeypatch.setitem(aws._resources, 'dynamodb', dynamodb)
+    monkeypatch.setattr(aws, '_tables', {})
+    module.postcodes = dynamodb.Table(module.UNIQUE_POSTCODES_TABLE)
+    module.request_counts = dynamodb.Table(module.REQUEST_COUNTS_TABLE)
+    return module
+
+
+def request_record(event_name, postcode, product_name='Milk'):
+    from standins import _serialize
+
+    keys = _serialize({'POSTCODE': postcode, 'ProductName': product_name})
+    record = {'eventName': event_name, 'dynamodb': {'Keys': keys}}
+    if event_name != 'REMOVE':
+        record['dynamodb']['NewImage'] = keys
+    return record
+
+
+def active_requests(updater, postcode):
+    return updater.request_counts.get_item(Key={'POSTCODE': postcode})['Item']['ActiveRequests']
+
+
+def test_known_postcode_is_not_written_again(updater):
+    updater.lambda_handler({'Records': [request_record('INSERT', '3000', 'Milk')]}, None)
+    updater.lambda_handler({'Records': [request_record('INSERT', '3000', 'Bread')]}, None)
+
+    assert updater.postcodes.calls['PutItem'] == 1
+    assert [record['eventName'] for record in updater.postcodes.stream] == ['INSERT']
+
+
+def test_requests_are_counted_per_postcode(updater):
+    updater.lambda_handler({'Records': [request_record('INSERT', '3000', 'Milk'),
+                                        request_record('INSERT', '3000', 'Bread'),
+                                        request_record('INSERT', '3001'),
+                                        request_record('MODIFY', '3001')]}, None)
+    updater.lambda_handler({'Records': [request_record('REMOVE', '3000', 'Milk'),
+                                        request_record('INSERT', '3001', 'Bread')]}, None)
+
+    assert active_requests(updater, '3000') == 1
+    assert active_requests(updater, '3001') == 2
+    # One counter write per postcode and batch; UniquePostcodes only sees the two new postcodes
+    assert updater.request_counts.calls['UpdateItem'] == 4
+    assert sorted(updater.postcodes.items) == [('3000',), ('3001',)]
+
+
+def test_batch_retried_after_a_failed_add_is_counted_once(updater, monkeypatch):
+    from standins import _client_error
+
+    put_item = updater.postcodes.put_item
+
+    def failing_put_item(Item, **kwargs):
+        if Item['POSTCODE'] == '3001':
+            raise _client_error('InternalServerError', 'boom', 'PutItem')
+        return put_item(Item=Item, **kwargs)
+
+    batch = {'Records': [request_record('INSERT', '3000'), request_record('INSERT', '3001')]}
+    monkeypatch.setattr(updater.postcodes, 'put_item', failing_put_item)
+    with pytest.raises(RuntimeError):
+        updater.lambda_handler(batch, None)
+    assert not updater.request_counts.items
+
+    # The stream retries the whole batch
+    monkeypatch.setattr(updater.postcodes, 'put_item', put_item)
+    updater.lambda_handler(batch, None)
+
+    assert active_requests(updater, '3000') == 1
+    assert active_requests(updater, '3001') == 1
+    assert sorted(updater.postcodes.items) == [('3000',), ('3001',)]
+
+
+def test_removed_requests_never_add_a_postcode(updater):
+    updater.lambda_handler({'Records': [request_record('REMOVE', '3000')]}, None)
+
+    assert not updater.postcodes.items
+
+
+def test_requests_made_before_counting_never_take_a_count_below_zero(updater):
+    # 3000's first request predates counting, so its removal finds no count
+    updater.lambda_handler({'Records': [request_record('REMOVE', '3000', 'Milk')]}, None)
+    assert not updater.request_counts.items
+
+    updater.lambda_handler({'Records': [request_record('INSERT', '3000', 'Bread')]}, None)
+    updater.lambda_handler({'Records': [request_record('REMOVE', '3000', 'Bread'),
+                                        request_record('REMOVE', '3000', 'Eggs')]}, None)
+
+    assert active_requests(updater, '3000') == 0
@@ -0,0 +1,166 @@
+# tests/unit/test_user_request_handler.py
+
+import json
+
+import pytest
+
+from common import utils
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip', True),
+    ('gzip, deflate, br', True),
+    ('GZIP; q=0.5', True),
+    ('*', True),
+    ('*;q=0, gzip', True),
+    ('gzip;q=0, *', False),
+    ('gzip;q=0.0', False),
+    ('deflate, *;q=0', False),
+    ('br', False),
+    ('', False),
+])
+def test_accepts_gzip(accept_encoding, expected):
+    event = {'headers': {'Accept-Encoding': accept_encoding}}
+    assert utils.accepts_gzip(event) is expected
+
+
+def test_accepts_gzip_without_headers():
+    assert utils.accepts_gzip({'headers': None}) is False
+    assert utils.accepts_gzip(None) is False
+
+
+class LambdaContext:
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 3000
+
+
+@pytest.fixture
+def requests_table(monkeypatch):
+    from common import aws
+    from standins import InMemoryDynamoDB
+
+    dynamodb = InMemoryDynamoDB({utils.USER_REQUESTS_TABLE: ('POSTCODE', 'ProductName')})
+    monkeypatch.setitem(aws._resources, 'dynamodb', dynamodb)
+    monkeypatch.setattr(aws, '_tables', {})
+    return dynamodb.Table(utils.USER_REQUESTS_TABLE)
+
+
+def bulk_event(method, path, entries):
+    return {'httpMethod': method, 'path': path, 'body': json.dumps({'Requests': entries})}
+
+
+def response_body(response):
+    return json.loads(response['body'])
+
+
+def request_entry(postcode, product_name, discount=20):
+    return {'Postcode': postcode, 'ProductName': product_name, 'Discount': discount, 'PhoneNumber': '0400000000'}
+
+
+def test_submit_requests_writes_rows(requests_table):
+    entries = [request_entry('3220', 'Cat Litter'), request_entry('3220', 'Dog Food', 30),
+               request_entry('3000', 'Cat Litter')]
+
+    response = utils.submit_requests(bulk_event('POST', '/submitrequests', entries), LambdaContext())
+
+    body = response_body(response)
+    assert (body['Succeeded'], body['Failed']) == (3, 0)
+    stored = requests_table.get_item(Key={'POSTCODE': '3220', 'ProductName': 'Dog Food'})['Item']
+    assert stored['Discount'] == 30
+    assert stored['RequestID'] == body['Results'][1]['RequestID']
+    assert len(requests_table.items) == 3
+
+
+def test_submit_requests_rejects_repeated_keys(requests_table):
+    entries = [request_entry('3220', 'Cat Litter', 10), request_entry('3220', 'Cat Litter', 50)]
+
+    body = response_body(utils.submit_requests(bulk_event('POST', '/submitrequests', entries), LambdaContext()))
+
+    assert [result['Status'] for result in body['Results']] == ['submitted', 'invalid']
+    stored = requests_table.get_item(Key={'POSTCODE': '3220', 'ProductName': 'Cat Litter'})['Item']
+    assert stored['Discount'] == 10
+
+
+def test_submit_requests_spans_batches(requests_table):
+    entries = [request_entry('3220', f"Product {index}") for index in range(60)]
+
+    body = response_body(utils.submit_requests(bulk_event('POST', '/submitrequests', entries), LambdaContext()))
+
+    assert (body['Succeeded'], body['Failed']) == (60, 0)
+    assert len(requests_table.items) == 60
+
+
+def test_delete_requests_removes_rows(requests_table):
+    for product_name in ('Cat Litter', 'Dog Food', 'Bird Seed'):
+        requests_table.put_item(Item={'POSTCODE': '3220', 'ProductName': product_name, 'RequestID': product_name})
+    entries = [{'Postcode': '3220', 'ProductName': 'Cat Litter'},
+               {'Postcode': 3220, 'ProductName': 'Dog Food'},
+               {'Postcode': '3220', 'ProductName': 'Cat Litter'},
+               {'Postcode': '3220'}]
+
+    body = response_body(utils.delete_requests(bulk_event('DELETE', '/deleterequests', entries)))
+
+    assert [result['Status'] for result in body['Results']] == ['deleted', 'deleted', 'deleted', 'invalid']
+    assert list(requests_table.items) == [('3220', 'Bird Seed')]
+
+
+def list_event(headers=None, **params):
+    return {'httpMethod': 'GET', 'path': '/listrequests', 'headers': headers or {},
+            'queryStringParameters': {name: str(value) for name, value in params.items()}}
+
+
+def fill_requests(table, postcodes, per_postcode):
+    for postcode in postcodes:
+        for index in range(per_postcode):
+            table.put_item(Item={'POSTCODE': str(postcode), 'ProductName': f"Product {index}",
+                                 'RequestID': f"{postcode}-{index}"})
+
+
+def test_export_pages_through_every_request(requests_table, monkeypatch):
+    monkeypatch.setattr(utils, 'ADMIN_EXPORT_TOKEN', 'secret')
+    fill_requests(requests_table, range(3000, 3010), 25)
+
+    seen, pages, token = [], 0, None
+    while True:
+        params = {'export': 'true', 'limit': 40}
+        if token:
+            params['next_token'] = token
+        response = utils.list_requests(list_event({'X-Admin-Token': 'secret'}, **params))
+        assert response['statusCode'] == 200
+        body = response_body(response)
+        assert body['Count'] <= 40
+        seen.extend(item['RequestID'] for item in body['Items'])
+        pages += 1
+        token = body['NextToken']
+        if not token:
+            break
+
+    assert sorted(seen) == sorted(f"{postcode}-{index}" for postcode in range(3000, 3010) for index in range(25))
+    assert pages > 1
+
+
+def test_export_requires_admin_token(requests_table, monkeypatch):
+    monkeypatch.setattr(utils, 'ADMIN_EXPORT_TOKEN', 'secret')
+    assert utils.list_requests(list_event({'X-Admin-Token': 'wrong'}, export='true'))['statusCode'] == 403
+
+
+def test_next_token_must_match_the_listing(requests_table, monkeypatch):
+    monkeypatch.setattr(utils, 'ADMIN_EXPORT_TOKEN', 'secret')
+    fill_requests(requests_table, (3000, 3001), 5)
+
+    scan_token = response_body(utils.list_requests(list_event(limit=2)))['NextToken']
+    query_token = response_body(utils.list_requests(list_event(postcode=3000, limit=2)))['NextToken']
+    export_token = response_body(utils.list_requests(
+        list_event({'X-Admin-Token': 'secret'}, export='true', limit=2)))['NextToken']
+
+    assert utils.list_requests(list_event(postcode=3000, next_token=scan_token))['statusCode'] == 400
+    assert utils.list_requests(list_event(postcode=3001, next_token=query_token))['statusCode'] == 400
+    assert utils.list_requests(list_event(next_token=export_token))['statusCode'] == 400
+    assert utils.list_requests(list_event({'X-Admin-Token': 'secret'}, export='true',
+                                          next_token=scan_token))['statusCode'] == 400
+    assert utils.list_requests(list_event(next_token='not a token'))['statusCode'] == 400
+
+    next_page = utils.list_requests(list_event(postcode=3000, limit=2, next_token=query_token))
+    assert next_page['statusCode'] == 200
+    assert all(item['POSTCODE'] == '3000' for item in response_body(next_page)['Items'])